@@ -1,40 +1,40 @@
 import spacy
-from spacy.tokens import DocBin
-from tqdm import tqdm # Affichage d'une barre de progression
-import difflib # Recherche de similarité entre deux chaînes de caractères
-import pandas as pd
-
-from spacy.language import Language
-from spacy_langdetect import LanguageDetector
 
 # Import des fonctions personnalisées qui seront utilisées dans ce notebook
-from ..modules_nlp.process_departure_destination import departure_destination
-
-# Chargement du modèle entrainé "model-best" situé deux dossiers plus haut
-nlp_itineraire = spacy.load("NLP/model-best/")
-
+from ..modules_nlp.city_matcher import CityMatcher
+from ..modules_nlp.process_departure_destination import departure_destination, departure_destination_batch
+from .ItineraryCache import ItineraryCache, model_fingerprint, normalize_text
+from .LanguageGate import create_language_pipeline
+from constants import ERROR_NOT_TRIP
+from metrics import count_outcome
 
-# Chargement du modèle Français medium - Ce modèle sera utilisé pour la détection des langues
-nlp_fr = spacy.load("fr_core_news_md")
+fichier_villes = 'NLP/liste_villes_500.txt'
 
+# Version du format des itinéraires mis en cache, à incrémenter quand il change (2 : escales ajoutées)
+ITINERARY_FORMAT = 2
 
+class EntityRecognitionService:
+    def __init__(self, cache_file: str | None = None, cache_size: int = 10000):
+        """
+        Args:
+            cache_file (str | None): SQLite file shared by processes for the itinerary cache, None to keep it in memory only
+            cache_size (int): Maximum number of itineraries kept in memory
+        """
+        # Les modèles sont chargés à la création du service et non à l'import du module
+        # Chargement du modèle entrainé "model-best" situé deux dossiers plus haut
+        self.nlp_itineraire = spacy.load("NLP/model-best/")
 
-@Language.factory('language_detector')
-def language_detector(nlp, name):
-    return LanguageDetector()
+        # Pipeline légère (tokenizer + détection de langue) utilisée uniquement pour la détection des langues,
+        # à la place du modèle Français medium dont les autres composants n'étaient pas utilisés
+        self.nlp_fr = create_language_pipeline()
 
-# Ajouter LanguageDetector à la pipeline si ce n'est pas déjà le cas
-if 'language_detector' not in nlp_fr.pipe_names:
-    # print("Ajout de LanguageDetector à la pipeline")
-    nlp_fr.add_pipe('language_detector', last=True)
-    # print("LanguageDetector ajouté à la pipeline")
+        # Index des villes construit au chargement du service et non à la première requête
+        # (les processus préforkés le partagent ainsi avec les modèles)
+        CityMatcher.from_file(fichier_villes)
 
-fichier_villes = 'NLP/liste_villes_500.txt'
-
-class EntityRecognitionService:
-    # def __init__(self):
-        # self.nlp = spacy.load("fr_core_news_md")
-        
+        # Cache texte -> itinéraire, invalidé si le modèle ou la liste de villes change
+        fingerprint = f"{ITINERARY_FORMAT}:{model_fingerprint('NLP/model-best/meta.json', fichier_villes)}"
+        self.cache = ItineraryCache(fingerprint, cache_file, cache_size)
 
     def extract_loc(self, text: str) -> list:
         """Extracts locations from a text.
@@ -43,7 +43,7 @@ class EntityRecognitionService:
             text (str): Text to extract locations from
 
         Returns:
-            list: List of locations. Departure is first, destination is second
+            list: List of locations. Departure is first, destination is last, stops (ESCALE) are in between
         """
         # depart = None
         # destination = None
@@ -62,11 +62,41 @@ class EntityRecognitionService:
 
 
         try:
-            depart, destination = departure_destination(text, nlp_fr, nlp_itineraire, fichier_villes)
+            depart, *escales, destination = self.cache.get_or_compute(
+                text, lambda text: departure_destination(text, self.nlp_fr, self.nlp_itineraire, fichier_villes)
+            )
         except Exception as e:
             print("Extraction des entités impossible")
+            count_outcome(ERROR_NOT_TRIP)
             exit()
 
 
 
-        return depart, destination
\ No newline at end of file
+        return depart, *escales, destination
+
+    def extract_loc_batch(self, texts: list, batch_size: int = 256) -> list:
+        """Extracts locations from several texts, running the models once per batch.
+
+        Args:
+            texts (list): Texts to extract locations from
+            batch_size (int): Number of texts per nlp.pipe batch
+
+        Returns:
+            list: For each text, (departure, stops..., destination) or None if no itinerary was found
+        """
+        results = [None] * len(texts)
+        missing = []
+        for i, text in enumerate(texts):
+            found, itineraire = self.cache.get(text)
+            if found:
+                results[i] = itineraire
+            else:
+                missing.append(i)
+
+        # Seuls les textes absents du cache passent par les modèles
+        normalized = [normalize_text(texts[i]) for i in missing]
+        extracted = departure_destination_batch(normalized, self.nlp_fr, self.nlp_itineraire, fichier_villes, batch_size)
+        for i, itineraire in zip(missing, extracted):
+            self.cache.put(texts[i], itineraire)
+            results[i] = itineraire
+        return results
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+def normalize_text(text: str) -> str:
+    """Normalizes a request text into a cache key.
+
+    Unicode is put in NFC form and whitespace runs are collapsed. Case and
+    punctuation are kept since the NER model is sensitive to them.
+
+    Args:
+        text (str): Request text
+
+    Returns:
+        str: Normalized text
+    """
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+def model_fingerprint(*paths: str) -> str:
+    """Computes a fingerprint of the files an extraction depends on (model meta.json, city list).
+
+    Args:
+        paths (str): Files to hash
+
+    Returns:
+        str: SHA-256 hex digest of the files' contents
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+class ItineraryCache:
+    """Two-level text to itinerary cache: an in-process LRU backed by a SQLite file.
+
+    The SQLite file survives restarts and is shared by worker processes. Every
+    entry is stored with the model fingerprint, entries from another
+    fingerprint (e.g. a retrained model) are purged when the cache is opened.
+    """
+
+    def __init__(self, fingerprint: str, path: str | None = None, maxsize: int = 10000):
+        """
+        Args:
+            fingerprint (str): Model fingerprint (see model_fingerprint)
+            path (str | None): SQLite file, None for an in-process cache only
+            maxsize (int): Maximum number of entries kept in memory
+        """
+        self.fingerprint = fingerprint
+        self.path = path
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connection() as connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS itineraries ('
+                    'fingerprint TEXT NOT NULL, key TEXT NOT NULL, value TEXT, PRIMARY KEY (fingerprint, key))'
+                )
+                connection.execute('DELETE FROM itineraries WHERE fingerprint != ?', (fingerprint,))
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the SQLite connection of the current thread.
+
+        A connection inherited through fork is never reused, the child opens its own.
+        """
+        pid, connection = getattr(self._local, 'connection', (None, None))
+        if connection is None or pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            # WAL lets readers from other processes proceed while one writes
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    def _remember(self, key: str, value) -> None:
+        """Stores an entry in the in-process LRU, evicting the least recently used one if full."""
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            if len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def get(self, text: str) -> tuple:
+        """Looks up the cached itinerary for a text.
+
+        Args:
+            text (str): Request text
+
+        Returns:
+            tuple: (found, itinerary). Lists read back from disk are returned as tuples
+        """
+        key = normalize_text(text)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return True, self._memory[key]
+
+        if self.path is not None:
+            row = self._connection().execute(
+                'SELECT value FROM itineraries WHERE fingerprint = ? AND key = ?', (self.fingerprint, key)
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                value = tuple(value) if isinstance(value, list) else value
+                with self._lock:
+                    self.counters['disk_hits'] += 1
+                self._remember(key, value)
+                return True, value
+
+        with self._lock:
+            self.counters['misses'] += 1
+        return False, None
+
+    def put(self, text: str, value) -> None:
+        """Stores the itinerary of a text.
+
+        Args:
+            text (str): Request text
+            value: Itinerary, must be JSON serializable
+        """
+        key = normalize_text(text)
+        self._remember(key, value)
+        if self.path is not None:
+            with self._connection() as connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO itineraries (fingerprint, key, value) VALUES (?, ?, ?)',
+                    (self.fingerprint, key, json.dumps(value, ensure_ascii=False))
+                )
+
+    def get_or_compute(self, text: str, compute):
+        """Returns the cached itinerary for a text, computing and storing it on a miss.
+
+        Args:
+            text (str): Request text
+            compute (callable): Function computing the itinerary from the text. Its result must be JSON serializable
+
+        Returns:
+            The itinerary, as returned by compute (lists read back from disk are returned as tuples)
+        """
+        found, value = self.get(text)
+        if not found:
+            # Computed on the normalized text, so the cached value only depends on the key
+            value = compute(normalize_text(text))
+            self.put(text, value)
+        return value
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters and the in-memory size."""
+        with self._lock:
+            return dict(self.counters, memory_size=len(self._memory))
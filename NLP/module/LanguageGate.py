@@ -0,0 +1,48 @@
+from functools import lru_cache
+
+import spacy
+from langdetect import DetectorFactory, detect_langs
+from langdetect.lang_detect_exception import LangDetectException
+from spacy.language import Language
+from spacy_langdetect import LanguageDetector
+
+# Résultats reproductibles : sans graine, langdetect peut donner deux langues différentes pour un même texte
+DetectorFactory.seed = 0
+
+@lru_cache(maxsize=4096)
+def detect_language(text: str) -> dict:
+    """Detects the language of a text, once per distinct text.
+
+    The result is cached so the language gate in utils.check_french and the
+    one in the NLP pipeline share a single detection per input.
+
+    Args:
+        text (str): Text to analyse
+
+    Returns:
+        dict: {'language': ISO 639-1 code or 'UNKNOWN', 'score': probability}
+    """
+    try:
+        detected_language = detect_langs(text)[0]
+        return {"language": str(detected_language.lang), "score": float(detected_language.prob)}
+    except LangDetectException:
+        return {"language": "UNKNOWN", "score": 0.0}
+
+@Language.factory('language_gate')
+def language_gate(nlp, name):
+    return LanguageDetector(language_detection_function=lambda span: detect_language(span.text))
+
+def create_language_pipeline() -> Language:
+    """Creates the tokenizer-only French pipeline used to gate inputs on their language.
+
+    It replaces fr_core_news_md, whose tagger, parser and NER outputs were
+    never used: only doc._.language is read.
+
+    Returns:
+        Language: Pipeline setting doc._.language
+    """
+    nlp = spacy.blank('fr')
+    # LanguageDetector parcourt doc.sents : le sentencizer suffit à les fournir
+    nlp.add_pipe('sentencizer')
+    nlp.add_pipe('language_gate', last=True)
+    return nlp
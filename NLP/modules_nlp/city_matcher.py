@@ -0,0 +1,105 @@
+import bisect
+import difflib # Recherche de similarité entre deux chaînes de caractères
+from functools import lru_cache
+
+import numpy as np
+
+# -------------------------------------------------------------------------------
+# Table de normalisation : accents, apostrophes, tirets et underscores remplacés en une seule passe
+# -------------------------------------------------------------------------------
+NORMALIZATION_TABLE = str.maketrans({
+    'É': 'E', 'È': 'E', 'Ê': 'E', 'Ë': 'E',
+    'À': 'A',
+    'Ù': 'U', 'Û': 'U',
+    'Ô': 'O',
+    'Î': 'I', 'Ï': 'I',
+    'Ç': 'C',
+    '\'': ' ', '-': ' ', '_': ' ',
+})
+
+def normalize(text):
+    # Conversion en majuscules puis remplacement des caractères accentués et des séparateurs
+    return text.upper().translate(NORMALIZATION_TABLE)
+
+# -------------------------------------------------------------------------------
+# Index de villes pour la recherche approximative, équivalent à difflib.get_close_matches(item, villes, n=1)
+# -------------------------------------------------------------------------------
+class CityMatcher:
+    """Fuzzy city name index returning the same best match as difflib.get_close_matches(word, cities, n=1).
+
+    Names are sorted by length and indexed by their character counts. A query
+    only looks at the names whose length and shared characters can reach the
+    cutoff (the same upper bounds difflib uses as pre-filters), then runs
+    SequenceMatcher.ratio on those few candidates.
+    """
+
+    def __init__(self, cities):
+        # Doublons supprimés, tri par longueur pour sélectionner une plage de longueurs par bissection
+        self.names = sorted(set(cities), key=lambda name: (len(name), name))
+        self.known = set(self.names)
+        self.lengths = [len(name) for name in self.names]
+        self.lengths_array = np.array(self.lengths, dtype=np.int32)
+        self.alphabet = {char: i for i, char in enumerate(sorted(set(''.join(self.names))))}
+        # Nombre d'occurrences de chaque caractère de l'alphabet, une ligne par caractère et une colonne par ville
+        chars = [self.alphabet[char] for name in self.names for char in name]
+        rows = np.repeat(np.arange(len(self.names)), self.lengths)
+        self.counts = np.zeros((len(self.alphabet), len(self.names)), dtype=np.int32)
+        np.add.at(self.counts, (chars, rows), 1)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def from_file(cls, fichier_villes):
+        """Builds the index for a city list file, once per file."""
+        with open(fichier_villes, 'r') as file:
+            return cls(file.read().splitlines())
+
+    def best_match(self, word, cutoff=0.8):
+        """Returns the closest city name to word with a similarity ratio of at least cutoff.
+
+        Args:
+            word (str): Normalized word
+            cutoff (float): Minimum SequenceMatcher ratio
+
+        Returns:
+            str: Best matching city, ties broken like difflib (greatest name)
+            None: If no city reaches the cutoff
+        """
+        # Correspondance exacte : ratio de 1, aucune autre ville ne peut faire mieux
+        if word in self.known:
+            return word
+        length = len(word)
+        if length == 0:
+            return None
+
+        # 2 * min(la, lb) / (la + lb) >= cutoff borne la longueur des villes candidates
+        start = bisect.bisect_left(self.lengths, length * cutoff / (2 - cutoff) - 1e-9)
+        end = bisect.bisect_right(self.lengths, length * (2 - cutoff) / cutoff + 1e-9)
+        if start >= end:
+            return None
+
+        # Borne supérieure du ratio à partir des caractères communs (quick_ratio de difflib), calculée pour toutes les villes d'un coup
+        # Seuls les caractères présents dans le mot (et connus de l'index) comptent
+        query = {}
+        for char in word:
+            index = self.alphabet.get(char)
+            if index is not None:
+                query[index] = query.get(index, 0) + 1
+        if not query:
+            return None
+        indexes = list(query)
+        common = np.minimum(
+            self.counts[indexes, start:end], np.array(list(query.values()), dtype=np.int32)[:, None]
+        ).sum(axis=0)
+        upper_bounds = 2.0 * common / (length + self.lengths_array[start:end])
+        candidates = np.flatnonzero(upper_bounds >= cutoff) + start
+
+        best = None
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+        for row in candidates.tolist():
+            name = self.names[row]
+            matcher.set_seq1(name)
+            ratio = matcher.ratio()
+            if ratio >= cutoff and (best is None or (ratio, name) > best):
+                best = (ratio, name)
+        return None if best is None else best[1]
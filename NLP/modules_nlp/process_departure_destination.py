@@ -1,17 +1,26 @@
+import itertools
 import spacy
-from spacy.tokens import DocBin
-from tqdm import tqdm # Affichage d'une barre de progression
-import difflib # Recherche de similarité entre deux chaînes de caractères
+from spacy.tokens import Doc
 import pandas as pd
 
+from .city_matcher import CityMatcher, normalize
+
+try:
+    from metrics import stage
+except ImportError:
+    # Notebooks lancés depuis NLP/ : le module metrics de l'application n'est pas importable, pas d'instrumentation
+    from contextlib import nullcontext as stage
+
 # -------------------------------------------------------------------------------
-# Fonction pour identier les NER "DEPARTURE" et "DESTINATION" d'un texte
+# Fonction pour identier les NER "DEPARTURE", "ESCALE" et "DESTINATION" d'un texte
 # -------------------------------------------------------------------------------
 def extract_departure_destination(text, nlp_lang, nlp_itineraire, verbose=True):
 
     # Transformation du texte en doc avec le modèle fr et le modèle itineraire
-    doc_fr = nlp_lang(text)
-    doc_itineraire = nlp_itineraire(text)
+    with stage('spacy_language'):
+        doc_fr = nlp_lang(text)
+    with stage('spacy_itineraire'):
+        doc_itineraire = nlp_itineraire(text)
 
     # Affichage des entités nommées
     if verbose:
@@ -21,63 +30,105 @@ def extract_departure_destination(text, nlp_lang, nlp_itineraire, verbose=True):
         spacy.displacy.render(doc_itineraire, style='ent', jupyter=True)
         print("-----------------------------")
 
-    # Initialiser les variables pour stocker les entités "DEPARTURE" et "DESTINATION" ou les erreurs
+    return itineraire_from_docs(doc_fr, doc_itineraire)
+
+# -------------------------------------------------------------------------------
+# Fonction pour récupérer l'itinéraire à partir des docs déjà traités par les deux modèles
+# -------------------------------------------------------------------------------
+def itineraire_from_docs(doc_fr, doc_itineraire):
+
+    # Initialiser les variables pour stocker les entités "DEPARTURE", "ESCALE" et "DESTINATION" ou les erreurs
     departure = None
     destination = None
+    escales = []
     itineraire = {}
 
     # Si la phrase n'est pas en français, on retourne NOT_FRENCH
-    if doc_fr._.language['language'] != 'fr':
+    if doc_language(doc_fr) != 'fr':
         return "NOT_FRENCH"
 
-    # Parcourir les entités extraites par spaCy et récupérer les entités "DEPARTURE" et "DESTINATION"
+    # Parcourir les entités extraites par spaCy et récupérer les entités "DEPARTURE", "ESCALE" et "DESTINATION"
+    # Les escales sont gardées dans l'ordre du texte
     for ent in doc_itineraire.ents:
         if ent.label_ == "DEPARTURE":
             departure = ent.text
         elif ent.label_ == "DESTINATION":
             destination = ent.text
+        elif ent.label_ == "ESCALE":
+            escales.append(ent.text)
 
     # Si on n'a pas trouvé les entités "DEPARTURE" ou "DESTINATION"
     if departure is None or destination is None:
         return "NOT_TRIP"
     else:
         itineraire['departure'] = departure
+        itineraire['escales'] = escales
         itineraire['destination'] = destination
 
     # Retourner les résultats
     return itineraire
 
 # -------------------------------------------------------------------------------
-# Fonction pour traiter un jeu de données et retourner les triplets id, départ, destination
+# Fonction pour récupérer la langue d'un doc traité par le modèle de langue
 # -------------------------------------------------------------------------------
-def process_dataset(file_path, nlp_lang, nlp_itineraire, verbose):
-    # Lire le fichier texte
+def doc_language(doc):
+    # L'extension est enregistrée par LanguageDetector lors du traitement du doc. Avec nlp.pipe(n_process > 1),
+    # le traitement a lieu dans un autre processus : on applique alors la détection du language gate directement sur le texte
+    if Doc.has_extension('language'):
+        return doc._.language['language']
+    from ..module.LanguageGate import detect_language
+    return detect_language(doc.text)['language']
+
+# -------------------------------------------------------------------------------
+# Fonction pour formater un itinéraire en triplet id, départ, destination (les escales éventuelles entre les deux)
+# -------------------------------------------------------------------------------
+def format_triplet(file_id, itineraire):
+    if itineraire == "NOT_FRENCH" or itineraire == "NOT_TRIP":
+        # ex.: '5,NOT_TRIP',
+        return f"{file_id},{itineraire}"
+    # ex.: '3,Bordeaux,Tours', ou avec une escale : '4,Aubervilliers,Nice,Lille'
+    return ','.join([str(file_id), itineraire['departure'], *itineraire.get('escales', []), itineraire['destination']])
+
+# -------------------------------------------------------------------------------
+# Fonction pour lire un jeu de données ligne par ligne et retourner les couples (id, texte)
+# -------------------------------------------------------------------------------
+def read_dataset(file_path):
+    # Lecture en flux : le fichier n'est jamais chargé entièrement en mémoire
     with open(file_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
+        for line in file:
+            # Extraire l'ID et le texte
+            line_parts = line.strip().split(',', 1)  # Séparer l'ID du reste
+            # Si l'ID n'est pas un nombre, on met 0
+            file_id = line_parts[0] if line_parts[0].isdigit() else 0
+            # Si la deuxième partie n'est pas vide, on l'affecte à text, sinon on récupère la première partie (pas d'id)
+            text = line_parts[1] if len(line_parts) > 1 else line_parts[0]
+            yield file_id, text
 
+# -------------------------------------------------------------------------------
+# Fonction pour traiter un flux de couples (id, texte) par lots avec nlp.pipe et retourner les triplets au fur et à mesure
+# -------------------------------------------------------------------------------
+def process_batch(items, nlp_lang, nlp_itineraire, batch_size=256, n_process=1):
+    # Le flux est dupliqué pour les deux modèles : les deux pipes avancent ensemble,
+    # la mémoire tampon de tee reste donc de l'ordre d'un lot
+    items_lang, items_itineraire = itertools.tee(((text, file_id) for file_id, text in items), 2)
+    docs_fr = nlp_lang.pipe(items_lang, as_tuples=True, batch_size=batch_size, n_process=n_process)
+    docs_itineraire = nlp_itineraire.pipe(items_itineraire, as_tuples=True, batch_size=batch_size, n_process=n_process)
+
+    for (doc_fr, file_id), (doc_itineraire, _) in zip(docs_fr, docs_itineraire):
+        yield format_triplet(file_id, itineraire_from_docs(doc_fr, doc_itineraire))
+
+# -------------------------------------------------------------------------------
+# Fonction pour traiter un jeu de données et retourner les triplets id, départ, destination
+# -------------------------------------------------------------------------------
+def process_dataset(file_path, nlp_lang, nlp_itineraire, verbose):
     outputTriplets = []
     # Traitement de chaque ligne du jeu de données
-    for line in lines:
-        # Extraire l'ID, les entités "DEPARTURE" et "DESTINATION"
-        line_parts = line.strip().split(',', 1)  # Séparer l'ID du reste
-        # Si l'ID n'est pas un nombre, on met 0
-        file_id = line_parts[0] if line_parts[0].isdigit() else 0
-        # Si la deuxième partie n'est pas vide, on l'affecte à text, sinon on récupère la première partie (pas d'id)
-        text = line_parts[1] if len(line_parts) > 1 else line_parts[0]
-
+    for file_id, text in read_dataset(file_path):
         # Extraction des entités "DEPARTURE" et "DESTINATION"
         itineraire = extract_departure_destination(text, nlp_lang, nlp_itineraire)
 
-        #  Formatage des outputs
-        if itineraire == "NOT_FRENCH" or itineraire == "NOT_TRIP":
-            # print(f"{file_id},{itineraire}")
-            # Ajout à outputTriplets
-            # ex.: '5,NOT_TRIP',
-            outputTriplets.append(f"{file_id},{itineraire}")
-        else:
-            # print(f"{file_id},{itineraire['departure']},{itineraire['destination']}")
-            # Ajout à outputTriplets
-            outputTriplets.append(f"{file_id},{itineraire['departure']},{itineraire['destination']}")  # ex.: '3,Bordeaux,Tours',
+        #  Formatage des outputs et ajout à outputTriplets
+        outputTriplets.append(format_triplet(file_id, itineraire))
 
     if verbose:
         print("Triplets extraits : ")
@@ -146,11 +197,10 @@ def compare_triplets(output_triplets, reference_triplets):
 def preprocess_triplets(triplets, fichier_villes = 'liste_villes_500.txt', verbose=True):
 
     # On convertit en majuscules et on remplace les caractères accentués, les apostrophes, les tirets et les underscores par des espaces
-    preprocessed_triplets = [line.upper().replace('É', 'E').replace('È', 'E').replace('Ê', 'E').replace('À', 'A').replace('Ù', 'U').replace('Û', 'U').replace('Ô', 'O').replace('Î', 'I').replace('Ï', 'I').replace('Ë', 'E').replace('Ç', 'C').replace('\'', ' ').replace('-', ' ').replace('_', ' ') for line in triplets]
+    preprocessed_triplets = [normalize(line) for line in triplets]
 
-    with open(fichier_villes, 'r') as file:
-    # Lire toutes les lignes du fichier dans une liste
-        liste_villes = file.read().splitlines()
+    # Index des villes, construit une seule fois par fichier
+    city_matcher = CityMatcher.from_file(fichier_villes)
 
     # Récupère la meilleure correspondance pour chaque item de chaque triplet dans la liste de villes. S'il n'y a pas de correspondance, on met le triplet tel quel
     if verbose:
@@ -162,7 +212,8 @@ def preprocess_triplets(triplets, fichier_villes = 'liste_villes_500.txt', verbo
     for triplet in preprocessed_triplets:
         triplet_split = triplet.split(',')
         # Recombine les éléments du triplet en une seule chaîne de caractères
-        corrected_triplet = ','.join([difflib.get_close_matches(item, liste_villes, n=1, cutoff=0.8)[0] if difflib.get_close_matches(item, liste_villes, n=1, cutoff=0.8) else item for item in triplet_split])
+        with stage('fuzzy_correction'):
+            corrected_triplet = ','.join([city_matcher.best_match(item, cutoff=0.8) or item for item in triplet_split])
         if verbose:
             print("triplet corrigé : " + corrected_triplet)
         corrected_triplets.append(corrected_triplet)
@@ -176,10 +227,10 @@ def preprocess_triplets(triplets, fichier_villes = 'liste_villes_500.txt', verbo
     return preprocessed_triplets
 
 
-# Créer une fonction qui retourne departure, destination
+# Créer une fonction qui retourne departure, escales..., destination
 def departure_destination(text, nlp_lang, nlp_itineraire, fichier_villes = 'liste_villes_500.txt', verbose=False) :
 
-    # Extraction des entités "DEPARTURE" et "DESTINATION" du texte
+    # Extraction des entités "DEPARTURE", "ESCALE" et "DESTINATION" du texte
     itineraire = extract_departure_destination(text, nlp_lang, nlp_itineraire, verbose=verbose)
     if verbose:
         print("itineraire trouvé : ")
@@ -191,7 +242,7 @@ def departure_destination(text, nlp_lang, nlp_itineraire, fichier_villes = 'list
 
     else:
         # Ajoute "1" au début de itineraire pour avoir le même format que les triplets
-        itineraire = "1," + itineraire['departure'] + "," + itineraire['destination']
+        itineraire = format_triplet(1, itineraire)
 
 
         # Prétraitement des triplets
@@ -200,4 +251,24 @@ def departure_destination(text, nlp_lang, nlp_itineraire, fichier_villes = 'list
         # On sépare les éléments du triplet
         itineraire_traite = itineraire_traite[0].split(',')
 
-        return itineraire_traite[1], itineraire_traite[2] # On retourne l'élément 1 et 2 (départ et destination)
\ No newline at end of file
+        return tuple(itineraire_traite[1:]) # On retourne le départ, les escales et la destination, dans l'ordre
+
+
+# -------------------------------------------------------------------------------
+# Fonction qui retourne departure, escales..., destination pour une liste de textes, les deux modèles étant appliqués par lots
+# -------------------------------------------------------------------------------
+def departure_destination_batch(texts, nlp_lang, nlp_itineraire, fichier_villes = 'liste_villes_500.txt', batch_size=256):
+
+    # Pour chaque texte : (départ, escales..., destination), ou None si on n'a pas trouvé d'itinéraire (comme departure_destination)
+    results = []
+    for triplet in process_batch(enumerate(texts), nlp_lang, nlp_itineraire, batch_size=batch_size):
+        # Triplet sans départ ni destination : NOT_FRENCH ou NOT_TRIP
+        if len(triplet.split(',')) < 3:
+            results.append(None)
+            continue
+
+        # Prétraitement du triplet et correction des villes
+        itineraire_traite = preprocess_triplets([triplet], fichier_villes, verbose=False)[0].split(',')
+        results.append(tuple(itineraire_traite[1:]))
+
+    return results
@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Tokenizer chargé une fois par processus par init_worker
+_nlp = None
+
+def init_worker(lang: str = 'fr') -> None:
+    """Loads a blank tokenizer in a worker process.
+
+    The trained pipeline (config.cfg) uses the default tokenizer of the
+    language, so a blank pipeline tokenizes the sentences exactly like it,
+    without loading the md model.
+    """
+    global _nlp
+    import spacy
+    _nlp = spacy.blank(lang)
+
+def iter_annotations(path: str, key: str = 'annotations', chunk_size: int = 1 << 16):
+    """Streams (text, {"entities": [[start, end, label], ...]}) annotations from a dataset file.
+
+    Two formats are read without loading the whole file: the
+    `{"classes": [...], "annotations": [...]}` JSON document of
+    datasets/training_data.json, decoded one annotation at a time, and JSON
+    Lines files (.jsonl), one annotation per line.
+
+    Args:
+        path (str): Dataset file
+        key (str): Key of the annotation array in a JSON document
+        chunk_size (int): Characters read at once
+
+    Yields:
+        list: [text, annotation]
+
+    Raises:
+        ValueError: If the file is truncated or the annotation array is missing
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer = ''
+        # Recherche du début du tableau d'annotations
+        while True:
+            position = buffer.find(f'"{key}"')
+            start = buffer.find('[', position) if position != -1 else -1
+            if start != -1:
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError(f"Tableau '{key}' introuvable dans {path}")
+            buffer += chunk
+        position = start + 1
+
+        # Décodage d'une annotation à la fois, le tampon n'est recopié qu'au moment de le compléter
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if buffer.startswith(']', position):
+                return
+            try:
+                annotation, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"Fichier {path} tronqué")
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield annotation
+
+def is_dev(text: str, dev_ratio: float, seed: int = 0) -> bool:
+    """Assigns a sentence to the dev set from a hash of its text.
+
+    The split needs neither the whole dataset nor a shuffle, it does not
+    depend on the sharding, and duplicated sentences always land in the
+    same set.
+
+    Args:
+        text (str): Sentence
+        dev_ratio (float): Share of sentences in the dev set
+        seed (int): Seed of the split
+
+    Returns:
+        bool: True for the dev set, False for the train set
+    """
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8, key=str(seed).encode('utf-8')).digest()
+    return int.from_bytes(digest, 'big') < dev_ratio * 2 ** 64
+
+def make_doc(nlp, text: str, annotation: dict) -> tuple:
+    """Tokenizes a sentence and sets its entities.
+
+    Returns:
+        tuple: (Doc, number of entities that do not fall on token boundaries and were skipped)
+    """
+    doc = nlp.make_doc(text)
+    ents = []
+    skipped = 0
+    for start, end, label in annotation['entities']:
+        span = doc.char_span(start, end, label=label, alignment_mode='contract')
+        if span is None:
+            skipped += 1
+        else:
+            ents.append(span)
+    doc.ents = ents
+    return doc, skipped
+
+def compile_shard(index: int, annotations: list, output_dir: str, dev_ratio: float, seed: int = 0) -> dict:
+    """Converts a chunk of annotations to one train and one dev DocBin shard.
+
+    Args:
+        index (int): Shard number, used in the file names
+        annotations (list): List of [text, annotation]
+        output_dir (str): Directory holding the train/ and dev/ shards
+        dev_ratio (float): Share of sentences in the dev set
+        seed (int): Seed of the split
+
+    Returns:
+        dict: Number of train and dev sentences and of skipped entities
+    """
+    from spacy.tokens import DocBin
+
+    if _nlp is None:
+        init_worker()
+    doc_bins = {'train': DocBin(), 'dev': DocBin()}
+    skipped = 0
+    for text, annotation in annotations:
+        doc, doc_skipped = make_doc(_nlp, text, annotation)
+        skipped += doc_skipped
+        doc_bins['dev' if is_dev(text, dev_ratio, seed) else 'train'].add(doc)
+    for split, doc_bin in doc_bins.items():
+        if len(doc_bin):
+            doc_bin.to_disk(os.path.join(output_dir, split, f'{index:05d}.spacy'))
+    return {'train': len(doc_bins['train']), 'dev': len(doc_bins['dev']), 'skipped_entities': skipped}
+
+def compile_dataset(input_path: str, output_dir: str, dev_ratio: float = 0.2, seed: int = 0, workers: int | None = None, shard_size: int = 10000, max_pending: int | None = None) -> dict:
+    """Streams a dataset through a process pool into sharded train and dev DocBin files.
+
+    Annotations are read in chunks of shard_size and each chunk becomes one
+    shard per set, written by the worker that converted it. At most
+    max_pending chunks are in flight, so memory stays bounded whatever the
+    size of the dataset. `spacy train` reads every shard of a directory:
+    `--paths.train <output_dir>/train --paths.dev <output_dir>/dev`.
+    spaCy shuffles the training examples at every epoch, the shards are not
+    shuffled.
+
+    Args:
+        input_path (str): Dataset file (see iter_annotations)
+        output_dir (str): Output directory, its train/ and dev/ subdirectories are replaced
+        dev_ratio (float): Share of sentences in the dev set
+        seed (int): Seed of the split
+        workers (int | None): Number of worker processes, None for one per core, 0 to compile in this process
+        shard_size (int): Sentences per chunk
+        max_pending (int | None): Chunks in flight, defaults to twice the number of workers
+
+    Returns:
+        dict: Number of sentences, train and dev sentences, skipped entities, shards and elapsed seconds
+    """
+    stats = {'sentences': 0, 'train': 0, 'dev': 0, 'skipped_entities': 0, 'shards': 0}
+    start = time.perf_counter()
+    for split in ('train', 'dev'):
+        shutil.rmtree(os.path.join(output_dir, split), ignore_errors=True)
+        os.makedirs(os.path.join(output_dir, split))
+
+    def add(result):
+        for name, value in result.items():
+            stats[name] += value
+        stats['sentences'] += result['train'] + result['dev']
+
+    annotations = iter_annotations(input_path)
+    chunks = enumerate(iter(lambda: list(itertools.islice(annotations, shard_size)), []))
+    if workers == 0:
+        for index, chunk in chunks:
+            add(compile_shard(index, chunk, output_dir, dev_ratio, seed))
+            stats['shards'] += 1
+    else:
+        workers = workers or os.cpu_count()
+        max_pending = max_pending or 2 * workers
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            pending = deque()
+            for index, chunk in chunks:
+                if len(pending) >= max_pending:
+                    add(pending.popleft().result())
+                pending.append(executor.submit(compile_shard, index, chunk, output_dir, dev_ratio, seed))
+                stats['shards'] += 1
+            while pending:
+                add(pending.popleft().result())
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+if __name__ == '__main__':
+    # python -m NLP.modules_nlp.training_data NLP/datasets/training_data.json NLP/corpus
+    parser = argparse.ArgumentParser(description="Compile un jeu de données annoté en fichiers DocBin d'entraînement et de validation.")
+    parser.add_argument('input', help="Jeu de données (.json ou .jsonl)")
+    parser.add_argument('output', help="Dossier de sortie (sous-dossiers train/ et dev/)")
+    parser.add_argument('--dev-ratio', type=float, default=0.2, help="Part des phrases de validation")
+    parser.add_argument('--seed', type=int, default=0, help="Graine du découpage")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus (0: pas de pool)")
+    parser.add_argument('--shard-size', type=int, default=10000, help="Phrases par fichier")
+    args = parser.parse_args()
+
+    stats = compile_dataset(args.input, args.output, args.dev_ratio, args.seed, args.workers, args.shard_size)
+    print(f"{stats['sentences']} phrases ({stats['train']} entraînement, {stats['dev']} validation) en {stats['shards']} fichiers, "
+          f"{stats['skipped_entities']} entités ignorées, {stats['sentences'] / stats['seconds']:.0f} phrases/s")
@@ -0,0 +1,223 @@
+import os
+import tempfile
+from functools import cached_property
+
+import numpy as np
+import networkx as nx
+
+# Bump when the layout of the snapshot file changes
+SNAPSHOT_VERSION = 1
+
+class CompactGraph:
+    """Integer-indexed, read-only view of a weighted undirected graph.
+
+    Updates (see with_edges) produce a new graph, so searches running on a
+    graph always see one consistent version of it.
+
+    Cities are interned to contiguous integer ids. Adjacency is stored in CSR
+    form: the neighbours of node ``i`` are ``indices[indptr[i]:indptr[i + 1]]``
+    and the matching edge weights are ``weights[indptr[i]:indptr[i + 1]]``.
+    Coordinates are stored in a contiguous ``(n, 2)`` float array.
+    """
+
+    def __init__(self, names: list, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray, coords: np.ndarray):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64)
+
+    @cached_property
+    def adjacency(self) -> list:
+        """Plain Python adjacency lists of (neighbor, weight), built on first use.
+
+        They avoid numpy scalar boxing in the search loops.
+        """
+        indices, weights = self.indices.tolist(), self.weights.tolist()
+        return [
+            list(zip(indices[start:end], weights[start:end]))
+            for start, end in zip(self.indptr[:-1].tolist(), self.indptr[1:].tolist())
+        ]
+
+    @classmethod
+    def from_networkx(cls, graph: nx.Graph) -> 'CompactGraph':
+        """Builds a compact graph from a networkx graph.
+
+        Args:
+            graph (nx.Graph): Graph whose nodes have a 'pos' attribute and edges a 'weight' attribute
+
+        Returns:
+            CompactGraph: Compact representation of the graph
+        """
+        names = list(graph.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        indptr = np.zeros(len(names) + 1, dtype=np.int32)
+        indices = []
+        weights = []
+        for i, name in enumerate(names):
+            for neighbor, data in graph[name].items():
+                indices.append(index[neighbor])
+                weights.append(data['weight'])
+            indptr[i + 1] = len(indices)
+        coords = np.array([graph.nodes[name].get('pos', (np.nan, np.nan)) for name in names], dtype=np.float64)
+        return cls(names, indptr, np.array(indices, dtype=np.int32), np.array(weights, dtype=np.float64), coords.reshape(-1, 2))
+
+    def to_networkx(self) -> nx.Graph:
+        """Builds the equivalent networkx graph, with 'pos' node and 'weight' edge attributes.
+
+        Returns:
+            nx.Graph: Graph
+        """
+        graph = nx.Graph()
+        for name, pos in zip(self.names, self.coords.tolist()):
+            graph.add_node(name, pos=tuple(pos))
+        sources = np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+        graph.add_weighted_edges_from(
+            (self.names[u], self.names[v], w)
+            for u, v, w in zip(sources.tolist(), self.indices.tolist(), self.weights.tolist())
+        )
+        graph.graph['compact'] = self
+        return graph
+
+    def save(self, path: str, fingerprint: str) -> None:
+        """Writes the graph to a versioned binary snapshot.
+
+        The file is written next to its destination and moved in place, so
+        concurrent readers never see a partial snapshot.
+
+        Args:
+            path (str): Snapshot file path
+            fingerprint (str): Fingerprint of the data files the graph was built from
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    version=np.array(SNAPSHOT_VERSION),
+                    fingerprint=np.array(fingerprint),
+                    names=np.array(self.names, dtype=str),
+                    indptr=self.indptr,
+                    indices=self.indices,
+                    weights=self.weights,
+                    coords=self.coords,
+                )
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> 'CompactGraph | None':
+        """Reads a binary snapshot written by save.
+
+        Args:
+            path (str): Snapshot file path
+            fingerprint (str): Expected fingerprint of the data files
+
+        Returns:
+            CompactGraph: Graph
+            None: If the snapshot is missing, from another version or built from other data files
+        """
+        try:
+            with np.load(path, allow_pickle=False) as snapshot:
+                if int(snapshot['version']) != SNAPSHOT_VERSION or str(snapshot['fingerprint']) != fingerprint:
+                    return None
+                return cls(
+                    snapshot['names'].tolist(),
+                    snapshot['indptr'],
+                    snapshot['indices'],
+                    snapshot['weights'],
+                    snapshot['coords'],
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @property
+    def node_count(self) -> int:
+        """Number of nodes in the graph."""
+        return len(self.names)
+
+    def node_id(self, name: str) -> int:
+        """Returns the integer id of a city.
+
+        Args:
+            name (str): City name
+
+        Returns:
+            int: Node id
+
+        Raises:
+            KeyError: If the city is not in the graph
+        """
+        return self.index[name]
+
+    def edge_weight(self, u: int, v: int) -> float | None:
+        """Returns the weight of the edge between two node ids.
+
+        Args:
+            u (int): First node id
+            v (int): Second node id
+
+        Returns:
+            float: Weight of the edge
+            None: If the nodes are not adjacent
+        """
+        for neighbor, weight in self.adjacency[u]:
+            if neighbor == v:
+                return weight
+        return None
+
+    def with_edges(self, changes: dict) -> 'CompactGraph':
+        """Returns a copy of the graph with edges changed, added or removed, the graph itself is left unchanged.
+
+        Only the adjacency rows of the changed nodes are rebuilt, the other
+        rows are shared with this graph.
+
+        Args:
+            changes (dict): {(u, v): weight} on node ids, for both directions. A None weight removes the edge
+
+        Returns:
+            CompactGraph: Updated graph
+        """
+        rows = {}
+        for (u, v), weight in changes.items():
+            for a, b in ((u, v), (v, u)):
+                row = rows.setdefault(a, dict(self.adjacency[a]))
+                if weight is None:
+                    row.pop(b, None)
+                else:
+                    row[b] = weight
+        adjacency = list(self.adjacency)
+        lengths = np.diff(self.indptr)
+        # CSR arrays: the unchanged spans are copied between the rebuilt rows
+        indices, weights = [], []
+        start = 0
+        for node in sorted(rows):
+            adjacency[node] = list(rows[node].items())
+            lengths[node] = len(adjacency[node])
+            indices += [self.indices[self.indptr[start]:self.indptr[node]], np.array(list(rows[node]), dtype=np.int32)]
+            weights += [self.weights[self.indptr[start]:self.indptr[node]], np.array(list(rows[node].values()), dtype=np.float64)]
+            start = node + 1
+        indices.append(self.indices[self.indptr[start]:])
+        weights.append(self.weights[self.indptr[start]:])
+
+        indptr = np.concatenate(([0], np.cumsum(lengths)))
+        graph = CompactGraph(self.names, indptr, np.concatenate(indices), np.concatenate(weights), self.coords)
+        # Seeds the cached property, the rows already hold plain Python values
+        graph.__dict__['adjacency'] = adjacency
+        return graph
+
+    def to_names(self, path: list) -> list:
+        """Maps a path of node ids back to city names.
+
+        Args:
+            path (list): List of node ids
+
+        Returns:
+            list: List of city names
+        """
+        return [self.names[i] for i in path]
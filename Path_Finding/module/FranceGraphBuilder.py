@@ -1,6 +1,10 @@
 import networkx as nx
-import pandas as pd
+import csv
 import json
+import hashlib
+import os
+
+from .CompactGraph import CompactGraph
 
 class FranceGraphBuilder:
     def __init__(self, city_data_file='module/data/fr.csv', graph_data_file='module/data/fr.json'):
@@ -9,10 +13,16 @@ class FranceGraphBuilder:
 
     def create_graph(self) -> nx.Graph:
         """Creates a graph from the city data and graph data files.
+
+        The compact integer-indexed representation used by GraphAlgorithms
+        is attached to the graph as graph.graph['compact'].
         
         Returns:
             nx.Graph: Graph of France
         """
+        # pandas is only needed to parse the CSV, snapshot loads skip the import
+        import pandas as pd
+
         graph = nx.Graph()
         df = pd.read_csv(self.city_data_file)
         for _, row in df.iterrows():
@@ -29,4 +39,43 @@ class FranceGraphBuilder:
                     graph.add_edge(summit, to_summit, weight=weight)
 
         graph.remove_nodes_from(list(nx.isolates(graph)))
-        return graph
\ No newline at end of file
+        graph.graph['compact'] = CompactGraph.from_networkx(graph)
+        return graph
+
+    def create_compact_graph(self, cache_directory: str) -> CompactGraph:
+        """Loads the compact graph from its binary snapshot, creating the snapshot if it is missing or stale.
+
+        Args:
+            cache_directory (str): Directory holding the snapshot
+
+        Returns:
+            CompactGraph: Compact graph of France
+        """
+        fingerprint = self.fingerprint()
+        snapshot_path = os.path.join(cache_directory, 'graph.npz')
+        compact = CompactGraph.load(snapshot_path, fingerprint)
+        if compact is None:
+            compact = self.create_graph().graph['compact']
+            compact.save(snapshot_path, fingerprint)
+        return compact
+
+    def load_places(self) -> dict:
+        """Reads the coordinates of every city of the city data file, including the ones without edges.
+
+        Returns:
+            dict: {city: (lat, lng)}
+        """
+        with open(self.city_data_file, newline='', encoding='utf-8') as f:
+            return {row['city']: (float(row['lat']), float(row['lng'])) for row in csv.DictReader(f)}
+
+    def fingerprint(self) -> str:
+        """Computes a fingerprint of the city data and graph data files.
+
+        Returns:
+            str: SHA-256 hex digest of both files' contents
+        """
+        digest = hashlib.sha256()
+        for path in (self.city_data_file, self.graph_data_file):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
@@ -1,11 +1,454 @@
 import heapq
+import itertools
+import threading
 import numpy as np
 import networkx as nx
 
+from .CompactGraph import CompactGraph
+from .LandmarkHeuristic import LandmarkHeuristic
+from .RouteCache import RouteCache, ShortestPathTree
+from .ShortestPathTable import ShortestPathTable
+from .SpatialIndex import SpatialIndex
+
+# order_stops tries every order of the intermediate stops: 7 stops are 5040 orders
+MAX_REORDERED_STOPS = 7
+# Nearest routable cities considered for a city outside of the graph
+SNAP_CANDIDATES = 3
+
 class GraphAlgorithms:
-    def __init__(self, graph):
-        self.graph = graph
+    def __init__(self, graph: nx.Graph | None = None, compact: CompactGraph | None = None, route_cache: RouteCache | None = None, places: dict | None = None):
+        # The networkx graph is kept for drawing and debug cross-checks,
+        # searches run on the compact integer-indexed representation.
+        # Either one can be given, the networkx graph is rebuilt on first use when only compact is.
+        # places holds the (lat, lng) of cities outside of the graph, they are routed from their nearest nodes.
+        self._graph = graph
+        if compact is None:
+            compact = graph.graph.get('compact') or CompactGraph.from_networkx(graph)
+        self.compact = compact
+        self.table = None
+        self.landmarks = None
+        self.route_cache = route_cache if route_cache is not None else RouteCache()
+        self.places = places or {}
+        self._spatial_index = None
+        # Serializes update_edges, queries are not blocked
+        self._update_lock = threading.Lock()
+
+    @property
+    def graph(self) -> nx.Graph:
+        """networkx graph, used for drawing and debug cross-checks."""
+        if self._graph is None:
+            self._graph = self.compact.to_networkx()
+        return self._graph
         
+    def load_table(self, fingerprint: str, directory: str) -> None:
+        """Opens the precomputed all-pairs table, building it first if the data files changed.
+
+        Args:
+            fingerprint (str): Fingerprint of the data files (see FranceGraphBuilder.fingerprint)
+            directory (str): Directory holding the persisted tables
+        """
+        self.table = ShortestPathTable.open(self.compact, fingerprint, directory)
+
+    def table_path(self, source: str, target: str) -> list | None:
+        """Looks up the shortest path in the precomputed all-pairs table.
+
+        Args:
+            source (str): Start node
+            target (str): Goal node
+
+        Returns:
+            path (list): List of nodes in the path
+            None: If no path is found
+
+        Raises:
+            RuntimeError: If load_table was not called
+        """
+        if self.table is None:
+            raise RuntimeError("The shortest path table is not loaded, call load_table first.")
+        compact = self.compact
+        path = self.table.path(compact.node_id(source), compact.node_id(target))
+        return None if path is None else compact.to_names(path)
+
+    def cached_path(self, source: str, target: str) -> list | None:
+        """Finds the shortest path using cached shortest path trees.
+
+        The first query from a city computes its whole shortest path tree.
+        Later queries from or to that city (the graph is undirected) only
+        walk the tree.
+
+        Args:
+            source (str): Start node
+            target (str): Goal node
+
+        Returns:
+            path (list): List of nodes in the path
+            None: If no path is found
+        """
+        # Read once: update_edges may swap the graph while the query runs
+        compact = self.compact
+        source_id, target_id = compact.node_id(source), compact.node_id(target)
+        tree = self.route_cache.get(compact, source_id)
+        if tree is not None:
+            self.route_cache.record(hit=True)
+            path = tree.path_to(target_id)
+            path = None if path is None else path[::-1]
+        else:
+            tree = self.route_cache.get(compact, target_id)
+            if tree is not None:
+                self.route_cache.record(hit=True)
+                # The tree rooted at target already walks from source to target
+                path = tree.path_to(source_id)
+            else:
+                self.route_cache.record(hit=False)
+                tree = ShortestPathTree(source_id, *self._single_source_dijkstra(source_id, compact))
+                self.route_cache.put(compact, tree)
+                path = tree.path_to(target_id)
+                path = None if path is None else path[::-1]
+        return None if path is None else compact.to_names(path)
+
+    def multi_stop_path(self, stops: list, reorder: bool = False) -> list | None:
+        """Finds the shortest route from a departure to a destination through intermediate stops.
+
+        Consecutive legs share their search work: the graph is undirected, so
+        the shortest path tree rooted at an intermediate stop answers both the
+        leg arriving at it and the leg leaving it. n legs need about n / 2
+        trees instead of n searches, and the trees go through the route cache,
+        so stops shared with earlier queries cost nothing. With the
+        precomputed table loaded, legs are table lookups.
+
+        Args:
+            stops (list): Departure, intermediate stops and destination
+            reorder (bool): Visit the intermediate stops in the order minimizing the total distance (see order_stops)
+
+        Returns:
+            path (list): List of nodes in the path, through every stop
+            None: If a leg has no path
+        """
+        # Read once: update_edges may swap the graph while the query runs
+        compact = self.compact
+        if reorder:
+            stops = self.order_stops(stops, compact)
+        ids = [compact.node_id(stop) for stop in stops]
+        path = ids[:1]
+        for i in range(len(ids) - 1):
+            # Trees are rooted at every other stop so that each one serves two legs, never at the destination unless there is a single leg
+            root = i + 1 if i % 2 == 0 else i
+            if root == len(ids) - 1 and i > 0:
+                root = i
+            leg = self._leg(ids[i], ids[i + 1], ids[root], compact)
+            if leg is None:
+                return None
+            path += leg[1:]
+        return compact.to_names(path)
+
+    def order_stops(self, stops: list, compact: CompactGraph | None = None) -> list:
+        """Orders the intermediate stops to minimize the total distance, the departure and destination stay in place.
+
+        Every order is tried, so at most MAX_REORDERED_STOPS intermediate stops
+        are accepted. Distances come from the table if it is loaded, otherwise
+        from the trees of the intermediate stops, which multi_stop_path then
+        reuses through the route cache.
+
+        Args:
+            stops (list): Departure, intermediate stops and destination
+            compact (CompactGraph | None): Graph version to search, the current one by default
+
+        Returns:
+            list: The stops in visiting order
+
+        Raises:
+            ValueError: If there are more than MAX_REORDERED_STOPS intermediate stops
+        """
+        if len(stops) <= 3:
+            return list(stops)
+        if len(stops) - 2 > MAX_REORDERED_STOPS:
+            raise ValueError(f"Cannot reorder more than {MAX_REORDERED_STOPS} intermediate stops, got {len(stops) - 2}.")
+        compact = compact or self.compact
+        ids = [compact.node_id(stop) for stop in stops]
+        # distances[i][j]: distance between stops i and j, for i an intermediate stop
+        if self.table is not None:
+            distances = np.array([[self.table.distance(source, target) for target in ids] for source in ids])
+        else:
+            distances = np.full((len(ids), len(ids)), np.inf)
+            for i in range(1, len(ids) - 1):
+                distances[i] = self._shortest_path_tree(ids[i], compact).dist[ids]
+            distances[:, 1:-1] = distances[1:-1].T
+        destination = len(ids) - 1
+        best = min(
+            itertools.permutations(range(1, destination)),
+            key=lambda order: distances[0, order[0]] + sum(distances[a, b] for a, b in zip(order, order[1:])) + distances[order[-1], destination]
+        )
+        return [stops[0]] + [stops[i] for i in best] + [stops[-1]]
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """KD-tree over the node coordinates, built on first use. Updates never move nodes, it stays valid."""
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex.from_graph(self.compact)
+        return self._spatial_index
+
+    def can_snap(self, city: str) -> bool:
+        """Checks if a city outside of the graph has coordinates, so it can be routed from its nearest nodes."""
+        return city in self.places and all(np.isfinite(self.places[city]))
+
+    def snap(self, cities: list, k: int = SNAP_CANDIDATES, compact: CompactGraph | None = None) -> list:
+        """Finds the nearest nodes of each city, the cities outside of the graph being looked up in one batch.
+
+        Args:
+            cities (list): Cities, in the graph or in places
+            k (int): Nearest nodes per city outside of the graph
+            compact (CompactGraph | None): Graph version to search, the current one by default
+
+        Returns:
+            list: For each city, a list of (node id, connector distance in kilometres) by increasing distance.
+                A city of the graph is its own single node, at distance 0
+
+        Raises:
+            KeyError: If a city is neither in the graph nor in places
+        """
+        index = (compact or self.compact).index
+        snapped = [[(index[city], 0.0)] if city in index else None for city in cities]
+        outside = [i for i, candidates in enumerate(snapped) if candidates is None]
+        if outside:
+            distances, ids = self.spatial_index.nearest([self.places[cities[i]] for i in outside], k)
+            for i, row_distances, row_ids in zip(outside, distances.tolist(), ids.tolist()):
+                snapped[i] = [(node, distance) for node, distance in zip(row_ids, row_distances) if node != -1]
+        return snapped
+
+    def snapped_path(self, stops: list, k: int = SNAP_CANDIDATES, stats: dict | None = None) -> list | None:
+        """Finds the shortest route through stops, some of them outside of the graph.
+
+        A city outside of the graph is connected to one of its k nearest
+        nodes by a straight connector, counted twice for an intermediate
+        stop (there and back). The connecting node of every stop is chosen
+        to minimize the total distance, connectors included. Stops are
+        visited in the given order.
+
+        Args:
+            stops (list): Departure, intermediate stops and destination
+            k (int): Nearest nodes considered for each city outside of the graph
+            stats (dict | None): If given, receives the total distance under 'distance' and, under 'connectors',
+                {city: (connecting node, connector distance)} for the cities outside of the graph
+
+        Returns:
+            path (list): List of cities, each one outside of the graph next to its connecting node
+            None: If no route is found
+
+        Raises:
+            KeyError: If a stop is neither in the graph nor in places
+        """
+        # Read once: update_edges may swap the graph while the query runs
+        compact = self.compact
+        candidates = self.snap(stops, k, compact)
+        if not all(candidates):
+            # City outside of the graph without coordinates
+            return None
+        last = len(stops) - 1
+        # costs[j]: shortest distance to candidate j of the current stop, choices[i][j]: best candidate of stop i - 1 for it
+        costs = [connector for _, connector in candidates[0]]
+        choices = []
+        for i in range(1, len(stops)):
+            weight = 1 if i == last else 2
+            next_costs, next_choices = [], []
+            for node, connector in candidates[i]:
+                options = [cost + self._distance(previous, node, compact) for cost, (previous, _) in zip(costs, candidates[i - 1])]
+                best = int(np.argmin(options))
+                next_costs.append(options[best] + weight * connector)
+                next_choices.append(best)
+            costs = next_costs
+            choices.append(next_choices)
+        best = int(np.argmin(costs))
+        if costs[best] == float('inf'):
+            return None
+        positions = [best]
+        for next_choices in reversed(choices):
+            positions.append(next_choices[positions[-1]])
+        nodes = [candidates[i][position][0] for i, position in enumerate(reversed(positions))]
+
+        path = []
+        for i, (stop, node) in enumerate(zip(stops, nodes)):
+            outside = stop not in compact.index
+            if i == 0:
+                path += [stop, compact.names[node]] if outside else [stop]
+                continue
+            if node != nodes[i - 1]:
+                path += compact.to_names(self._leg(nodes[i - 1], node, nodes[i - 1], compact)[1:])
+            if outside:
+                path += [stop, compact.names[node]] if i < last else [stop]
+        if stats is not None:
+            stats['distance'] = costs[best]
+            stats['connectors'] = {
+                stop: (compact.names[node], dict(candidates[i])[node])
+                for i, (stop, node) in enumerate(zip(stops, nodes)) if stop not in compact.index
+            }
+        return path
+
+    def _distance(self, source: int, target: int, compact: CompactGraph | None = None) -> float:
+        """Shortest distance between two node ids, from the table if loaded or the tree rooted at source."""
+        if self.table is not None:
+            return self.table.distance(source, target)
+        return float(self._shortest_path_tree(source, compact).dist[target])
+
+    def _leg(self, source: int, target: int, root: int, compact: CompactGraph | None = None) -> list | None:
+        """Shortest path between two node ids, walking the tree rooted at one of them (or the table if loaded).
+
+        Returns:
+            path (list): Node ids from source to target
+            None: If no path is found
+        """
+        if self.table is not None:
+            return self.table.path(source, target)
+        tree = self._shortest_path_tree(root, compact)
+        if root == source:
+            path = tree.path_to(target)
+            return None if path is None else path[::-1]
+        return tree.path_to(source)
+
+    def _shortest_path_tree(self, source: int, compact: CompactGraph | None = None) -> ShortestPathTree:
+        """Returns the shortest path tree rooted at a node id on compact or the current graph, from the route cache or computed and cached."""
+        compact = compact or self.compact
+        tree = self.route_cache.get(compact, source)
+        self.route_cache.record(hit=tree is not None)
+        if tree is None:
+            tree = ShortestPathTree(source, *self._single_source_dijkstra(source, compact))
+            self.route_cache.put(compact, tree)
+        return tree
+
+    def update_edges(self, changes: list, repair: bool = True) -> dict:
+        """Changes, adds or removes edges while the graph is being queried.
+
+        The update builds a new version of the compact graph and swaps it in,
+        queries already running finish on the version they started with.
+        Cached shortest path trees are repaired instead of dropped: a tree is
+        kept as is when no changed edge can alter it, otherwise only the nodes
+        whose distance may change are searched again (see _repair_tree).
+
+        The precomputed table and the landmarks describe the previous
+        version, they are detached: queries fall back to the route cache and
+        prepare_landmarks must be called again.
+
+        Args:
+            changes (list): (city, city, weight) triplets. A None weight removes the edge
+            repair (bool): Repair the cached trees, otherwise drop them all
+
+        Returns:
+            dict: Number of edges changed, and of cached trees kept, repaired and dropped
+
+        Raises:
+            KeyError: If a city is not in the graph
+            ValueError: If a weight is negative or a removed edge does not exist. No change is applied then
+        """
+        with self._update_lock:
+            compact = self.compact
+            edges = {}
+            for u, v, weight in changes:
+                u, v = compact.node_id(u), compact.node_id(v)
+                if weight is not None and weight < 0:
+                    raise ValueError(f"Negative weight {weight} for edge {compact.names[u]} - {compact.names[v]}.")
+                edges[min(u, v), max(u, v)] = weight
+
+            updated, increased, decreased = {}, [], []
+            for (u, v), weight in edges.items():
+                current = compact.edge_weight(u, v)
+                if weight is None and current is None:
+                    raise ValueError(f"No edge between {compact.names[u]} and {compact.names[v]}.")
+                if weight == current:
+                    continue
+                updated[u, v] = weight
+                if weight is None or (current is not None and weight > current):
+                    increased.append((u, v))
+                else:
+                    decreased.append((u, v, weight))
+            if not updated:
+                return {'edges': 0, 'kept': 0, 'repaired': 0, 'dropped': 0}
+
+            new_compact = compact.with_edges(updated)
+            if repair:
+                repair_tree = lambda tree: self._repair_tree(tree, increased, decreased, new_compact)
+            else:
+                repair_tree = lambda tree: None
+            counts = self.route_cache.update(compact, new_compact, repair_tree)
+            self.compact = new_compact
+            self.table = None
+            self.landmarks = None
+            self._graph = None
+            return dict(counts, edges=len(updated))
+
+    def set_edge(self, u: str, v: str, weight: float) -> dict:
+        """Sets the weight of an edge, adding it if needed (see update_edges)."""
+        return self.update_edges([(u, v, weight)])
+
+    def remove_edge(self, u: str, v: str) -> dict:
+        """Removes an edge (see update_edges)."""
+        return self.update_edges([(u, v, None)])
+
+    def _repair_tree(self, tree: ShortestPathTree, increased: list, decreased: list, compact: CompactGraph) -> ShortestPathTree:
+        """Repairs a shortest path tree after edge updates.
+
+        An edge that got heavier or was removed only matters if the tree uses
+        it: the subtree below it is cut, and its nodes are reattached from
+        their neighbours outside of it. An edge that got lighter or was added
+        only matters if it shortens the distance of one of its ends. The
+        search then only goes through the nodes whose distance changes.
+
+        Args:
+            tree (ShortestPathTree): Tree on the previous version of the graph
+            increased (list): (u, v) edges made heavier or removed
+            decreased (list): (u, v, weight) edges made lighter or added
+            compact (CompactGraph): Updated graph
+
+        Returns:
+            ShortestPathTree: The same tree if the update does not change it, a repaired copy otherwise
+        """
+        cut_roots = [child for u, v in increased for parent, child in ((u, v), (v, u)) if tree.prev[child] == parent]
+        seeds = [
+            (a, b, weight) for u, v, weight in decreased for a, b in ((u, v), (v, u))
+            if tree.dist[a] + weight < tree.dist[b]
+        ]
+        if not cut_roots and not seeds:
+            return tree
+
+        adjacency = compact.adjacency
+        dist, prev = tree.dist.tolist(), tree.prev.tolist()
+        heap = []
+        if cut_roots:
+            # children of node x: order[starts[x]:ends[x]]
+            order = np.argsort(tree.prev, kind='stable')
+            sorted_prev = tree.prev[order]
+            nodes = np.arange(len(dist))
+            starts, ends = np.searchsorted(sorted_prev, nodes).tolist(), np.searchsorted(sorted_prev, nodes, side='right').tolist()
+            order = order.tolist()
+            cut, stack = [], cut_roots
+            while stack:
+                node = stack.pop()
+                cut.append(node)
+                dist[node], prev[node] = float('inf'), -1
+                stack.extend(order[starts[node]:ends[node]])
+            for node in cut:
+                for neighbor, weight in adjacency[node]:
+                    candidate = dist[neighbor] + weight
+                    if candidate < dist[node]:
+                        dist[node], prev[node] = candidate, neighbor
+                if prev[node] != -1:
+                    heapq.heappush(heap, (dist[node], node))
+        for a, b, weight in seeds:
+            candidate = dist[a] + weight
+            if candidate < dist[b]:
+                dist[b], prev[b] = candidate, a
+                heapq.heappush(heap, (candidate, b))
+
+        while heap:
+            summit_dist, summit = heapq.heappop(heap)
+            if summit_dist > dist[summit]:
+                continue
+            for neighbor, weight in adjacency[summit]:
+                candidate = summit_dist + weight
+                if candidate < dist[neighbor]:
+                    dist[neighbor] = candidate
+                    prev[neighbor] = summit
+                    heapq.heappush(heap, (candidate, neighbor))
+        return ShortestPathTree(tree.source, np.array(dist), np.array(prev, dtype=np.int32))
+
     def draw_graph(self) -> None:
         """Draws the graph.
         """
@@ -35,7 +478,7 @@ class GraphAlgorithms:
         Returns:
             bool: True if node exists, False otherwise
         """
-        return node in self.graph.nodes
+        return node in self.compact.index
 
     def heuristic(self, node: str, goal_node: str) -> float:
         """Heuristic function for A* search algorithm.
@@ -47,38 +490,112 @@ class GraphAlgorithms:
         Returns:
             float: Euclidean distance between two points in a two-dimensional plane
         """
-        pos_node = self.graph.nodes[node]['pos']
-        pos_goal = self.graph.nodes[goal_node]['pos']
-        return ((pos_node[0] - pos_goal[0]) ** 2 + (pos_node[1] - pos_goal[1]) ** 2) ** 0.5
+        compact = self.compact
+        return self._heuristic(compact.node_id(node), compact.node_id(goal_node), compact)
+
+    def _heuristic(self, node: int, goal_node: int, compact: CompactGraph | None = None) -> float:
+        """Heuristic function for A* search algorithm, on node ids."""
+        coords = (compact or self.compact).coords
+        pos_node = coords[node]
+        pos_goal = coords[goal_node]
+        return float(((pos_node[0] - pos_goal[0]) ** 2 + (pos_node[1] - pos_goal[1]) ** 2) ** 0.5)
+
+    def _heuristics(self, goal_node: int, compact: CompactGraph | None = None) -> np.ndarray:
+        """Heuristic function for A* search algorithm, for every node id at once."""
+        coords = (compact or self.compact).coords
+        return np.sqrt(((coords - coords[goal_node]) ** 2).sum(axis=1))
+
+    def prepare_landmarks(self, count: int = 4, use_haversine: bool = True) -> None:
+        """Selects landmark cities and precomputes exact distances to them for the landmark A* heuristic.
+
+        Landmarks are chosen greedily: the city farthest from the centre of the
+        graph first, then repeatedly the city farthest from every landmark
+        already chosen.
+
+        Args:
+            count (int): Number of landmarks
+            use_haversine (bool): Also bound the heuristic by the great-circle distance in kilometres
+        """
+        compact = self.compact
+        coords = compact.coords
+        centre = np.nanmean(coords, axis=0)
+        first = int(np.nanargmax(((coords - centre) ** 2).sum(axis=1)))
+        landmarks = [first]
+        distances = [self._single_source_dijkstra(first, compact)[0]]
+        while len(landmarks) < min(count, compact.node_count):
+            closest = np.min(distances, axis=0)
+            # Unreachable nodes and existing landmarks are never picked
+            closest[~np.isfinite(closest)] = -1
+            closest[landmarks] = -1
+            landmark = int(np.argmax(closest))
+            if closest[landmark] <= 0:
+                break
+            landmarks.append(landmark)
+            distances.append(self._single_source_dijkstra(landmark, compact)[0])
+        self.landmarks = LandmarkHeuristic(compact, landmarks, np.array(distances), use_haversine)
 
-    def astar_search(self, start: str, goal: str) -> list | None:
+    def astar_search(self, start: str, goal: str, use_landmarks: bool = False, stats: dict | None = None, bidirectional: bool = False) -> list | None:
         """A* search algorithm.
         
         Args:
             start (str): Start node
             goal (str): Goal node
+            use_landmarks (bool): Use the landmark heuristic (see prepare_landmarks) instead of the Euclidean one
+            stats (dict | None): If given, receives the number of expanded nodes under 'expanded'
+            bidirectional (bool): Search from both ends at once (see _bidirectional_search)
             
         Returns:
             path (list): List of nodes in the path
             None: If no path is found
         """
+        # Read once: update_edges may swap the graph while the query runs
+        compact = self.compact
+        start_id, goal_id = compact.node_id(start), compact.node_id(goal)
+        if use_landmarks:
+            if self.landmarks is None:
+                self.prepare_landmarks()
+            estimate = self.landmarks.estimator(goal_id)
+        else:
+            estimate = None
+        if bidirectional:
+            # Heuristics of every node towards both ends, their average is consistent for both searches
+            if use_landmarks:
+                to_goal, to_start = self.landmarks.bounds(goal_id), self.landmarks.bounds(start_id)
+            else:
+                to_goal, to_start = self._heuristics(goal_id, compact), self._heuristics(start_id, compact)
+            path = self._bidirectional_search(start_id, goal_id, ((to_goal - to_start) / 2).tolist(), stats, compact)
+        else:
+            path = self._astar_search(start_id, goal_id, estimate, stats, compact)
+        return None if path is None else compact.to_names(path)
+
+    def _astar_search(self, start: int, goal: int, estimate=None, stats: dict | None = None, compact: CompactGraph | None = None) -> list | None:
+        """A* search algorithm on node ids, on compact or the current graph.
+
+        estimate maps a node id to its heuristic value towards goal, the
+        Euclidean heuristic is used when it is None.
+        """
+        compact = compact or self.compact
+        adjacency = compact.adjacency
         # The set of discovered nodes that may need to be (re-)expanded.
         # Initially, only the start node is known.
-        # Implemented as a priority queue.
-        open_set = [(0, start)]
+        # Implemented as a priority queue of (f_score, g_score, node).
+        open_set = [(0, 0, start)]
         # For node n, g_scores[n] is the cost of the cheapest path from start to n currently known.
-        g_scores = {node: float('inf') for node in self.graph.nodes}
+        g_scores = [float('inf')] * compact.node_count
         g_scores[start] = 0
-        # For node n, f_scores[n] := g_scores[n] + h(n). f_scores[n] represents our current best guess as to
-        # how short a path from start to finish can be if it goes through n.
-        f_scores = {node: float('inf') for node in self.graph.nodes}
-        f_scores[start] = self.heuristic(start, goal)
         came_from = {}
+        expanded = 0
 
         while open_set:
-            _, current_node = heapq.heappop(open_set)
+            _, g_score, current_node = heapq.heappop(open_set)
+            if g_score > g_scores[current_node]:
+                # Stale entry, a cheaper path to this node was found after it was queued
+                continue
+            expanded += 1
 
             if current_node == goal:
+                if stats is not None:
+                    stats['expanded'] = expanded
                 path = []
                 while current_node in came_from:
                     path.append(current_node)
@@ -86,83 +603,245 @@ class GraphAlgorithms:
                 path.append(start)
                 return path[::-1]  # Return reversed path
 
-            for neighbor in self.graph.neighbors(current_node):
+            for neighbor, weight in adjacency[current_node]:
                 # tentative_g_score is the distance from start to the neighbor through current_node
-                tentative_g_score = g_scores[current_node] + self.graph[current_node][neighbor]['weight']
+                tentative_g_score = g_score + weight
 
                 if tentative_g_score < g_scores[neighbor]:
                     # This path to neighbor is better than any previous one. Record it!
                     came_from[neighbor] = current_node
                     g_scores[neighbor] = tentative_g_score
-                    f_scores[neighbor] = tentative_g_score + self.heuristic(neighbor, goal)
-                    heapq.heappush(open_set, (f_scores[neighbor], neighbor))
+                    # f = g + h is our current best guess as to how short a path from start to finish can be through neighbor
+                    h_score = estimate(neighbor) if estimate is not None else self._heuristic(neighbor, goal, compact)
+                    heapq.heappush(open_set, (tentative_g_score + h_score, tentative_g_score, neighbor))
         # Open set is empty but goal was never reached
+        if stats is not None:
+            stats['expanded'] = expanded
         return None
 
-    def dijkstra(self, source: str, target: str) -> list | None:
+    def dijkstra(self, source: str, target: str, use_heap: bool = True, stats: dict | None = None, bidirectional: bool = False) -> list | None:
         """Dijkstra's algorithm.
 
+        All per-query state is local, so a single instance can be queried
+        from several threads at once.
+
         Args:
             source (str): Start node
             target (str): Goal node
+            use_heap (bool): Use a binary heap with lazy deletion instead of a linear scan of unvisited nodes
+            stats (dict | None): If given, receives the number of expanded nodes under 'expanded'
+            bidirectional (bool): Search from both ends at once (see _bidirectional_search), use_heap is ignored
 
         Returns:
             path (list): List of nodes in the path
             None: If no path is found
         """
-        visited = []
-        unvisited = list(self.graph.nodes())
-        for node in self.graph.nodes():
-            self.graph.nodes[node]['dist'] = np.inf
-            self.graph.nodes[node]['prev'] = None
-        self.graph.nodes[source]['dist'] = 0
+        # Read once: update_edges may swap the graph while the query runs
+        compact = self.compact
+        source_id, target_id = compact.node_id(source), compact.node_id(target)
+        if bidirectional:
+            path = self._bidirectional_search(source_id, target_id, stats=stats, compact=compact)
+        elif use_heap:
+            path = self._dijkstra_heap(source_id, target_id, stats=stats, compact=compact)
+        else:
+            path = self._dijkstra(source_id, target_id, stats, compact)
+        return None if path is None else compact.to_names(path)
+
+    def _dijkstra_heap(self, source: int, target: int, excluded_nodes: set = frozenset(), excluded_edges: set = frozenset(), stats: dict | None = None, compact: CompactGraph | None = None) -> list | None:
+        """Dijkstra's algorithm on node ids, using a binary heap with lazy deletion, on compact or the current graph.
+
+        Stops as soon as the target is settled. Nodes in excluded_nodes and
+        directed (u, v) pairs in excluded_edges are ignored during the search.
+        """
+        compact = compact or self.compact
+        adjacency = compact.adjacency
+        dist = [float('inf')] * compact.node_count
+        prev = {}
+        dist[source] = 0
+        heap = [(0, source)]
+        expanded = 0
+
+        while heap:
+            summit_dist, summit = heapq.heappop(heap)
+            if summit_dist > dist[summit]:
+                # Stale entry, the summit was already settled with a shorter distance
+                continue
+            expanded += 1
+            if summit == target:
+                if stats is not None:
+                    stats['expanded'] = expanded
+                path = [target]
+                while path[-1] != source:
+                    path.append(prev[path[-1]])
+                path.reverse()
+                return path
+            for neighbor, weight in adjacency[summit]:
+                if neighbor in excluded_nodes or (summit, neighbor) in excluded_edges:
+                    continue
+                # Calculate distance from source to neighbor
+                candidate = summit_dist + weight
+                if candidate < dist[neighbor]:
+                    # Distance is shorter than previous distance -> update distance and previous node
+                    dist[neighbor] = candidate
+                    prev[neighbor] = summit
+                    heapq.heappush(heap, (candidate, neighbor))
+        # Heap is empty but target was never reached
+        if stats is not None:
+            stats['expanded'] = expanded
+        return None
+
+    def _bidirectional_search(self, source: int, target: int, potentials: list | None = None, stats: dict | None = None, compact: CompactGraph | None = None) -> list | None:
+        """Bidirectional Dijkstra's algorithm on node ids, or bidirectional A* with a potential.
+
+        The graph is undirected: a forward search from source and a backward
+        search from target run in turns, the one with the smallest key is
+        expanded. Every edge reaching a node labelled by the other search
+        gives a candidate path. The best candidate is the shortest path once
+        the smallest keys of both searches add up to at least its length:
+        any shorter path would have to go through a node neither search has
+        settled.
+
+        With potentials p, forward keys are g + p[node] and backward keys
+        g - p[node]. Both searches are then Dijkstra on the same reduced
+        edge weights, which p must keep non-negative (p is the average
+        (h_target - h_source) / 2 of two consistent heuristics), and the
+        stopping criterion is unchanged.
+
+        Args:
+            source (int): Start node id
+            target (int): Goal node id
+            potentials (list | None): Potential of each node id, None for Dijkstra
+            stats (dict | None): If given, receives the number of nodes expanded by both searches under 'expanded'
+            compact (CompactGraph | None): Graph version to search, the current one by default
+
+        Returns:
+            path (list): Node ids from source to target
+            None: If no path is found
+        """
+        compact = compact or self.compact
+        adjacency = compact.adjacency
+        n = compact.node_count
+        # Index 0 is the forward search, 1 the backward one
+        dist = ([float('inf')] * n, [float('inf')] * n)
+        prev = ({}, {})
+        sign = (1, -1)
+        dist[0][source] = dist[1][target] = 0
+        offsets = (0, 0) if potentials is None else (potentials[source], -potentials[target])
+        heaps = ([(offsets[0], 0, source)], [(offsets[1], 0, target)])
+        best, meeting = (0, source) if source == target else (float('inf'), None)
+        expanded = 0
 
-        while target not in visited:
+        while heaps[0] and heaps[1] and heaps[0][0][0] + heaps[1][0][0] < best:
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            _, summit_dist, summit = heapq.heappop(heaps[side])
+            own, other = dist[side], dist[1 - side]
+            if summit_dist > own[summit]:
+                # Stale entry, the summit was already settled with a shorter distance
+                continue
+            expanded += 1
+            for neighbor, weight in adjacency[summit]:
+                candidate = summit_dist + weight
+                if candidate < own[neighbor]:
+                    own[neighbor] = candidate
+                    prev[side][neighbor] = summit
+                    key = candidate if potentials is None else candidate + sign[side] * potentials[neighbor]
+                    heapq.heappush(heaps[side], (key, candidate, neighbor))
+                # Candidate path through the edge, once the other search has reached neighbor
+                if own[neighbor] + other[neighbor] < best:
+                    best, meeting = own[neighbor] + other[neighbor], neighbor
+
+        if stats is not None:
+            stats['expanded'] = expanded
+        if meeting is None:
+            return None
+        path = [meeting]
+        while path[-1] != source:
+            path.append(prev[0][path[-1]])
+        path.reverse()
+        while path[-1] != target:
+            path.append(prev[1][path[-1]])
+        return path
+
+    def _single_source_dijkstra(self, source: int, compact: CompactGraph | None = None) -> tuple:
+        """Computes the shortest path tree from a source node id to every node, on compact or the current graph.
+
+        Returns:
+            tuple: (dist, prev) arrays indexed by node id. Unreachable nodes have dist inf and prev -1
+        """
+        compact = compact or self.compact
+        adjacency = compact.adjacency
+        dist = [float('inf')] * compact.node_count
+        prev = [-1] * compact.node_count
+        dist[source] = 0
+        heap = [(0, source)]
+
+        while heap:
+            summit_dist, summit = heapq.heappop(heap)
+            if summit_dist > dist[summit]:
+                continue
+            for neighbor, weight in adjacency[summit]:
+                candidate = summit_dist + weight
+                if candidate < dist[neighbor]:
+                    dist[neighbor] = candidate
+                    prev[neighbor] = summit
+                    heapq.heappush(heap, (candidate, neighbor))
+        return np.array(dist), np.array(prev, dtype=np.int32)
+
+    def _dijkstra(self, source: int, target: int, stats: dict | None = None, compact: CompactGraph | None = None) -> list | None:
+        """Dijkstra's algorithm on node ids, selecting the next summit with a linear scan, on compact or the current graph."""
+        compact = compact or self.compact
+        dist = np.full(compact.node_count, np.inf)
+        prev = np.full(compact.node_count, -1, dtype=np.int32)
+        visited = np.zeros(compact.node_count, dtype=bool)
+        dist[source] = 0
+        expanded = 0
+
+        while not visited[target]:
             # Find summit with the shortest distance in unvisited
-            summit = self.find_shortest_summit(unvisited)
+            summit = self.find_shortest_summit(dist, visited)
             if summit is None:
                 # No path found
                 break
-            unvisited.remove(summit)
-            visited.append(summit)
-            for neighbor in self.graph.neighbors(summit):
-                if neighbor in unvisited:
-                    # Calculate distance from source to neighbor
-                    dist = self.graph.nodes[summit]['dist'] + self.graph.edges[summit, neighbor]['weight']
-                    if dist < self.graph.nodes[neighbor]['dist']:
-                        # Distance is shorter than previous distance -> update distance and previous node
-                        self.graph.nodes[neighbor]['dist'] = dist
-                        self.graph.nodes[neighbor]['prev'] = summit
-
-        if self.graph.nodes[target]['prev'] is None:
+            visited[summit] = True
+            expanded += 1
+            start, end = compact.indptr[summit], compact.indptr[summit + 1]
+            neighbors = compact.indices[start:end]
+            # Calculate distance from source to every neighbor at once
+            candidates = dist[summit] + compact.weights[start:end]
+            # Distance is shorter than previous distance and neighbor is unvisited -> update distance and previous node
+            improved = (candidates < dist[neighbors]) & ~visited[neighbors]
+            dist[neighbors[improved]] = candidates[improved]
+            prev[neighbors[improved]] = summit
+
+        if stats is not None:
+            stats['expanded'] = expanded
+        if source != target and prev[target] == -1:
             return None
-        else:
-            path = [target]
-            while path[-1] != source:
-                path.append(self.graph.nodes[path[-1]]['prev'])
-            path.reverse()
-            return path
+        path = [target]
+        while path[-1] != source:
+            path.append(int(prev[path[-1]]))
+        path.reverse()
+        return path
 
-    def find_shortest_summit(self, unvisited: list) -> str | None:
+    def find_shortest_summit(self, dist: np.ndarray, visited: np.ndarray) -> int | None:
         """Finds the summit with the shortest distance.
 
         Args:
-            unvisited (list): List of unvisited nodes
+            dist (np.ndarray): Distance from the source for each node id
+            visited (np.ndarray): Boolean mask of visited node ids
 
         Returns:
-            summit (str): Summit with the shortest distance
+            summit (int): Unvisited summit with the shortest distance
             None: If no summit is found
         """
-        min_dist = np.inf
-        summit = None
-        for node in unvisited:
-            if self.graph.nodes[node]['dist'] < min_dist:
-                min_dist = self.graph.nodes[node]['dist']
-                summit = node
+        candidates = np.where(visited, np.inf, dist)
+        summit = int(candidates.argmin())
+        if candidates[summit] == np.inf:
+            return None
         return summit
     
     def compute_all_paths(self, start: str, end: str, keep: int) -> dict:
-        """Computes all paths from a start node to an end node.
+        """Computes the keep shortest loopless paths from a start node to an end node.
         
         Args:
             start (str): Start node
@@ -170,17 +849,80 @@ class GraphAlgorithms:
             keep (int): Number of paths to keep
             
         Returns:
-            dict: Dictionary of paths
+            dict: Dictionary of paths, sorted by weight (ascending)
         """
         paths = {}
-        for path in nx.all_simple_paths(self.graph, start, end):
-            paths[tuple(path)] = self.compute_path_weight(path)
-            
-        # Sort paths by weight (ascending)
-        paths = {k: v for k, v in sorted(paths.items(), key=lambda item: item[1])}
-        # Keep only the first keep paths
-        paths = dict(list(paths.items())[:keep])
+        for path, weight in itertools.islice(self.k_shortest_paths(start, end, keep), keep):
+            paths[tuple(path)] = weight
         return paths
+
+    def k_shortest_paths(self, start: str, end: str, k: int | None = None):
+        """Yields loopless paths from a start node to an end node in increasing weight order (Yen's algorithm).
+
+        Args:
+            start (str): Start node
+            end (str): End node
+            k (int | None): Maximum number of paths, bounds the candidate set. None for no bound
+
+        Yields:
+            tuple: (path, weight) where path is a list of nodes
+        """
+        # Read once: the generator keeps searching the same graph version while update_edges swaps it
+        compact = self.compact
+        for path, weight in self._k_shortest_paths(compact.node_id(start), compact.node_id(end), k, compact):
+            yield compact.to_names(path), weight
+
+    def _k_shortest_paths(self, start: int, end: int, k: int | None = None, compact: CompactGraph | None = None):
+        """Yen's k shortest loopless paths on node ids, on compact or the current graph."""
+        compact = compact or self.compact
+        path = self._dijkstra_heap(start, end, compact=compact)
+        if path is None:
+            return
+        accepted = [path]
+        yield path, self._path_weight(path, compact)
+        # Candidates as a heap of (weight, path). Duplicates are checked against the accepted paths and
+        # the queued candidates only: candidates dropped from the heap are forgotten, memory stays bounded
+        candidates = []
+        accepted_keys = {tuple(path)}
+        queued = set()
+
+        while k is None or len(accepted) < k:
+            last = accepted[-1]
+            # Cumulative weight of each prefix of the last accepted path
+            prefix_weights = [0] + list(itertools.accumulate(
+                compact.edge_weight(last[i], last[i + 1]) for i in range(len(last) - 1)
+            ))
+            for i in range(len(last) - 1):
+                spur_node = last[i]
+                root = last[:i + 1]
+                # Remove the edges leaving the root that are used by already accepted paths sharing this root
+                excluded_edges = set()
+                for accepted_path in accepted:
+                    if accepted_path[:i + 1] == root:
+                        excluded_edges.add((accepted_path[i], accepted_path[i + 1]))
+                        excluded_edges.add((accepted_path[i + 1], accepted_path[i]))
+                # Remove the root nodes so the path stays loopless
+                spur_path = self._dijkstra_heap(spur_node, end, set(root[:-1]), excluded_edges, compact=compact)
+                if spur_path is None:
+                    continue
+                candidate = root[:-1] + spur_path
+                key = tuple(candidate)
+                if key in accepted_keys or key in queued:
+                    continue
+                queued.add(key)
+                heapq.heappush(candidates, (prefix_weights[i] + self._path_weight(spur_path, compact), candidate))
+
+            if not candidates:
+                return
+            if k is not None and len(candidates) > k - len(accepted):
+                # Only the k - len(accepted) best candidates can still be accepted
+                candidates = heapq.nsmallest(k - len(accepted), candidates)
+                queued = {tuple(candidate) for _, candidate in candidates}
+            weight, path = heapq.heappop(candidates)
+            queued.discard(tuple(path))
+            accepted_keys.add(tuple(path))
+            accepted.append(path)
+            yield path, weight
     
     def compute_path_weight(self, path: list) -> float:
         """Computes the weight of a path.
@@ -191,7 +933,13 @@ class GraphAlgorithms:
         Returns:
             float: Weight of the path
         """
+        compact = self.compact
+        return self._path_weight([compact.node_id(node) for node in path], compact)
+
+    def _path_weight(self, path: list, compact: CompactGraph | None = None) -> float:
+        """Computes the weight of a path of node ids, on compact or the current graph."""
+        compact = compact or self.compact
         weight = 0
         for i in range(len(path) - 1):
-            weight += self.graph.get_edge_data(path[i], path[i + 1])['weight']
+            weight += compact.edge_weight(path[i], path[i + 1])
         return weight
\ No newline at end of file
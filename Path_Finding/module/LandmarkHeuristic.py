@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+
+from .CompactGraph import CompactGraph
+
+EARTH_RADIUS_KM = 6371.0088
+
+class LandmarkHeuristic:
+    """ALT (A*, landmarks, triangle inequality) lower bounds for A* search.
+
+    For a landmark L and an undirected graph, |d(L, goal) - d(L, node)| never
+    exceeds d(node, goal), so the maximum over all landmarks is an admissible
+    and consistent heuristic, in the same unit as the edge weights.
+    """
+
+    def __init__(self, compact: CompactGraph, landmarks: list, distances: np.ndarray, use_haversine: bool = True):
+        """
+        Args:
+            compact (CompactGraph): Graph the landmarks belong to
+            landmarks (list): Landmark node ids
+            distances (np.ndarray): Exact distances, shape (len(landmarks), n). Unreachable nodes are inf
+            use_haversine (bool): Also bound by the great-circle distance, assuming edge weights are road kilometres
+        """
+        self.compact = compact
+        self.landmarks = landmarks
+        self.distances = distances
+        self.use_haversine = use_haversine
+        # Plain Python rows are faster than numpy scalars for per-node lookups
+        self.rows = distances.tolist()
+        self.radians = np.radians(compact.coords).tolist()
+        # Arrays for bounds
+        self.lat, self.lng = np.radians(compact.coords).T
+        self.cos_lat = np.cos(self.lat)
+
+    def estimator(self, goal: int):
+        """Builds the lower bound function towards a goal.
+
+        Args:
+            goal (int): Goal node id
+
+        Returns:
+            callable: Function mapping a node id to a lower bound of its distance to goal
+        """
+        # (distance from landmark to goal, distances from landmark to every node) for landmarks that reach the goal
+        rows = [(row[goal], row) for row in self.rows if row[goal] != float('inf')]
+        use_haversine = self.use_haversine
+        radians = self.radians
+        goal_lat, goal_lng = radians[goal]
+        cos_goal_lat = math.cos(goal_lat)
+
+        def estimate(node: int) -> float:
+            bound = 0.0
+            if use_haversine:
+                lat, lng = radians[node]
+                h = math.sin((goal_lat - lat) / 2) ** 2 + math.cos(lat) * cos_goal_lat * math.sin((goal_lng - lng) / 2) ** 2
+                bound = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(h, 1.0)))
+                if bound != bound:
+                    # Missing coordinates
+                    bound = 0.0
+            for to_goal, to_node in rows:
+                difference = abs(to_goal - to_node[node])
+                # A node unreachable from the landmark is unreachable from the goal too, the bound is meaningless
+                if bound < difference != float('inf'):
+                    bound = difference
+            return bound
+
+        return estimate
+
+    def bounds(self, goal: int) -> np.ndarray:
+        """Computes the lower bound of every node towards a goal at once, the values of estimator(goal).
+
+        Args:
+            goal (int): Goal node id
+
+        Returns:
+            np.ndarray: Lower bound of the distance of each node id to goal
+        """
+        bound = np.zeros(self.compact.node_count)
+        rows = self.distances[np.isfinite(self.distances[:, goal])]
+        if len(rows):
+            differences = np.abs(rows[:, goal:goal + 1] - rows)
+            # A node unreachable from the landmark is unreachable from the goal too, the bound is meaningless
+            differences[np.isinf(differences)] = 0.0
+            bound = differences.max(axis=0)
+        if self.use_haversine:
+            lat, lng = self.lat, self.lng
+            h = np.sin((lat[goal] - lat) / 2) ** 2 + self.cos_lat * self.cos_lat[goal] * np.sin((lng[goal] - lng) / 2) ** 2
+            # fmax ignores the NaN bounds of missing coordinates
+            bound = np.fmax(bound, 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0))))
+        return bound
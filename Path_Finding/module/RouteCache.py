@@ -0,0 +1,172 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+class ShortestPathTree:
+    """Single-source shortest path tree: distance and predecessor of every node id."""
+
+    def __init__(self, source: int, dist: np.ndarray, prev: np.ndarray):
+        self.source = source
+        self.dist = dist
+        self.prev = prev
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the tree arrays, in bytes."""
+        return self.dist.nbytes + self.prev.nbytes
+
+    def path_to(self, target: int) -> list | None:
+        """Walks the tree from target back to the source.
+
+        Args:
+            target (int): Node id
+
+        Returns:
+            path (list): Node ids from target to the source
+            None: If target is unreachable from the source
+        """
+        if target != self.source and self.prev[target] == -1:
+            return None
+        path = [target]
+        while path[-1] != self.source:
+            path.append(int(self.prev[path[-1]]))
+        return path
+
+class RouteCache:
+    """LRU cache of shortest path trees keyed by source node id.
+
+    The graph is undirected, so a tree rooted at either endpoint answers a
+    query in both directions. The cache is bound both by a number of trees and
+    by the memory of their arrays. It is tied to one compact graph and empties
+    itself when asked about another one (the graph was rebuilt). When the
+    graph is updated instead of rebuilt, update moves the cache to the new
+    version and repairs the trees instead, and the versions it replaced are
+    ignored from then on.
+    """
+
+    def __init__(self, max_trees: int = 64, max_bytes: int | None = None):
+        """
+        Args:
+            max_trees (int): Maximum number of trees kept
+            max_bytes (int | None): Maximum memory of the trees, in bytes. None for no bound
+        """
+        self.max_trees = max_trees
+        self.max_bytes = max_bytes
+        self.memory_bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._trees = OrderedDict()
+        self._graph = None
+        # Versions replaced by update: queries still running on them must not empty the cache
+        self._retired = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def _check_graph(self, graph) -> bool:
+        """Empties the cache if it was filled for another graph. Must be called with the lock held.
+
+        Returns:
+            bool: False if the graph is a version replaced by update, the cache must then be left alone
+        """
+        if graph is self._graph:
+            return True
+        if graph in self._retired:
+            return False
+        self._trees.clear()
+        self.memory_bytes = 0
+        self._graph = graph
+        return True
+
+    def get(self, graph, source: int) -> ShortestPathTree | None:
+        """Returns the cached tree rooted at source, if any.
+
+        Args:
+            graph (CompactGraph): Graph the tree must belong to
+            source (int): Source node id
+
+        Returns:
+            ShortestPathTree: Cached tree
+            None: If no tree is cached for this source
+        """
+        with self._lock:
+            if not self._check_graph(graph):
+                return None
+            tree = self._trees.get(source)
+            if tree is not None:
+                self._trees.move_to_end(source)
+            return tree
+
+    def put(self, graph, tree: ShortestPathTree) -> None:
+        """Stores a tree, evicting the least recently used ones over the bounds.
+
+        Args:
+            graph (CompactGraph): Graph the tree belongs to
+            tree (ShortestPathTree): Tree to store
+        """
+        with self._lock:
+            if not self._check_graph(graph):
+                return
+            previous = self._trees.pop(tree.source, None)
+            if previous is not None:
+                self.memory_bytes -= previous.nbytes
+            self._trees[tree.source] = tree
+            self.memory_bytes += tree.nbytes
+            while len(self._trees) > 1 and (
+                len(self._trees) > self.max_trees
+                or (self.max_bytes is not None and self.memory_bytes > self.max_bytes)
+            ):
+                _, evicted = self._trees.popitem(last=False)
+                self.memory_bytes -= evicted.nbytes
+                self.counters['evictions'] += 1
+
+    def update(self, graph, new_graph, repair) -> dict:
+        """Moves the cache from a graph to its updated version, repairing every tree.
+
+        Args:
+            graph (CompactGraph): Graph the cache currently holds trees for
+            new_graph (CompactGraph): Updated graph
+            repair (callable): Maps a tree of graph to the same tree if the update does not change it,
+                a repaired tree of new_graph, or None to drop it
+
+        Returns:
+            dict: Number of trees kept, repaired and dropped
+        """
+        counts = {'kept': 0, 'repaired': 0, 'dropped': 0}
+        with self._lock:
+            if graph is self._graph:
+                for source, tree in list(self._trees.items()):
+                    repaired = repair(tree)
+                    if repaired is tree:
+                        counts['kept'] += 1
+                        continue
+                    self.memory_bytes -= tree.nbytes
+                    if repaired is None:
+                        del self._trees[source]
+                        counts['dropped'] += 1
+                    else:
+                        self._trees[source] = repaired
+                        self.memory_bytes += repaired.nbytes
+                        counts['repaired'] += 1
+            else:
+                self._trees.clear()
+                self.memory_bytes = 0
+            if graph is not None:
+                self._retired.add(graph)
+            self._graph = new_graph
+        return counts
+
+    def record(self, hit: bool) -> None:
+        """Counts a query as a hit or a miss."""
+        with self._lock:
+            self.counters['hits' if hit else 'misses'] += 1
+
+    def clear(self) -> None:
+        """Drops every tree."""
+        with self._lock:
+            self._trees.clear()
+            self.memory_bytes = 0
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters, the number of trees and their memory."""
+        with self._lock:
+            return dict(self.counters, trees=len(self._trees), memory_bytes=self.memory_bytes)
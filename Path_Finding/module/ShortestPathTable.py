@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .CompactGraph import CompactGraph
+
+class ShortestPathTable:
+    """All-pairs shortest distances and next hops, persisted as memory-mapped .npy files.
+
+    dist[i, j] is the shortest distance from node id i to node id j and
+    next_hop[i, j] is the node that follows i on that path (-1 if j is unreachable).
+    Tables are stored in a directory named after the fingerprint of the data
+    files they were computed from, so a change to fr.csv or fr.json triggers a rebuild.
+    """
+
+    def __init__(self, names: list, dist: np.ndarray, next_hop: np.ndarray):
+        self.names = names
+        self.dist = dist
+        self.next_hop = next_hop
+
+    @staticmethod
+    def compute(compact: CompactGraph) -> tuple:
+        """Computes all-pairs shortest distances and next hops (vectorized Floyd-Warshall).
+
+        Args:
+            compact (CompactGraph): Graph to compute the tables for
+
+        Returns:
+            tuple: (dist, next_hop) matrices of shape (n, n)
+        """
+        n = compact.node_count
+        dist = np.full((n, n), np.inf)
+        next_hop = np.full((n, n), -1, dtype=np.int32)
+        sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(compact.indptr))
+        # Keep the lightest edge if an edge is listed more than once
+        np.minimum.at(dist, (sources, compact.indices), compact.weights)
+        next_hop[sources, compact.indices] = compact.indices
+        np.fill_diagonal(dist, 0)
+        np.fill_diagonal(next_hop, np.arange(n, dtype=np.int32))
+
+        for k in range(n):
+            # Distance from every i to every j through k, as one broadcast operation
+            via_k = dist[:, k, None] + dist[None, k, :]
+            shorter = via_k < dist
+            dist = np.where(shorter, via_k, dist)
+            next_hop = np.where(shorter, next_hop[:, k, None], next_hop)
+        return dist, next_hop
+
+    @classmethod
+    def open(cls, compact: CompactGraph, fingerprint: str, directory: str) -> 'ShortestPathTable':
+        """Opens the tables for a graph, building and saving them first if needed.
+
+        Args:
+            compact (CompactGraph): Graph the tables belong to
+            fingerprint (str): Fingerprint of the data files the graph was built from
+            directory (str): Directory holding the persisted tables
+
+        Returns:
+            ShortestPathTable: Memory-mapped tables
+        """
+        table_dir = os.path.join(directory, fingerprint)
+        table = cls.load(table_dir)
+        if table is None or table.names != compact.names:
+            cls.build(compact, table_dir)
+            table = cls.load(table_dir)
+        return table
+
+    @classmethod
+    def build(cls, compact: CompactGraph, table_dir: str) -> None:
+        """Computes the tables and saves them as .npy files.
+
+        table_dir is a symbolic link to a versioned directory. The files are
+        written to a new version, then the link is replaced in one rename and
+        the previous version is deleted: concurrent readers see either the
+        previous table or the new one, never a missing or partial one.
+
+        Args:
+            compact (CompactGraph): Graph to compute the tables for
+            table_dir (str): Destination, a symbolic link to the versioned directory
+        """
+        dist, next_hop = cls.compute(compact)
+        table_dir = os.path.abspath(table_dir)
+        parent, name = os.path.split(table_dir)
+        os.makedirs(parent, exist_ok=True)
+        version_dir = tempfile.mkdtemp(dir=parent, prefix=f'{name}.')
+        try:
+            np.save(os.path.join(version_dir, 'dist.npy'), dist)
+            np.save(os.path.join(version_dir, 'next_hop.npy'), next_hop)
+            with open(os.path.join(version_dir, 'names.json'), 'w', encoding='utf-8') as f:
+                json.dump(compact.names, f, ensure_ascii=False)
+            previous = os.path.realpath(table_dir) if os.path.islink(table_dir) else None
+            if os.path.isdir(table_dir) and previous is None:
+                # Table written before versioning, in place: moved aside to be replaced by the link
+                previous = tempfile.mkdtemp(dir=parent, prefix=f'{name}.')
+                os.replace(table_dir, previous)
+            link = f'{version_dir}.link'
+            os.symlink(os.path.basename(version_dir), link)
+            os.replace(link, table_dir)
+        except BaseException:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+        if previous is not None:
+            # Readers keep the tables they already mapped, the files stay until they are unmapped
+            shutil.rmtree(previous, ignore_errors=True)
+
+    @classmethod
+    def load(cls, table_dir: str) -> 'ShortestPathTable | None':
+        """Loads persisted tables as read-only memory maps.
+
+        Args:
+            table_dir (str): Directory holding the tables, or link to it
+
+        Returns:
+            ShortestPathTable: Memory-mapped tables
+            None: If the tables do not exist
+        """
+        # A build may replace the table meanwhile: the link is resolved once so the three files come
+        # from the same version, and a version deleted between resolving and opening is looked up again
+        for _ in range(2):
+            version_dir = os.path.realpath(table_dir)
+            try:
+                with open(os.path.join(version_dir, 'names.json'), encoding='utf-8') as f:
+                    names = json.load(f)
+                dist = np.load(os.path.join(version_dir, 'dist.npy'), mmap_mode='r')
+                next_hop = np.load(os.path.join(version_dir, 'next_hop.npy'), mmap_mode='r')
+            except (OSError, ValueError):
+                if version_dir == os.path.realpath(table_dir):
+                    return None
+                continue
+            return cls(names, dist, next_hop)
+        return None
+
+    def path(self, source: int, target: int) -> list | None:
+        """Walks the next-hop table from source to target.
+
+        Args:
+            source (int): Start node id
+            target (int): Goal node id
+
+        Returns:
+            path (list): List of node ids in the path
+            None: If no path exists
+        """
+        if self.next_hop[source, target] == -1:
+            return None
+        path = [source]
+        while path[-1] != target:
+            path.append(int(self.next_hop[path[-1], target]))
+        return path
+
+    def distance(self, source: int, target: int) -> float:
+        """Returns the shortest distance between two node ids (inf if unreachable)."""
+        return float(self.dist[source, target])
+
+
+if __name__ == '__main__':
+    # Offline build step: python -m Path_Finding.module.ShortestPathTable
+    from .FranceGraphBuilder import FranceGraphBuilder
+
+    builder = FranceGraphBuilder(
+        city_data_file='Path_Finding/module/data/fr.csv',
+        graph_data_file='Path_Finding/module/data/fr.json'
+    )
+    compact = builder.create_graph().graph['compact']
+    table_dir = os.path.join('Path_Finding/module/data/cache', builder.fingerprint())
+    ShortestPathTable.build(compact, table_dir)
+    print(f"Wrote {compact.node_count}x{compact.node_count} table to {table_dir}")
@@ -0,0 +1,76 @@
+import numpy as np
+
+from .LandmarkHeuristic import EARTH_RADIUS_KM
+
+def unit_vectors(coords: np.ndarray) -> np.ndarray:
+    """Maps (lat, lng) coordinates in degrees to 3D unit vectors.
+
+    Args:
+        coords (np.ndarray): Coordinates, shape (n, 2)
+
+    Returns:
+        np.ndarray: Unit vectors, shape (n, 3)
+    """
+    lat, lng = np.radians(coords).T
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+class SpatialIndex:
+    """KD-tree over (lat, lng) points, answering nearest neighbour queries by great-circle distance.
+
+    Points are stored as 3D unit vectors: the straight-line distance between
+    two unit vectors grows with their great-circle distance, so the nearest
+    points in the tree are the nearest on the Earth. A query costs
+    O(log n), and a batch of points is answered in one vectorized call.
+    """
+
+    def __init__(self, coords: np.ndarray, ids: np.ndarray | None = None):
+        """
+        Args:
+            coords (np.ndarray): (lat, lng) coordinates in degrees, shape (n, 2). Points with missing coordinates are left out
+            ids (np.ndarray | None): Id returned for each point, its position by default
+
+        Raises:
+            ValueError: If no point has coordinates
+        """
+        # scipy is only needed once a city outside of the graph is routed
+        from scipy.spatial import cKDTree
+
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        valid = np.isfinite(coords).all(axis=1)
+        if not valid.any():
+            raise ValueError("No point with coordinates to index.")
+        ids = np.arange(len(coords)) if ids is None else np.asarray(ids)
+        self.ids = ids[valid]
+        self.tree = cKDTree(unit_vectors(coords[valid]))
+
+    @classmethod
+    def from_graph(cls, compact) -> 'SpatialIndex':
+        """Indexes the nodes of a compact graph, queries return node ids."""
+        return cls(compact.coords)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def nearest(self, points: np.ndarray, k: int = 1) -> tuple:
+        """Finds the k nearest indexed points of each query point.
+
+        Args:
+            points (np.ndarray): (lat, lng) coordinates in degrees, shape (m, 2)
+            k (int): Neighbours per point, at most the number of indexed points
+
+        Returns:
+            tuple: (distances, ids) arrays of shape (m, k), distances in kilometres sorted in increasing order.
+                Points with missing coordinates get inf distances and -1 ids
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        k = min(k, len(self.ids))
+        distances = np.full((len(points), k), np.inf)
+        ids = np.full((len(points), k), -1, dtype=self.ids.dtype)
+        valid = np.isfinite(points).all(axis=1)
+        if valid.any():
+            chords, positions = self.tree.query(unit_vectors(points[valid]), k=k)
+            chords, positions = chords.reshape(-1, k), positions.reshape(-1, k)
+            # Chord length to great-circle distance
+            distances[valid] = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chords / 2, 1.0))
+            ids[valid] = self.ids[positions]
+        return distances, ids
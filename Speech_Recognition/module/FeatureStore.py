@@ -0,0 +1,99 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Feature parameters, part of every cache key so that changing them invalidates the cache
+SAMPLE_RATE = 16000
+N_MFCC = 13
+# Speech framing: 32 ms windows every 10 ms. librosa's default hop (32 ms) leaves about ten frames per word
+N_FFT = 512
+HOP_LENGTH = 160
+
+def extract_mfcc(file_path: str, sample_rate: int = SAMPLE_RATE, n_mfcc: int = N_MFCC) -> np.ndarray:
+    """Extracts the MFCC features of an audio file.
+
+    Args:
+        file_path (str): Audio file
+        sample_rate (int): Rate the audio is resampled to
+        n_mfcc (int): Number of coefficients per frame
+
+    Returns:
+        np.ndarray: (frames, n_mfcc) float32 array, one row per analysis window
+    """
+    # librosa is slow to import, only processes that extract features pay for it
+    import librosa
+    audio, _ = librosa.load(file_path, sr=sample_rate)
+    return librosa.feature.mfcc(y=audio, sr=sample_rate, n_mfcc=n_mfcc, n_fft=N_FFT, hop_length=HOP_LENGTH).T.astype(np.float32)
+
+def file_key(file_path: str, sample_rate: int = SAMPLE_RATE, n_mfcc: int = N_MFCC) -> str:
+    """Cache key of a file: SHA-256 of its content and of the feature parameters."""
+    digest = hashlib.sha256(f"{sample_rate}:{n_mfcc}:{N_FFT}:{HOP_LENGTH}:".encode())
+    with open(file_path, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+class FeatureStore:
+    """MFCC features of audio files, cached on disk in a single npz archive keyed by file hash.
+
+    Renamed or copied files hit the cache, edited files miss it. Missing
+    features are extracted in a process pool and the archive is rewritten
+    atomically, so a reader never sees a partial file.
+    """
+
+    def __init__(self, path: str | None, sample_rate: int = SAMPLE_RATE, n_mfcc: int = N_MFCC):
+        """
+        Args:
+            path (str | None): npz archive, None to keep features in memory only
+            sample_rate (int): Rate the audio is resampled to
+            n_mfcc (int): Number of coefficients per frame
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.n_mfcc = n_mfcc
+        self.features = {}
+        if path is not None and os.path.isfile(path):
+            with np.load(path) as archive:
+                self.features = {key: archive[key] for key in archive.files}
+
+    def get(self, file_paths: list, workers: int | None = None) -> list:
+        """Returns the features of audio files, extracting and caching the missing ones.
+
+        Args:
+            file_paths (list): Audio files
+            workers (int | None): Extraction processes, None for one per core, 0 to extract in this process
+
+        Returns:
+            list: One (frames, n_mfcc) array per file, in order
+        """
+        keys = [file_key(file_path, self.sample_rate, self.n_mfcc) for file_path in file_paths]
+        # A file may appear twice, or two files may share a content: extracted once
+        missing = {key: file_path for key, file_path in zip(keys, file_paths) if key not in self.features}
+        if missing:
+            arguments = (list(missing.values()), [self.sample_rate] * len(missing), [self.n_mfcc] * len(missing))
+            if workers == 0:
+                extracted = map(extract_mfcc, *arguments)
+                self.features.update(zip(missing, extracted))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    extracted = executor.map(extract_mfcc, *arguments, chunksize=max(1, len(missing) // (4 * (workers or os.cpu_count()))))
+                    self.features.update(zip(missing, extracted))
+            self.save()
+        return [self.features[key] for key in keys]
+
+    def save(self) -> None:
+        """Writes the archive, through a temporary file replaced atomically."""
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.npz')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                np.savez(f, **self.features)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.remove(temporary)
+            raise
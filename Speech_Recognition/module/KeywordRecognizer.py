@@ -0,0 +1,183 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from constants import MFCC_FEATURES_FILE
+from .FeatureStore import FeatureStore, extract_mfcc
+
+def list_dataset(directory: str) -> list:
+    """Lists the labelled recordings of a dataset laid out as one subdirectory of WAV files per label.
+
+    Args:
+        directory (str): Dataset directory, e.g. POC_Speech_Recognition/fruits_audio
+
+    Returns:
+        list: (file path, label) pairs, sorted
+    """
+    samples = []
+    for label in sorted(os.listdir(directory)):
+        subdirectory = os.path.join(directory, label)
+        if os.path.isdir(subdirectory):
+            samples += [
+                (os.path.join(subdirectory, name), label) for name in sorted(os.listdir(subdirectory)) if name.endswith('.wav')
+            ]
+    return samples
+
+def train_model(sequences: list, n_components: int, covariance_type: str, n_iter: int, random_state: int):
+    """Trains the GaussianHMM of one class on its feature sequences (run in a worker process).
+
+    Args:
+        sequences (list): (frames, n_mfcc) arrays of the class recordings
+
+    Returns:
+        GaussianHMM: Trained model
+    """
+    from hmmlearn import hmm
+    model = hmm.GaussianHMM(n_components=n_components, covariance_type=covariance_type, n_iter=n_iter, random_state=random_state)
+    # Silences the overflow warnings of the EM iterations, as the POC notebook did, for this fit only
+    with np.errstate(all='ignore'):
+        # Sequences are fitted as separate observations, transitions across recordings are not learnt
+        model.fit(np.concatenate(sequences), lengths=[len(sequence) for sequence in sequences])
+    return model
+
+class KeywordRecognizer:
+    """Small vocabulary recognizer: one GaussianHMM per keyword, the best scoring model gives the label.
+
+    Scoring evaluates an utterance against every keyword model in one pass:
+    the diagonal Gaussian log-likelihoods of all states of all models are a
+    single matrix product, and the scaled forward recursion runs on the
+    stacked (models, states) lattice with batched matrix products.
+    """
+
+    def __init__(self, n_components: int = 4, covariance_type: str = 'diag', n_iter: int = 1000, random_state: int = 0):
+        """
+        Args:
+            n_components (int): Hidden states per keyword model
+            covariance_type (str): Only 'diag' is supported by the vectorized scoring
+            n_iter (int): Maximum EM iterations
+            random_state (int): Seed of the model initialisation
+        """
+        if covariance_type != 'diag':
+            raise ValueError("Only diagonal covariances are supported")
+        self.n_components = n_components
+        self.covariance_type = covariance_type
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.labels = []
+        self.models = []
+
+    def fit(self, features: list, labels: list, workers: int | None = None) -> 'KeywordRecognizer':
+        """Trains one model per label, the models are trained concurrently.
+
+        Args:
+            features (list): (frames, n_mfcc) arrays
+            labels (list): Label of each array
+            workers (int | None): Training processes, None for one per core, 0 to train in this process
+
+        Returns:
+            KeywordRecognizer: self
+        """
+        self.labels = sorted(set(labels))
+        sequences = [[feature for feature, label in zip(features, labels) if label == keyword] for keyword in self.labels]
+        arguments = (sequences, *([value] * len(self.labels) for value in (self.n_components, self.covariance_type, self.n_iter, self.random_state)))
+        if workers == 0:
+            self.models = list(map(train_model, *arguments))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                self.models = list(executor.map(train_model, *arguments))
+        self._stack()
+        return self
+
+    @classmethod
+    def from_directory(cls, directory: str, store_path: str | None = MFCC_FEATURES_FILE, workers: int | None = None, **params) -> 'KeywordRecognizer':
+        """Trains a recognizer on a dataset directory, with one subdirectory of WAV files per keyword.
+
+        Args:
+            directory (str): Dataset directory
+            store_path (str | None): Feature cache archive, None to keep the features in memory
+            workers (int | None): Processes for feature extraction and training, None for one per core
+            **params: KeywordRecognizer parameters
+
+        Returns:
+            KeywordRecognizer: Trained recognizer
+        """
+        samples = list_dataset(directory)
+        features = FeatureStore(store_path).get([file_path for file_path, _ in samples], workers=workers)
+        return cls(**params).fit(features, [label for _, label in samples], workers=workers)
+
+    def _stack(self) -> None:
+        """Stacks the parameters of all models for the vectorized scoring."""
+        means = np.stack([model.means_ for model in self.models])            # (models, states, features)
+        variances = np.stack([model.covars_.diagonal(axis1=1, axis2=2) if model.covars_.ndim == 3 else model.covars_ for model in self.models])
+        precisions = 1.0 / variances
+        n_features = means.shape[2]
+        # log N(x | mu, diag(var)) = -0.5 * (x² . 1/var - 2 x . mu/var + mu² . 1/var + log|2 pi var|), the x terms are matrix products
+        self._precisions = precisions.reshape(-1, n_features).T               # (features, models * states)
+        self._scaled_means = (means * precisions).reshape(-1, n_features).T
+        self._constants = -0.5 * (
+            (means ** 2 * precisions).sum(axis=2) + np.log(variances).sum(axis=2) + n_features * np.log(2 * np.pi)
+        ).reshape(-1)
+        self._startprob = np.stack([model.startprob_ for model in self.models])     # (models, states)
+        self._transmat = np.stack([model.transmat_ for model in self.models])       # (models, states, states)
+
+    def scores(self, features: np.ndarray) -> np.ndarray:
+        """Log-likelihood of an utterance under every keyword model, in one vectorized pass.
+
+        Equal to [model.score(features) for model in self.models].
+
+        Args:
+            features (np.ndarray): (frames, n_mfcc) array
+
+        Returns:
+            np.ndarray: One score per label, in the order of self.labels
+        """
+        features = np.asarray(features, dtype=np.float64)
+        n_models, n_states = self._startprob.shape
+        # Emission log-likelihoods of every frame for every state of every model
+        log_emissions = (
+            -0.5 * (features ** 2) @ self._precisions + features @ self._scaled_means + self._constants
+        ).reshape(len(features), n_models, n_states)
+
+        # Scaled forward recursion, all models at once: emissions are normalised per model and frame,
+        # alpha is renormalised after each step and the log scales are summed into the score
+        peaks = log_emissions.max(axis=2, keepdims=True)
+        emissions = np.exp(log_emissions - peaks)
+        log_likelihood = peaks.sum(axis=(0, 2))
+        alpha = self._startprob * emissions[0]
+        for emission in emissions[1:]:
+            scale = alpha.sum(axis=1, keepdims=True)
+            log_likelihood += np.log(scale[:, 0])
+            alpha = np.matmul((alpha / scale)[:, None, :], self._transmat)[:, 0, :] * emission
+        with np.errstate(divide='ignore'):
+            return log_likelihood + np.log(alpha.sum(axis=1))
+
+    def predict(self, features: np.ndarray) -> str:
+        """Returns the label of the best scoring model for an utterance."""
+        return self.labels[int(np.argmax(self.scores(features)))]
+
+    def recognize_file(self, file_path: str, store: FeatureStore | None = None) -> str:
+        """Returns the label of an audio file.
+
+        Args:
+            file_path (str): Audio file
+            store (FeatureStore | None): Feature cache, None to extract the features directly
+        """
+        features = store.get([file_path], workers=0)[0] if store is not None else extract_mfcc(file_path)
+        return self.predict(features)
+
+    def save(self, path: str) -> None:
+        """Saves the trained models."""
+        with open(path, 'wb') as f:
+            pickle.dump({'labels': self.labels, 'models': self.models, 'params': (self.n_components, self.covariance_type, self.n_iter, self.random_state)}, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'KeywordRecognizer':
+        """Loads models saved by save."""
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        recognizer = cls(*state['params'])
+        recognizer.labels, recognizer.models = state['labels'], state['models']
+        recognizer._stack()
+        return recognizer
@@ -1,13 +1,26 @@
 # Import speech recognition module
+import audioop
+import os
+import queue
+import threading
 import time
+import wave
+
 import speech_recognition as sr
-import os
 
+from metrics import stage
 from utils import check_french
+from .TranscriptionBackend import TranscriptionBackend, create_backend
 
 class SpeechtoText:
-    def __init__(self) -> None:
+    def __init__(self, backend: TranscriptionBackend | None = None) -> None:
+        """
+        Args:
+            backend (TranscriptionBackend | None): Transcription engine. Defaults to the STT_BACKEND
+                environment variable ('google', 'sphinx' or 'vosk'), Google if unset
+        """
         self.r = sr.Recognizer()
+        self.backend = backend or create_backend(os.environ.get('STT_BACKEND', 'google'))
         self.audio_disabled = os.environ.get('AUDIO_DISABLED', False) == '1'
         if not self.audio_disabled:
             self.mic = sr.Microphone()
@@ -26,12 +39,12 @@ class SpeechtoText:
         if self.audio_disabled:
             print("Audio input is disabled.")
             return None
-        mic = self.mic 
+        mic = self.mic
 
         with mic as source:
             time.sleep(1)
             print("Où voulez-vous partir ? Donnez votre lieu de départ et votre lieu d'arrivée.")
-                
+
             self.r.adjust_for_ambient_noise(source, duration=1)
 
             audio = self.r.listen(source)
@@ -41,7 +54,7 @@ class SpeechtoText:
 
     def transcription(self, audio: sr.AudioData) -> str:
         """
-        Transcribes the audio input to text using Google Speech Recognition API.
+        Transcribes the audio input to text with the transcription backend.
 
         Args:
             audio (AudioData): AudioData object
@@ -54,14 +67,136 @@ class SpeechtoText:
         print("Veuillez patienter...")
 
         # Transcribe audio to text
-        text = self.r.recognize_google(
-                audio, 
-                language='fr-FR',
-                pfilter=1
-            )
-        
+        with stage('transcription'):
+            text = self.backend.transcribe(audio)
+
+        return self.checked_transcription(text)
+
+    def listen_and_transcribe(self, max_seconds: float = 15) -> str:
+        """
+        Listens to the microphone and transcribes while capturing.
+
+        A capture thread queues chunks as the microphone delivers them and the
+        backend decodes each one on arrival, so only the last chunks remain
+        to decode when the speaker stops. Capture ends at the engine's end of
+        utterance, after pause_threshold seconds of silence or after max_seconds.
+
+        Args:
+            max_seconds (float): Maximum capture duration
+
+        Returns:
+            text (str): Transcribed text
+        """
+        if self.audio_disabled:
+            raise Exception("Audio input is disabled.")
+
+        with self.mic as source:
+            time.sleep(1)
+            print("Où voulez-vous partir ? Donnez votre lieu de départ et votre lieu d'arrivée.")
+            self.r.adjust_for_ambient_noise(source, duration=1)
+
+            # Bounded queue: if decoding falls behind, capture waits instead of buffering without limit
+            chunks = queue.Queue(maxsize=64)
+            stop = threading.Event()
+
+            def capture():
+                deadline = time.monotonic() + max_seconds
+                while not stop.is_set() and time.monotonic() < deadline:
+                    chunks.put(source.stream.read(source.CHUNK))
+                chunks.put(None)
+
+            capture_thread = threading.Thread(target=capture, name='microphone-capture', daemon=True)
+            capture_thread.start()
+            try:
+                text = self.decode_chunks(
+                    iter(chunks.get, None), source.SAMPLE_RATE, source.SAMPLE_WIDTH,
+                    pause_seconds=self.r.pause_threshold, chunk_seconds=source.CHUNK / source.SAMPLE_RATE
+                )
+            finally:
+                stop.set()
+                # Unblocks the capture thread if the queue is full
+                while capture_thread.is_alive():
+                    try:
+                        chunks.get_nowait()
+                    except queue.Empty:
+                        capture_thread.join(0.01)
+        return self.checked_transcription(text)
+
+    def transcribe_file(self, file_path: str, chunk_frames: int = 1024) -> str:
+        """
+        Transcribes a WAV file, fed to the backend in chunks like microphone input.
+
+        Works with AUDIO_DISABLED=1.
+
+        Args:
+            file_path (str): WAV file
+            chunk_frames (int): Frames per chunk
+
+        Returns:
+            text (str): Transcribed text
+        """
+        with wave.open(file_path, 'rb') as wav:
+            channels, sample_width, sample_rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+
+            def read_chunks():
+                while True:
+                    chunk = wav.readframes(chunk_frames)
+                    if not chunk:
+                        return
+                    if sample_width == 1:
+                        # 8-bit WAV samples are unsigned, the streams expect signed ones like AudioData
+                        chunk = audioop.bias(chunk, 1, -128)
+                    yield audioop.tomono(chunk, sample_width, 0.5, 0.5) if channels == 2 else chunk
+
+            text = self.decode_chunks(read_chunks(), sample_rate, sample_width)
+        return self.checked_transcription(text)
+
+    def decode_chunks(self, chunks, sample_rate: int, sample_width: int, pause_seconds: float | None = None, chunk_seconds: float = 0) -> str:
+        """
+        Feeds chunks to a backend stream until the end of the utterance.
+
+        Args:
+            chunks (iterable): Mono PCM chunks
+            sample_rate (int): Sample rate of the chunks
+            sample_width (int): Bytes per sample of the chunks
+            pause_seconds (float | None): Silence ending the utterance once speech started, None to read every chunk
+            chunk_seconds (float): Duration of a chunk, to count silence
+
+        Returns:
+            text (str): Transcribed text
+        """
+        stream = self.backend.open_stream(sample_rate, sample_width)
+        speaking, silence = False, 0.0
+        for chunk in chunks:
+            # An endpoint detected by the engine ends live captures only, files are read to the end
+            # and the stream joins the text of every utterance
+            if stream.feed(chunk) and pause_seconds is not None:
+                break
+            if pause_seconds is None:
+                continue
+            # Same energy criterion as Recognizer.listen
+            if audioop.rms(chunk, sample_width) > self.r.energy_threshold:
+                speaking, silence = True, 0.0
+            elif speaking:
+                silence += chunk_seconds
+                if silence > pause_seconds:
+                    break
+        # Timed like transcription(): decoding left once the capture is over
+        with stage('transcription'):
+            return stream.finish()
+
+    def checked_transcription(self, text: str) -> str:
+        """
+        Checks that a transcription is in French and prints it.
+
+        Args:
+            text (str): Transcribed text
+
+        Returns:
+            text (str): Transcribed text
+        """
         is_french = check_french(text)
         if is_french:
             print("Transcription: ", str(text))
 
-            return str(text)
\ No newline at end of file
+            return str(text)
@@ -0,0 +1,242 @@
+import audioop
+import json
+import os
+import warnings
+from abc import ABC, abstractmethod
+
+import speech_recognition as sr
+
+from constants import SPHINX_MODEL_LOCATION, VOSK_MODEL_LOCATION
+
+# Sample format expected by the offline engines
+ENGINE_SAMPLE_RATE = 16000
+ENGINE_SAMPLE_WIDTH = 2
+
+class TranscriptionStream(ABC):
+    """Incremental decoding session: raw PCM chunks are fed as they are captured."""
+
+    @abstractmethod
+    def feed(self, chunk: bytes) -> bool:
+        """Decodes a chunk of raw PCM audio.
+
+        Args:
+            chunk (bytes): Mono signed PCM frames at the sample rate and width the stream was opened with
+
+        Returns:
+            bool: True if the engine detected the end of the utterance
+        """
+
+    @abstractmethod
+    def finish(self) -> str:
+        """Ends the utterance and returns its transcription.
+
+        Raises:
+            sr.UnknownValueError: If nothing was recognized
+        """
+
+class BufferedStream(TranscriptionStream):
+    """Stream for engines that only decode whole utterances: chunks are buffered and decoded by finish."""
+
+    def __init__(self, backend, sample_rate: int, sample_width: int):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.chunks = []
+
+    def feed(self, chunk: bytes) -> bool:
+        self.chunks.append(chunk)
+        return False
+
+    def finish(self) -> str:
+        return self.backend.transcribe(sr.AudioData(b''.join(self.chunks), self.sample_rate, self.sample_width))
+
+class ResamplingStream(TranscriptionStream):
+    """Base for offline engine streams: converts each chunk to 16 kHz 16-bit before decoding it."""
+
+    def __init__(self, sample_rate: int, sample_width: int):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        # ratecv state, kept across chunks so that chunk boundaries do not add artifacts
+        self._state = None
+
+    def convert(self, chunk: bytes) -> bytes:
+        if self.sample_width != ENGINE_SAMPLE_WIDTH:
+            chunk = audioop.lin2lin(chunk, self.sample_width, ENGINE_SAMPLE_WIDTH)
+        if self.sample_rate != ENGINE_SAMPLE_RATE:
+            chunk, self._state = audioop.ratecv(chunk, ENGINE_SAMPLE_WIDTH, 1, self.sample_rate, ENGINE_SAMPLE_RATE, self._state)
+        return chunk
+
+class TranscriptionBackend:
+    """Speech to text engine used by SpeechtoText.
+
+    Streaming backends decode chunks while the audio is still being
+    captured. The others buffer the utterance and decode it at the end.
+    """
+
+    name = None
+    streaming = False
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        """Transcribes a whole utterance.
+
+        Args:
+            audio (AudioData): Captured audio
+
+        Returns:
+            str: Transcribed text
+
+        Raises:
+            sr.UnknownValueError: If nothing was recognized
+            sr.RequestError: If the engine is unavailable
+        """
+        stream = self.open_stream(audio.sample_rate, audio.sample_width)
+        stream.feed(audio.get_raw_data())
+        return stream.finish()
+
+    def open_stream(self, sample_rate: int, sample_width: int) -> TranscriptionStream:
+        """Starts decoding an utterance.
+
+        Args:
+            sample_rate (int): Sample rate of the chunks
+            sample_width (int): Bytes per sample of the chunks
+
+        Returns:
+            TranscriptionStream: Stream to feed
+        """
+        return BufferedStream(self, sample_rate, sample_width)
+
+class GoogleBackend(TranscriptionBackend):
+    """Google Speech Recognition web API, the original online engine. Decodes whole utterances only."""
+
+    name = 'google'
+
+    def __init__(self, language: str = 'fr-FR'):
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        return self.recognizer.recognize_google(audio, language=self.language, pfilter=1)
+
+class SphinxStream(ResamplingStream):
+    def __init__(self, decoder, sample_rate: int, sample_width: int):
+        super().__init__(sample_rate, sample_width)
+        self.decoder = decoder
+        self.decoder.start_utt()
+
+    def feed(self, chunk: bytes) -> bool:
+        self.decoder.process_raw(self.convert(chunk), False, False)
+        return False
+
+    def finish(self) -> str:
+        self.decoder.end_utt()
+        hypothesis = self.decoder.hyp()
+        if hypothesis is None or not hypothesis.hypstr:
+            raise sr.UnknownValueError()
+        return hypothesis.hypstr
+
+class SphinxBackend(TranscriptionBackend):
+    """Offline CMU PocketSphinx engine, decoding chunks as they arrive.
+
+    Without model files, pocketsphinx uses its bundled en-US model. French
+    needs the CMU Sphinx French acoustic model, language model and dictionary.
+    """
+
+    name = 'sphinx'
+    streaming = True
+
+    def __init__(self, hmm: str | None = None, lm: str | None = None, dictionary: str | None = None):
+        """
+        Args:
+            hmm (str | None): Acoustic model directory
+            lm (str | None): Language model file
+            dictionary (str | None): Pronunciation dictionary file
+        """
+        try:
+            from pocketsphinx import Decoder
+        except ImportError:
+            raise sr.RequestError("missing PocketSphinx module: ensure that PocketSphinx is set up correctly.")
+        options = {key: value for key, value in (('hmm', hmm), ('lm', lm), ('dict', dictionary)) if value is not None}
+        self.decoder = Decoder(loglevel='FATAL', **options)
+
+    def open_stream(self, sample_rate: int, sample_width: int) -> TranscriptionStream:
+        # A decoder handles one utterance at a time
+        return SphinxStream(self.decoder, sample_rate, sample_width)
+
+class VoskStream(ResamplingStream):
+    def __init__(self, recognizer, sample_rate: int, sample_width: int):
+        super().__init__(sample_rate, sample_width)
+        self.recognizer = recognizer
+        self.texts = []
+
+    def feed(self, chunk: bytes) -> bool:
+        # AcceptWaveform returns True when Kaldi detects the end of an utterance
+        if self.recognizer.AcceptWaveform(self.convert(chunk)):
+            self.texts.append(json.loads(self.recognizer.Result())['text'])
+            return True
+        return False
+
+    def finish(self) -> str:
+        self.texts.append(json.loads(self.recognizer.FinalResult())['text'])
+        text = ' '.join(text for text in self.texts if text)
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+class VoskBackend(TranscriptionBackend):
+    """Offline Vosk (Kaldi) engine, decoding chunks as they arrive and detecting the end of the utterance."""
+
+    name = 'vosk'
+    streaming = True
+
+    def __init__(self, model_path: str):
+        """
+        Args:
+            model_path (str): Unpacked Vosk model directory, e.g. vosk-model-small-fr-0.22
+        """
+        try:
+            from vosk import Model, SetLogLevel
+        except ImportError:
+            raise sr.RequestError("missing Vosk module: ensure that Vosk is set up correctly.")
+        if not os.path.isdir(model_path):
+            raise sr.RequestError(f"missing Vosk model {model_path}: download it from https://alphacephei.com/vosk/models")
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def open_stream(self, sample_rate: int, sample_width: int) -> TranscriptionStream:
+        from vosk import KaldiRecognizer
+        return VoskStream(KaldiRecognizer(self.model, ENGINE_SAMPLE_RATE), sample_rate, sample_width)
+
+def create_backend(name: str) -> TranscriptionBackend:
+    """Creates a transcription backend by name.
+
+    Args:
+        name (str): 'google', 'sphinx' or 'vosk'
+
+    Returns:
+        TranscriptionBackend: The backend
+
+    Warns:
+        RuntimeWarning: If 'sphinx' falls back to the bundled English model, the French one being missing
+
+    Raises:
+        ValueError: If the name is unknown
+        sr.RequestError: If the engine or its model is not installed
+    """
+    if name == GoogleBackend.name:
+        return GoogleBackend()
+    if name == SphinxBackend.name:
+        if os.path.isdir(SPHINX_MODEL_LOCATION):
+            return SphinxBackend(
+                hmm=os.path.join(SPHINX_MODEL_LOCATION, 'acoustic-model'),
+                lm=os.path.join(SPHINX_MODEL_LOCATION, 'language-model.lm.bin'),
+                dictionary=os.path.join(SPHINX_MODEL_LOCATION, 'pronounciation-dictionary.dict')
+            )
+        warnings.warn(
+            f"French Sphinx model not found in {SPHINX_MODEL_LOCATION}, the bundled English model is used: "
+            "French speech will be transcribed as English words.",
+            RuntimeWarning
+        )
+        return SphinxBackend()
+    if name == VoskBackend.name:
+        return VoskBackend(VOSK_MODEL_LOCATION)
+    raise ValueError(f"Unknown transcription backend: {name}")
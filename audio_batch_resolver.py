@@ -0,0 +1,317 @@
+import argparse
+import audioop
+import csv
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import wave
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from batch_resolver import print_error, resolve_row
+from constants import ERROR_NOT_TRIP, ERROR_NOT_FRENCH, ERROR_UNKNOWN
+from metrics import count_outcome
+
+# Per worker process state, created by the initializers
+_backend = None
+_nlp = None
+
+def init_transcriber() -> None:
+    """Creates the transcription backend in a transcription worker (STT_BACKEND, see SpeechtoText)."""
+    global _backend
+    from Speech_Recognition.module.TranscriptionBackend import create_backend
+    _backend = create_backend(os.environ.get('STT_BACKEND', 'google'))
+
+def init_nlp() -> None:
+    """Loads the language detector, the NER models and the graph in an NLP worker."""
+    global _nlp
+    from main import services
+    _nlp = (services.get('language'), services.get('ner'), services.get('graph'))
+
+def csv_line(*fields) -> str:
+    """Formats fields as one CSV row, quoting those holding commas, quotes or line breaks."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='').writerow(fields)
+    return buffer.getvalue()
+
+def wav_files(directory: str) -> list:
+    """Lists the WAV files of a directory, sorted by name."""
+    return sorted(entry.path for entry in os.scandir(directory) if entry.is_file() and entry.name.lower().endswith('.wav'))
+
+def read_wav(file_path: str) -> tuple:
+    """Decodes a WAV file to mono signed PCM.
+
+    Returns:
+        tuple: (frames, sample rate, sample width)
+    """
+    with wave.open(file_path, 'rb') as wav:
+        frames = wav.readframes(wav.getnframes())
+        if wav.getsampwidth() == 1:
+            # 8-bit WAV samples are unsigned, AudioData and the engines expect signed ones
+            frames = audioop.bias(frames, 1, -128)
+        if wav.getnchannels() == 2:
+            frames = audioop.tomono(frames, wav.getsampwidth(), 0.5, 0.5)
+        return frames, wav.getframerate(), wav.getsampwidth()
+
+def transcribe(frames: bytes, sample_rate: int, sample_width: int) -> tuple:
+    """Transcribes decoded audio in a transcription worker.
+
+    Returns:
+        tuple: (text, None) or (None, error message)
+    """
+    import speech_recognition as sr
+    try:
+        return _backend.transcribe(sr.AudioData(frames, sample_rate, sample_width)), None
+    except sr.UnknownValueError:
+        return None, "Aucune parole reconnue"
+    except sr.RequestError as e:
+        return None, f"Service de transcription indisponible : {e}"
+
+def resolve_texts(items: list) -> list:
+    """Runs the language check, the NER and the routing on a chunk of transcriptions, in an NLP worker.
+
+    The NER runs once on the French transcriptions of the chunk (extract_loc_batch).
+
+    Args:
+        items (list): (file id, text) pairs
+
+    Returns:
+        list: For each item, (output line, outcome, error message or None). The output line is `id,city,...,city` or `id,ERROR`
+    """
+    check_french, ner, graph_algorithms = _nlp
+    results = [None] * len(items)
+    french = []
+    for i, (file_id, text) in enumerate(items):
+        try:
+            check_french(text)
+            french.append(i)
+        except Exception:
+            results[i] = (f"{file_id},{ERROR_NOT_FRENCH}", ERROR_NOT_FRENCH, f"Transcription non française : {text}")
+    itineraires = ner.extract_loc_batch([items[i][1] for i in french]) if french else []
+    for i, itineraire in zip(french, itineraires):
+        file_id, text = items[i]
+        if itineraire is None:
+            results[i] = (f"{file_id},{ERROR_NOT_TRIP}", ERROR_NOT_TRIP, f"Aucun trajet dans : {text}")
+            continue
+        line, error = resolve_row(graph_algorithms, [file_id, *(city.capitalize() for city in itineraire)])
+        results[i] = (line, 'OK' if error is None else ERROR_NOT_TRIP, error)
+    return results
+
+class RestartingPool:
+    """Process pool replaced by a new one when a worker dies.
+
+    A dead worker breaks a ProcessPoolExecutor for good: its tasks and every
+    later submit fail with BrokenProcessPool. The submit that finds the pool
+    broken still fails, so the caller marks its rows as errors, and the
+    next ones go to a new pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Args:
+            *args, **kwargs: ProcessPoolExecutor arguments
+        """
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(*args, **kwargs)
+        self.restarts = 0
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            executor = self.executor
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            with self._lock:
+                # Replaced once, by the first submit that finds it broken
+                if self.executor is executor:
+                    executor.shutdown(wait=False)
+                    self.executor = ProcessPoolExecutor(*self._args, **self._kwargs)
+                    self.restarts += 1
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self.executor.shutdown()
+
+def resolve_audio_directory(directory: str, output_path: str, workers: int | None = None, nlp_workers: int = 1, max_pending: int | None = None, transcribe_only: bool = False, nlp_batch_size: int = 32, on_error=print_error) -> dict:
+    """Streams a directory of WAV files through decoding, transcription and NLP stages, and writes one row per file.
+
+    Files are decoded by a reader thread into a bounded queue, transcribed
+    in a pool of worker processes, then resolved (check_french,
+    extract_loc, routing) in a second pool. The three stages overlap, and at
+    most max_pending files are in flight, so memory stays bounded whatever
+    the number of files. Rows are written in file name order, the id of a
+    row is the file name without extension.
+
+    Transcriptions are sent to the NLP stage in chunks of nlp_batch_size,
+    each one resolved with a single NER batch. A chunk is sent when it is
+    full or when no transcription is running, so the last files never wait
+    for a chunk that cannot fill up. A pool broken by a dead worker is
+    replaced, the files it was processing are written as errors.
+
+    Args:
+        directory (str): Directory of WAV files
+        output_path (str): Output CSV file
+        workers (int | None): Transcription processes, None for one per core
+        nlp_workers (int): NLP processes, each one loads the models
+        max_pending (int | None): Files in flight, defaults to four times the number of workers
+        transcribe_only (bool): Write `id,text` rows and skip the NLP stage
+        nlp_batch_size (int): Transcriptions per NLP chunk
+        on_error (callable): Called with (output line, error message) for each failed file
+
+    Returns:
+        dict: Number of files, errors, outcomes, pool restarts and elapsed seconds
+    """
+    workers = workers or os.cpu_count()
+    max_pending = max_pending or 4 * workers
+    stats = {'rows': 0, 'errors': 0, 'outcomes': Counter()}
+    start = time.perf_counter()
+
+    # Bounded queue between decoding and transcription: the reader waits when transcription falls behind
+    decoded = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def read_files():
+        for file_path in wav_files(directory):
+            file_id = os.path.splitext(os.path.basename(file_path))[0]
+            try:
+                item = (file_id, read_wav(file_path), None)
+            except (wave.Error, EOFError, OSError) as e:
+                item = (file_id, None, f"Fichier illisible : {e!r}")
+            while not stop.is_set():
+                try:
+                    decoded.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if stop.is_set():
+                return
+        decoded.put(None)
+
+    # Workers are started with spawn: forking while the reader thread runs is not safe
+    context = multiprocessing.get_context('spawn')
+    transcribers = RestartingPool(workers, context, initializer=init_transcriber)
+    resolvers = RestartingPool(nlp_workers, context, initializer=None if transcribe_only else init_nlp)
+    # Transcriptions waiting for a full NLP chunk, and transcriptions running
+    chunk = []
+    transcribing = 0
+    lock = threading.Lock()
+
+    def fail(result, file_id, error):
+        result.set_result((f"{file_id},{ERROR_UNKNOWN}", ERROR_UNKNOWN, error))
+
+    def flush():
+        """Sends the waiting transcriptions to the NLP pool as one chunk."""
+        nonlocal chunk
+        with lock:
+            items, chunk = chunk, []
+        if not items:
+            return
+
+        def resolved(future):
+            try:
+                for (_, _, result), row in zip(items, future.result()):
+                    result.set_result(row)
+            except Exception as e:
+                for file_id, _, result in items:
+                    fail(result, file_id, repr(e))
+
+        try:
+            resolvers.submit(resolve_texts, [(file_id, text) for file_id, text, _ in items]).add_done_callback(resolved)
+        except Exception as e:
+            # Pool broken by a worker that failed to load the models or died, the next chunks go to a new pool
+            for file_id, _, result in items:
+                fail(result, file_id, repr(e))
+
+    def submit(file_id, audio, error) -> Future:
+        """Chains transcription and NLP for one file, the returned future gives (line, outcome, error)."""
+        nonlocal transcribing
+        result = Future()
+        if error is not None:
+            fail(result, file_id, error)
+            return result
+
+        def transcribed(future):
+            nonlocal transcribing
+            try:
+                text, error = future.result()
+            except Exception as e:
+                text, error = None, repr(e)
+            if text is None:
+                fail(result, file_id, error)
+            elif transcribe_only:
+                # Transcripts are free text: quoted so that commas do not split the row
+                result.set_result((csv_line(file_id, text), 'OK', None))
+            else:
+                with lock:
+                    chunk.append((file_id, text, result))
+            with lock:
+                transcribing -= 1
+                ready = len(chunk) >= nlp_batch_size or (chunk and not transcribing)
+            if ready:
+                flush()
+
+        with lock:
+            transcribing += 1
+        try:
+            transcribers.submit(transcribe, *audio).add_done_callback(transcribed)
+        except BrokenProcessPool as e:
+            # A transcription worker died: this file is an error, the next ones go to a new pool
+            with lock:
+                transcribing -= 1
+                ready = bool(chunk) and not transcribing
+            fail(result, file_id, f"Processus de transcription interrompu : {e!r}")
+            if ready:
+                flush()
+        return result
+
+    def write(result, output):
+        line, outcome, error = result
+        output.write(line + '\n')
+        stats['rows'] += 1
+        stats['outcomes'][outcome] += 1
+        if error is not None:
+            stats['errors'] += 1
+            on_error(line, error)
+
+    reader = threading.Thread(target=read_files, name='wav-reader', daemon=True)
+    reader.start()
+    try:
+        with open(output_path, 'w', encoding='utf-8', newline='') as output:
+            pending = deque()
+            for item in iter(decoded.get, None):
+                if len(pending) >= max_pending:
+                    write(pending.popleft().result(), output)
+                pending.append(submit(*item))
+            while pending:
+                write(pending.popleft().result(), output)
+    finally:
+        stop.set()
+        reader.join()
+        transcribers.shutdown()
+        resolvers.shutdown()
+    stats['restarts'] = transcribers.restarts + resolvers.restarts
+
+    stats['seconds'] = time.perf_counter() - start
+    for outcome, count in stats['outcomes'].items():
+        count_outcome(outcome, count)
+    stats['outcomes'] = dict(stats['outcomes'])
+    return stats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Transcrit et résout un dossier de fichiers WAV en trajets.")
+    parser.add_argument('directory', help="Dossier des fichiers WAV")
+    parser.add_argument('output', help="Fichier CSV de sortie")
+    parser.add_argument('--workers', type=int, default=None, help="Processus de transcription (un par coeur par défaut)")
+    parser.add_argument('--nlp-workers', type=int, default=1, help="Processus NLP, chacun charge les modèles")
+    parser.add_argument('--transcribe-only', action='store_true', help="Écrit id,texte sans résoudre les trajets")
+    args = parser.parse_args()
+
+    stats = resolve_audio_directory(args.directory, args.output, workers=args.workers, nlp_workers=args.nlp_workers, transcribe_only=args.transcribe_only)
+    print(f"{stats['rows']} fichiers, {stats['errors']} erreurs, {stats['rows'] / stats['seconds']:.1f} fichiers/s {stats['outcomes']}")
@@ -0,0 +1,147 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import ERROR_NOT_TRIP
+from metrics import count_outcome
+
+# Graph loaded once per worker process by init_worker
+_graph_algorithms = None
+
+def init_worker() -> None:
+    """Loads the graph in a worker process."""
+    global _graph_algorithms
+    from main import create_graph_algorithms
+    _graph_algorithms = create_graph_algorithms()
+
+def resolve_row(graph_algorithms, row: list) -> tuple:
+    """Resolves one `id,departure,destination` row, or `id,departure,stop,...,destination` for a trip with stops.
+
+    Args:
+        graph_algorithms (GraphAlgorithms): Graph to route on
+        row (list): CSV fields
+
+    Returns:
+        tuple: (output line, error message or None). The output line is `id,city,...,city` or `id,NOT_TRIP`
+    """
+    row_id = row[0].strip() if row else ''
+    if len(row) < 3:
+        return f"{row_id},{ERROR_NOT_TRIP}", f"{len(row)} champs au lieu d'au moins 3"
+    stops = [city.strip() for city in row[1:]]
+    departure, destination = stops[0], stops[-1]
+    outside = [city for city in stops if not graph_algorithms.check_node_exists(city)]
+    for city in outside:
+        if not graph_algorithms.can_snap(city):
+            return f"{row_id},{ERROR_NOT_TRIP}", f"Le noeud {city} n'existe pas dans le graphe."
+    if outside:
+        # Cities outside of the graph are written next to the city of the graph they are connected to
+        path = graph_algorithms.snapped_path(stops)
+    elif len(stops) > 2:
+        path = graph_algorithms.multi_stop_path(stops)
+    elif graph_algorithms.table is not None:
+        path = graph_algorithms.table_path(departure, destination)
+    else:
+        path = graph_algorithms.dijkstra(departure, destination)
+    if path is None:
+        return f"{row_id},{ERROR_NOT_TRIP}", f"Aucun trajet de {departure} à {destination}"
+    return f"{row_id}," + ','.join(path), None
+
+def resolve_rows(rows: list) -> list:
+    """Resolves a chunk of rows in a worker process.
+
+    Args:
+        rows (list): List of CSV rows
+
+    Returns:
+        list: List of (output line, error message or None), in input order
+    """
+    results = []
+    for row in rows:
+        try:
+            results.append(resolve_row(_graph_algorithms, row))
+        except Exception as e:
+            row_id = row[0].strip() if row else ''
+            results.append((f"{row_id},{ERROR_NOT_TRIP}", repr(e)))
+    return results
+
+def read_chunks(reader, chunk_size: int):
+    """Yields lists of at most chunk_size non-empty rows."""
+    rows = (row for row in reader if row)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def print_error(line: str, error: str) -> None:
+    """Default per-row error reporter, writes to stderr."""
+    print(f"{line.split(',', 1)[0]} - {error}", file=sys.stderr)
+
+def resolve_csv(input_path: str, output_path: str, workers: int | None = None, chunk_size: int = 2000, max_pending: int | None = None, on_error=print_error) -> dict:
+    """Streams an `id,departure,destination` CSV through a process pool and writes routes in input order.
+
+    At most max_pending chunks are in flight, so memory stays bounded
+    whatever the size of the input file. Rows that fail are written as
+    `id,NOT_TRIP` and reported through on_error instead of aborting the run.
+
+    Args:
+        input_path (str): Input CSV file
+        output_path (str): Output CSV file
+        workers (int | None): Number of worker processes, None for one per core, 0 to resolve in this process
+        chunk_size (int): Rows sent to a worker at once
+        max_pending (int | None): Chunks in flight, defaults to twice the number of workers
+        on_error (callable): Called with (output line, error message) for each failed row
+
+    Returns:
+        dict: Number of rows, number of errors and elapsed seconds
+    """
+    stats = {'rows': 0, 'errors': 0}
+    start = time.perf_counter()
+
+    def write(results, output):
+        for line, error in results:
+            output.write(line + '\n')
+            stats['rows'] += 1
+            if error is not None:
+                stats['errors'] += 1
+                on_error(line, error)
+
+    with open(input_path, 'r', encoding='utf-8', newline='') as f, open(output_path, 'w', encoding='utf-8', newline='') as output:
+        chunks = read_chunks(csv.reader(f), chunk_size)
+        if workers == 0:
+            if _graph_algorithms is None:
+                init_worker()
+            for chunk in chunks:
+                write(resolve_rows(chunk), output)
+        else:
+            workers = workers or os.cpu_count()
+            max_pending = max_pending or 2 * workers
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                pending = deque()
+                for chunk in chunks:
+                    if len(pending) >= max_pending:
+                        write(pending.popleft().result(), output)
+                    pending.append(executor.submit(resolve_rows, chunk))
+                while pending:
+                    write(pending.popleft().result(), output)
+
+    stats['seconds'] = time.perf_counter() - start
+    count_outcome('OK', stats['rows'] - stats['errors'])
+    count_outcome(ERROR_NOT_TRIP, stats['errors'])
+    return stats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Résout un fichier CSV id,départ,destination en trajets.")
+    parser.add_argument('input', help="Fichier CSV d'entrée")
+    parser.add_argument('output', help="Fichier CSV de sortie")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus (0: pas de pool)")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="Lignes envoyées à un processus à la fois")
+    args = parser.parse_args()
+
+    stats = resolve_csv(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size)
+    print(f"{stats['rows']} lignes, {stats['errors']} erreurs, {stats['rows'] / stats['seconds']:.0f} lignes/s")
@@ -0,0 +1,47 @@
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.suite import DEFAULT_BASELINE, SUITES, compare, load_report, run_suites, save_report
+
+parser = argparse.ArgumentParser(
+    prog='python -m benchmarks',
+    description="Lance les benchmarks et compare les débits à une référence enregistrée."
+)
+parser.add_argument('suites', nargs='*', metavar='suite',
+                    help=f"Suites à lancer parmi {', '.join(SUITES)} (toutes par défaut)")
+parser.add_argument('--output', help="Fichier JSON des résultats (sortie standard par défaut)")
+parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Fichier JSON de référence")
+parser.add_argument('--threshold', type=float, default=0.1, help="Baisse de débit tolérée, 0.1 pour 10 %%")
+parser.add_argument('--save-baseline', action='store_true', help="Enregistre les résultats comme nouvelle référence")
+args = parser.parse_args()
+unknown = [name for name in args.suites if name not in SUITES]
+if unknown:
+    parser.error(f"suite inconnue : {', '.join(unknown)}")
+
+suites = args.suites or list(SUITES)
+report = run_suites(suites)
+
+if os.path.isfile(args.baseline) and not args.save_baseline:
+    report['baseline'] = args.baseline
+    report['threshold'] = args.threshold
+    report['regressions'] = compare(report['results'], load_report(args.baseline)['results'], args.threshold, suites)
+
+if args.output:
+    save_report(report, args.output)
+else:
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if args.save_baseline:
+    save_report(report, args.baseline)
+    print(f"Référence enregistrée dans {args.baseline}", file=sys.stderr)
+
+for regression in report.get('regressions', []):
+    if regression['current'] is None:
+        print(f"Régression {regression['metric']}: {regression['baseline']:.1f} -> absent des résultats", file=sys.stderr)
+    else:
+        print(f"Régression {regression['metric']}: {regression['baseline']:.1f} -> {regression['current']:.1f} "
+              f"({regression['change']:+.0%})", file=sys.stderr)
+# A suite that failed is not measured: the run fails even without a baseline
+sys.exit(1 if report.get('regressions') or report['errors'] else 0)
@@ -0,0 +1,57 @@
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import speech_recognition as sr
+
+from audio_batch_resolver import read_wav, resolve_audio_directory
+from Speech_Recognition.module.TranscriptionBackend import SphinxBackend
+
+AUDIO_FILES = sorted(glob.glob('POC_Speech_Recognition/fruits_audio/*/*.wav'))
+
+def sequential_rate(files: list) -> float:
+    """Decodes and transcribes files one after the other in this process, as the microphone mode would.
+
+    Returns:
+        float: Files per second
+    """
+    backend = SphinxBackend()
+    start = time.perf_counter()
+    for file_path in files:
+        try:
+            backend.transcribe(sr.AudioData(*read_wav(file_path)))
+        except sr.UnknownValueError:
+            pass
+    return len(files) / (time.perf_counter() - start)
+
+def bench_audio_batch(worker_counts: tuple | None = None, transcribe_only: bool = True) -> dict:
+    """Measures audio batch throughput on the fruits_audio recordings for several numbers of transcription workers.
+
+    The offline PocketSphinx backend is used so the measure does not depend on the network.
+    With transcribe_only, the NLP stage (which needs the NER models) is skipped.
+
+    Returns:
+        dict: Files, sequential files per second and, per number of workers, pipeline files per second
+    """
+    worker_counts = worker_counts or tuple(sorted({1, 2, 4, os.cpu_count()} & set(range(1, os.cpu_count() + 1))))
+    os.environ['STT_BACKEND'] = 'sphinx'
+    results = {'files': len(AUDIO_FILES), 'sequential_per_second': sequential_rate(AUDIO_FILES)}
+    with tempfile.TemporaryDirectory() as directory:
+        for file_path in AUDIO_FILES:
+            shutil.copy(file_path, directory)
+        for workers in worker_counts:
+            stats = resolve_audio_directory(
+                directory, os.path.join(directory, 'output.csv'), workers=workers,
+                transcribe_only=transcribe_only, on_error=lambda line, error: None
+            )
+            results[f'workers_{workers}_per_second'] = stats['rows'] / stats['seconds']
+    return results
+
+if __name__ == '__main__':
+    result = bench_audio_batch()
+    print(f"{result['files']} files, sequential: {result['sequential_per_second']:.2f} files/s")
+    for name, value in result.items():
+        if name.startswith('workers_'):
+            print(f"{name.split('_')[1]:>3} workers: {value:.2f} files/s")
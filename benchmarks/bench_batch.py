@@ -0,0 +1,43 @@
+import os
+import random
+import tempfile
+
+from batch_resolver import resolve_csv
+from benchmarks.bench_pathfinding import load_algorithms
+
+def write_synthetic_csv(path: str, rows: int, unknown_ratio: float = 0.01, seed: int = 0) -> None:
+    """Writes an `id,departure,destination` CSV of random city pairs.
+
+    Args:
+        path (str): Output file
+        rows (int): Number of rows
+        unknown_ratio (float): Share of rows with a city unknown to the pathfinder (neither in the graph nor in fr.csv),
+            which exercises the error path
+        seed (int): Random seed
+    """
+    rng = random.Random(seed)
+    # Cities of fr.csv outside of the graph are routed from their nearest cities: only an unknown name fails
+    names = load_algorithms().compact.names
+    with open(path, 'w', encoding='utf-8') as f:
+        for row_id in range(1, rows + 1):
+            departure, destination = rng.sample(names, 2)
+            if rng.random() < unknown_ratio:
+                destination = 'Ville-Inconnue'
+            f.write(f"{row_id},{departure},{destination}\n")
+
+def bench_batch(rows: int = 1_000_000, workers: int | None = None) -> dict:
+    """Measures batch resolver throughput on a synthetic file.
+
+    Returns:
+        dict: Rows, errors (the rows with an unknown city), seconds and rows per second
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'input.csv')
+        write_synthetic_csv(input_path, rows)
+        stats = resolve_csv(input_path, os.path.join(directory, 'output.csv'), workers=workers, on_error=lambda line, error: None)
+    stats['rows_per_second'] = stats['rows'] / stats['seconds']
+    return stats
+
+if __name__ == '__main__':
+    stats = bench_batch()
+    print(f"{stats['rows']} rows, {stats['errors']} errors, {stats['seconds']:.1f} s, {stats['rows_per_second']:.0f} rows/s on {os.cpu_count()} cores")
@@ -0,0 +1,99 @@
+import difflib
+import random
+import re
+import time
+
+from NLP.modules_nlp.city_matcher import CityMatcher, normalize
+from NLP.modules_nlp.process_departure_destination import preprocess_triplets
+
+CITY_LISTS = ['NLP/liste_villes_500.txt', 'NLP/liste_villes_full.txt']
+SAMPLE_FILE = 'NLP/samples/sample_nlp_input_mispelled.txt'
+
+def sample_queries(file_path: str = SAMPLE_FILE) -> list:
+    """Normalized words and word pairs of the sample sentences, as the NER would hand them to the matcher."""
+    queries = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            words = re.findall(r"[\w'-]+", line.split(',', 1)[-1])
+            queries += [normalize(word) for word in words]
+            queries += [normalize(' '.join(pair)) for pair in zip(words, words[1:])]
+    return queries
+
+def bench_fuzzy_matching(cutoff: float = 0.8) -> dict:
+    """Compares difflib.get_close_matches with CityMatcher on the sample queries, for each city list.
+
+    Returns:
+        dict: Per city list, mean latency of both matchers (ms), index build time (ms) and whether results agree
+    """
+    queries = sample_queries()
+    results = {}
+    for city_list in CITY_LISTS:
+        with open(city_list, 'r') as f:
+            cities = f.read().splitlines()
+
+        start = time.perf_counter()
+        matcher = CityMatcher(cities)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        expected = [next(iter(difflib.get_close_matches(query, cities, n=1, cutoff=cutoff)), None) for query in queries]
+        difflib_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        start = time.perf_counter()
+        found = [matcher.best_match(query, cutoff=cutoff) for query in queries]
+        index_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        results[city_list] = {
+            'queries': len(queries),
+            'build_ms': build_ms,
+            'difflib_ms': difflib_ms,
+            'index_ms': index_ms,
+            'same_matches': expected == found,
+        }
+    return results
+
+def misspell(rng: random.Random, name: str) -> str:
+    """Deletes, duplicates or replaces one letter of a name."""
+    i = rng.randrange(len(name))
+    edit = rng.choice(('delete', 'duplicate', 'replace'))
+    if edit == 'delete' and len(name) > 3:
+        return name[:i] + name[i + 1:]
+    if edit == 'duplicate':
+        return name[:i + 1] + name[i:]
+    return name[:i] + rng.choice('aeiouy') + name[i + 1:]
+
+def generate_triplets(size: int, seed: int = 0) -> list:
+    """Generates `id,departure,destination` triplets with one misspelled letter per city, like NER outputs on sample_nlp_input_mispelled.txt."""
+    rng = random.Random(seed)
+    with open(CITY_LISTS[0], 'r') as f:
+        cities = [city.title() for city in f.read().splitlines() if city]
+    return [
+        f"{i},{misspell(rng, rng.choice(cities))},{misspell(rng, rng.choice(cities))}" for i in range(1, size + 1)
+    ]
+
+def bench_preprocess_triplets(size: int = 500, repeat: int = 3) -> dict:
+    """Measures preprocess_triplets throughput against each city list.
+
+    The index of each list is built before timing, as it is once per process in the application.
+
+    Returns:
+        dict: Per city list, triplets per second (fastest of repeat runs)
+    """
+    triplets = generate_triplets(size)
+    results = {}
+    for city_list in CITY_LISTS:
+        CityMatcher.from_file(city_list)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            preprocess_triplets(triplets, city_list, verbose=False)
+            best = min(best, time.perf_counter() - start)
+        results[city_list] = {'triplets': size, 'triplets_per_second': size / best}
+    return results
+
+if __name__ == '__main__':
+    for city_list, result in bench_preprocess_triplets().items():
+        print(f"{city_list}: preprocess_triplets {result['triplets_per_second']:.0f} triplets/s")
+    for city_list, result in bench_fuzzy_matching().items():
+        print(f"{city_list}: difflib {result['difflib_ms']:.3f} ms/query, index {result['index_ms']:.3f} ms/query "
+              f"(built in {result['build_ms']:.0f} ms, {result['queries']} queries, same matches: {result['same_matches']})")
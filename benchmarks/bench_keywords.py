@@ -0,0 +1,94 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from Speech_Recognition.module.FeatureStore import FeatureStore, extract_mfcc
+from Speech_Recognition.module.KeywordRecognizer import KeywordRecognizer, list_dataset
+
+DATASET = 'POC_Speech_Recognition/fruits_audio'
+
+def split(samples: list, test_every: int = 5) -> tuple:
+    """Holds out one recording out of test_every, labels are interleaved in both sets since samples are sorted by label."""
+    train = [sample for index, sample in enumerate(samples) if index % test_every]
+    test = [sample for index, sample in enumerate(samples) if not index % test_every]
+    return train, test
+
+def time_extraction(file_paths: list, workers: int | None) -> float:
+    """Extracts the features of files into an empty store.
+
+    Returns:
+        float: Elapsed seconds
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        FeatureStore(os.path.join(directory, 'features.npz')).get(file_paths, workers=workers)
+        return time.perf_counter() - start
+
+def time_scoring(recognizer: KeywordRecognizer, features: list, vectorized: bool, repeat: int = 5) -> float:
+    """Best mean scoring latency of an utterance against all the keyword models.
+
+    Returns:
+        float: Seconds per utterance
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for utterance in features:
+            if vectorized:
+                recognizer.scores(utterance)
+            else:
+                [model.score(utterance) for model in recognizer.models]
+        best = min(best, (time.perf_counter() - start) / len(features))
+    return best
+
+def bench_keywords(workers: int | None = None) -> dict:
+    """Measures feature extraction, training and scoring of the keyword recognizer on fruits_audio.
+
+    Returns:
+        dict: Timings in seconds, held-out accuracy and the largest gap between vectorized and hmmlearn scores
+    """
+    samples = list_dataset(DATASET)
+    file_paths = [file_path for file_path, _ in samples]
+    # librosa compiles its numba kernels on first use and caches them on disk, kept out of the timings
+    extract_mfcc(file_paths[0])
+    results = {
+        'files': len(samples),
+        'extraction_serial_seconds': time_extraction(file_paths, workers=0),
+        'extraction_parallel_seconds': time_extraction(file_paths, workers=workers),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = FeatureStore(os.path.join(directory, 'features.npz'))
+        store.get(file_paths, workers=workers)
+        start = time.perf_counter()
+        features = dict(zip(file_paths, FeatureStore(store.path).get(file_paths)))
+        results['extraction_cached_seconds'] = time.perf_counter() - start
+
+    train, test = split(samples)
+    # Imported by the first fit otherwise, and counted in the serial training time
+    import hmmlearn.hmm
+    train_features, train_labels = [features[path] for path, _ in train], [label for _, label in train]
+    for name, pool in (('serial', 0), ('concurrent', workers)):
+        start = time.perf_counter()
+        recognizer = KeywordRecognizer().fit(train_features, train_labels, workers=pool)
+        results[f'training_{name}_seconds'] = time.perf_counter() - start
+
+    test_features = [features[path] for path, _ in test]
+    results['scoring_hmmlearn_seconds'] = time_scoring(recognizer, test_features, vectorized=False)
+    results['scoring_vectorized_seconds'] = time_scoring(recognizer, test_features, vectorized=True)
+    results['max_score_difference'] = max(
+        float(np.max(np.abs(recognizer.scores(utterance) - [model.score(utterance) for model in recognizer.models])))
+        for utterance in test_features
+    )
+    results['accuracy'] = np.mean([recognizer.predict(features[path]) == label for path, label in test])
+    return results
+
+if __name__ == '__main__':
+    result = bench_keywords()
+    print(f"{result['files']} files")
+    print(f"extraction: serial {result['extraction_serial_seconds']:.2f}s, parallel {result['extraction_parallel_seconds']:.2f}s, cached {result['extraction_cached_seconds'] * 1000:.1f}ms")
+    print(f"training: serial {result['training_serial_seconds']:.2f}s, concurrent {result['training_concurrent_seconds']:.2f}s")
+    print(f"scoring: hmmlearn {result['scoring_hmmlearn_seconds'] * 1000:.2f}ms, vectorized {result['scoring_vectorized_seconds'] * 1000:.2f}ms per utterance")
+    print(f"max score difference: {result['max_score_difference']:.2e}, held-out accuracy: {result['accuracy']:.0%}")
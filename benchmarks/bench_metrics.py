@@ -0,0 +1,54 @@
+import itertools
+import time
+
+from benchmarks.bench_pathfinding import load_algorithms
+from metrics import Metrics
+
+def time_instrumented_queries(algorithms, metrics: Metrics, pairs: list, repeat: int = 20) -> float:
+    """Times Dijkstra queries instrumented like main.travel_order.
+
+    Returns:
+        float: Mean latency per query in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for source, target in pairs:
+            stats = {}
+            with metrics.stage('pathfinding_dijkstra'):
+                path = algorithms.dijkstra(source, target, stats=stats)
+            metrics.observe_expansions('dijkstra', stats['expanded'])
+            metrics.count_outcome('OK' if path is not None else 'NOT_TRIP')
+    return (time.perf_counter() - start) / (repeat * len(pairs)) * 1e6
+
+def bench_metrics_overhead(calls: int = 200000) -> dict:
+    """Measures the cost of the instrumentation, disabled and enabled.
+
+    Nothing is pushed: only the recording cost is measured.
+
+    Returns:
+        dict: Per mode (none for uninstrumented queries), cost of one stage() timer (ns) and mean Dijkstra latency (us)
+    """
+    algorithms = load_algorithms()
+    pairs = list(itertools.permutations(algorithms.compact.names, 2))
+    start = time.perf_counter()
+    for _ in range(20):
+        for source, target in pairs:
+            algorithms.dijkstra(source, target)
+    results = {'none': {'stage_ns': 0.0, 'query_us': (time.perf_counter() - start) / (20 * len(pairs)) * 1e6}}
+    for name, enabled in (('disabled', False), ('enabled', True)):
+        metrics = Metrics(enabled, gateway='localhost:0')
+        start = time.perf_counter()
+        for _ in range(calls):
+            with metrics.stage('bench'):
+                pass
+        results[name] = {
+            'stage_ns': (time.perf_counter() - start) / calls * 1e9,
+            'query_us': time_instrumented_queries(algorithms, metrics, pairs),
+        }
+        # The enabled instance registers a push at exit, which is not wanted here
+        metrics.enabled = False
+    return results
+
+if __name__ == '__main__':
+    for name, result in bench_metrics_overhead().items():
+        print(f"Métriques {name:>8}: stage() {result['stage_ns']:.0f} ns, Dijkstra {result['query_us']:.1f} us/requête")
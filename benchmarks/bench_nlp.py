@@ -0,0 +1,156 @@
+import json
+import random
+import subprocess
+import sys
+import time
+
+from NLP.modules_nlp.process_departure_destination import extract_departure_destination, format_triplet, process_batch
+
+CITY_LIST_FILE = 'NLP/liste_villes_500.txt'
+SAMPLE_FILES = ['NLP/samples/sample_nlp_input.txt', 'NLP/samples/sample_nlp_input_mispelled.txt']
+
+TEMPLATES = [
+    "je voudrais aller de {departure} à {destination}",
+    "Comment me rendre à {destination} depuis la gare de {departure} ?",
+    "Je veux aller voir mon ami Albert à {destination} en partant de {departure}",
+    "Un billet {departure} {destination} s'il vous plaît",
+    "I would like to go from {departure} to {destination}",
+    "Quel temps fait-il à {departure} ?",
+]
+
+def generate_corpus(size: int, seed: int = 0) -> list:
+    """Generates (id, text) trip orders from sentence templates and the city list.
+
+    Args:
+        size (int): Number of sentences
+        seed (int): Random seed
+
+    Returns:
+        list: List of (id, text)
+    """
+    rng = random.Random(seed)
+    with open(CITY_LIST_FILE, 'r', encoding='utf-8') as f:
+        cities = [city.title() for city in f.read().splitlines() if city]
+    return [
+        (str(i), rng.choice(TEMPLATES).format(departure=rng.choice(cities), destination=rng.choice(cities)))
+        for i in range(1, size + 1)
+    ]
+
+def bench_ner_batching(nlp_lang, nlp_itineraire, size: int = 5000, batch_size: int = 256, n_process: int = 1) -> dict:
+    """Compares per-sentence extraction with process_batch on a generated corpus.
+
+    Returns:
+        dict: Sentences per second for each path, and whether both produced the same triplets
+    """
+    corpus = generate_corpus(size)
+
+    start = time.perf_counter()
+    sequential = [format_triplet(file_id, extract_departure_destination(text, nlp_lang, nlp_itineraire, verbose=False)) for file_id, text in corpus]
+    sequential_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = list(process_batch(corpus, nlp_lang, nlp_itineraire, batch_size=batch_size, n_process=n_process))
+    batched_seconds = time.perf_counter() - start
+
+    return {
+        'sentences': size,
+        'per_sentence_per_second': size / sequential_seconds,
+        'batched_per_second': size / batched_seconds,
+        'same_output': sequential == batched,
+    }
+
+def read_samples(file_paths: list = SAMPLE_FILES) -> list:
+    """Returns the texts of the `id,text` sample files."""
+    texts = []
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            texts += [line.rstrip('\n').split(',', 1)[-1] for line in f if line.strip()]
+    return texts
+
+def bench_extract_loc(service, size: int = 2000, repeat: int = 3) -> dict:
+    """Measures EntityRecognitionService.extract_loc throughput on the samples and on a generated corpus.
+
+    The service should be created with cache_size=0 and no cache file, so every call runs the models.
+
+    Returns:
+        dict: Texts per second on the samples (fastest of repeat runs) and on the corpus
+    """
+    def rate(texts, runs):
+        best = float('inf')
+        for _ in range(runs):
+            start = time.perf_counter()
+            for text in texts:
+                try:
+                    service.extract_loc(text)
+                except SystemExit:
+                    # Texts without itinerary end the CLI through exit()
+                    pass
+            best = min(best, time.perf_counter() - start)
+        return len(texts) / best
+
+    samples = read_samples()
+    corpus = [text for _, text in generate_corpus(size)]
+    return {
+        'samples': len(samples),
+        'samples_per_second': rate(samples, repeat),
+        'corpus': size,
+        'corpus_per_second': rate(corpus, 1),
+    }
+
+# Loads a language pipeline in a fresh interpreter and reports peak RSS and per-request latency
+LANGUAGE_GATE_PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, '.')
+from benchmarks.bench_nlp import generate_corpus
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+{load}
+corpus = generate_corpus(500)
+start = time.perf_counter()
+for _, text in corpus:
+    nlp(text)._.language
+latency_ms = (time.perf_counter() - start) / len(corpus) * 1000
+print(json.dumps({{'rss_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024, 'latency_ms': latency_ms}}))
+"""
+
+LANGUAGE_PIPELINES = {
+    'fr_core_news_md': """
+import spacy
+from spacy.language import Language
+from spacy_langdetect import LanguageDetector
+Language.factory('language_detector', func=lambda nlp, name: LanguageDetector())
+nlp = spacy.load('fr_core_news_md')
+nlp.add_pipe('language_detector', last=True)
+""",
+    'language_gate': """
+from NLP.module.LanguageGate import create_language_pipeline
+nlp = create_language_pipeline()
+""",
+}
+
+def bench_language_gate() -> dict:
+    """Compares memory and per-request latency of the md pipeline and the language gate.
+
+    Returns:
+        dict: Per pipeline, the RSS added by loading it (MB) and mean latency (ms), None if it cannot be loaded
+    """
+    results = {}
+    for name, load in LANGUAGE_PIPELINES.items():
+        process = subprocess.run(
+            [sys.executable, '-c', LANGUAGE_GATE_PROBE.format(load=load)], capture_output=True, text=True
+        )
+        results[name] = json.loads(process.stdout) if process.returncode == 0 else None
+    return results
+
+if __name__ == '__main__':
+    for name, result in bench_language_gate().items():
+        if result is None:
+            print(f"{name:>16}: unavailable")
+        else:
+            print(f"{name:>16}: +{result['rss_mb']:.0f} MB RSS, {result['latency_ms']:.2f} ms/request")
+
+    from NLP.module.EntityRecognitionService import EntityRecognitionService
+
+    service = EntityRecognitionService()
+    result = bench_ner_batching(service.nlp_fr, service.nlp_itineraire)
+    print(f"{result['sentences']} sentences: {result['per_sentence_per_second']:.0f}/s per sentence, "
+          f"{result['batched_per_second']:.0f}/s with nlp.pipe (same output: {result['same_output']})")
@@ -0,0 +1,333 @@
+import itertools
+import random
+import time
+
+import networkx as nx
+import numpy as np
+
+from Path_Finding.module.FranceGraphBuilder import FranceGraphBuilder
+from Path_Finding.module.GraphAlgorithms import GraphAlgorithms
+from Path_Finding.module.LandmarkHeuristic import EARTH_RADIUS_KM
+from Path_Finding.module.RouteCache import RouteCache
+from Path_Finding.module.SpatialIndex import SpatialIndex
+
+CITY_DATA_FILE = 'Path_Finding/module/data/fr.csv'
+GRAPH_DATA_FILE = 'Path_Finding/module/data/fr.json'
+
+def load_algorithms() -> GraphAlgorithms:
+    """Builds the France graph used by main.py, with the cities outside of the graph as places."""
+    builder = FranceGraphBuilder(city_data_file=CITY_DATA_FILE, graph_data_file=GRAPH_DATA_FILE)
+    return GraphAlgorithms(builder.create_graph(), places=builder.load_places())
+
+def grid_algorithms(side: int = 40, seed: int = 0) -> GraphAlgorithms:
+    """Builds a side x side grid graph with random weights, larger than the France graph."""
+    rng = random.Random(seed)
+    grid = nx.grid_2d_graph(side, side)
+    graph = nx.Graph()
+    for x, y in grid.nodes:
+        graph.add_node(f'{x}_{y}', pos=(x, y))
+    for (x1, y1), (x2, y2) in grid.edges:
+        graph.add_edge(f'{x1}_{y1}', f'{x2}_{y2}', weight=rng.uniform(1, 10))
+    return GraphAlgorithms(graph)
+
+def bench_astar_heuristics(algorithms: GraphAlgorithms) -> dict:
+    """Compares nodes expanded by A* with the Euclidean and the landmark heuristics over all city pairs.
+
+    Args:
+        algorithms (GraphAlgorithms): Graph to query
+
+    Returns:
+        dict: Per-heuristic mean expanded nodes and mean latency in microseconds
+    """
+    pairs = list(itertools.permutations(algorithms.compact.names, 2))
+    algorithms.prepare_landmarks()
+    results = {}
+    for name, use_landmarks in (('euclidean', False), ('landmarks', True)):
+        expanded = 0
+        start = time.perf_counter()
+        for source, target in pairs:
+            stats = {}
+            algorithms.astar_search(source, target, use_landmarks=use_landmarks, stats=stats)
+            expanded += stats['expanded']
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            'pairs': len(pairs),
+            'mean_expanded': expanded / len(pairs),
+            'mean_latency_us': elapsed / len(pairs) * 1e6,
+        }
+    return results
+
+def bench_bidirectional(algorithms: GraphAlgorithms, pairs: list | None = None) -> dict:
+    """Compares nodes expanded and latency of the unidirectional and bidirectional searches.
+
+    Args:
+        algorithms (GraphAlgorithms): Graph to query, landmarks are prepared if missing
+        pairs (list | None): (source, target) pairs, all city pairs by default
+
+    Returns:
+        dict: Per search ('dijkstra', 'astar', 'astar_landmarks') and direction ('unidirectional', 'bidirectional'),
+            mean expanded nodes and mean latency in microseconds
+    """
+    pairs = pairs or list(itertools.permutations(algorithms.compact.names, 2))
+    if algorithms.landmarks is None:
+        algorithms.prepare_landmarks()
+    searches = {
+        'dijkstra': lambda source, target, **kwargs: algorithms.dijkstra(source, target, **kwargs),
+        'astar': lambda source, target, **kwargs: algorithms.astar_search(source, target, **kwargs),
+        'astar_landmarks': lambda source, target, **kwargs: algorithms.astar_search(source, target, use_landmarks=True, **kwargs),
+    }
+    results = {}
+    for name, search in searches.items():
+        for direction, bidirectional in (('unidirectional', False), ('bidirectional', True)):
+            expanded = 0
+            start = time.perf_counter()
+            for source, target in pairs:
+                stats = {}
+                search(source, target, stats=stats, bidirectional=bidirectional)
+                expanded += stats['expanded']
+            elapsed = time.perf_counter() - start
+            results.setdefault(name, {})[direction] = {
+                'mean_expanded': expanded / len(pairs),
+                'mean_latency_us': elapsed / len(pairs) * 1e6,
+            }
+    return results
+
+def bench_all_pairs(algorithms: GraphAlgorithms, keep: int = 10, repeat: int = 3) -> dict:
+    """Measures dijkstra, astar_search and compute_all_paths throughput over all city pairs.
+
+    Args:
+        algorithms (GraphAlgorithms): Graph to query
+        keep (int): Paths kept by compute_all_paths
+        repeat (int): Runs per algorithm, the fastest one is kept
+
+    Returns:
+        dict: Pairs, and queries per second for each algorithm
+    """
+    pairs = list(itertools.permutations(algorithms.compact.names, 2))
+    queries = {
+        'dijkstra': lambda source, target: algorithms.dijkstra(source, target),
+        'astar': lambda source, target: algorithms.astar_search(source, target),
+        'all_paths': lambda source, target: algorithms.compute_all_paths(source, target, keep),
+    }
+    results = {'pairs': len(pairs)}
+    for name, query in queries.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for source, target in pairs:
+                query(source, target)
+            best = min(best, time.perf_counter() - start)
+        results[f'{name}_per_second'] = len(pairs) / best
+    return results
+
+def bench_multi_stop(algorithms: GraphAlgorithms, stop_counts: tuple = (1, 2, 3, 5), trips: int = 200, seed: int = 0) -> dict:
+    """Compares multi_stop_path with one dijkstra search per leg on random trips with intermediate stops.
+
+    The route cache is emptied before every trip, so shared trees only come from the trip itself.
+
+    Args:
+        algorithms (GraphAlgorithms): Graph to query
+        stop_counts (tuple): Numbers of intermediate stops
+        trips (int): Random trips per stop count
+        seed (int): Seed of the random trips
+
+    Returns:
+        dict: Per stop count, mean latency in microseconds of the per-leg searches, of multi_stop_path and of
+            multi_stop_path with reordering, and the mean number of shortest path trees computed per trip
+    """
+    rng = random.Random(seed)
+    names = algorithms.compact.names
+    results = {}
+    for count in stop_counts:
+        stops_list = [rng.sample(names, count + 2) for _ in range(trips)]
+        start = time.perf_counter()
+        for stops in stops_list:
+            for source, target in zip(stops, stops[1:]):
+                algorithms.dijkstra(source, target)
+        per_leg = time.perf_counter() - start
+        timings = {}
+        for name, reorder in (('multi_stop', False), ('reordered', True)):
+            misses = 0
+            start = time.perf_counter()
+            for stops in stops_list:
+                algorithms.route_cache.clear()
+                before = algorithms.route_cache.counters['misses']
+                algorithms.multi_stop_path(stops, reorder=reorder)
+                misses += algorithms.route_cache.counters['misses'] - before
+            timings[name] = (time.perf_counter() - start, misses)
+        results[f'{count}_stops'] = {
+            'legs': count + 1,
+            'per_leg_dijkstra_us': per_leg / trips * 1e6,
+            'multi_stop_us': timings['multi_stop'][0] / trips * 1e6,
+            'trees': timings['multi_stop'][1] / trips,
+            'reordered_us': timings['reordered'][0] / trips * 1e6,
+        }
+    return results
+
+def update_stream(algorithms: GraphAlgorithms, updates: int, seed: int) -> list:
+    """Random edge updates: weight changes, removals and re-additions of removed edges."""
+    rng = random.Random(seed)
+    compact = algorithms.compact
+    edges = {
+        (compact.names[u], compact.names[v]): weight
+        for u, row in enumerate(compact.adjacency) for v, weight in row if u < v
+    }
+    present, removed = list(edges), []
+    stream = []
+    for _ in range(updates):
+        draw = rng.random()
+        if draw < 0.1 and len(present) > 1:
+            edge = present.pop(rng.randrange(len(present)))
+            removed.append(edge)
+            stream.append((*edge, None))
+        elif draw < 0.2 and removed:
+            edge = removed.pop(rng.randrange(len(removed)))
+            present.append(edge)
+            stream.append((*edge, edges[edge]))
+        else:
+            edge = rng.choice(present)
+            stream.append((*edge, edges[edge] * rng.uniform(0.5, 1.5)))
+    return stream
+
+def bench_dynamic_updates(algorithms: GraphAlgorithms, updates: int = 300, queries_per_update: int = 20, seed: int = 0) -> dict:
+    """Replays random edge updates interleaved with cached_path queries, repairing the cached trees or dropping them.
+
+    Both modes replay the same stream on their own copy of the graph, with a
+    route cache of the default size. The answers to the last queries are checked against a dijkstra search on the same graph version.
+
+    Args:
+        algorithms (GraphAlgorithms): Graph to replay on, left unchanged
+        updates (int): Edge updates in the stream
+        queries_per_update (int): Random queries between two updates
+        seed (int): Seed of the stream and queries
+
+    Returns:
+        dict: Per mode ('repair', 'flush'), total replay time in seconds, updates and queries per second,
+            cache hit rate, and trees kept, repaired and dropped by the updates
+    """
+    stream = update_stream(algorithms, updates, seed)
+    rng = random.Random(seed)
+    # Cities are drawn with Zipf-like popularity, as requests concentrate on large cities
+    names = rng.sample(algorithms.compact.names, algorithms.compact.node_count)
+    popularity = [1 / rank for rank in range(1, len(names) + 1)]
+    queries = [
+        [tuple(rng.choices(names, popularity, k=2)) for _ in range(queries_per_update)]
+        for _ in stream
+    ]
+    results = {}
+    for mode, repair in (('repair', True), ('flush', False)):
+        replay = GraphAlgorithms(compact=algorithms.compact, route_cache=RouteCache())
+        counts = {'kept': 0, 'repaired': 0, 'dropped': 0}
+        update_time = query_time = 0
+        for change, batch in zip(stream, queries):
+            start = time.perf_counter()
+            for source, target in batch:
+                replay.cached_path(source, target)
+            query_time += time.perf_counter() - start
+            start = time.perf_counter()
+            stats = replay.update_edges([change], repair=repair)
+            update_time += time.perf_counter() - start
+            for key in counts:
+                counts[key] += stats[key]
+        for source, target in queries[-1]:
+            path = replay.cached_path(source, target)
+            expected = replay.dijkstra(source, target)
+            if (path is None) != (expected is None) or (
+                path is not None and abs(replay.compute_path_weight(path) - replay.compute_path_weight(expected)) > 1e-9
+            ):
+                raise AssertionError(f"{mode}: wrong path from {source} to {target} after the updates")
+        cache = replay.route_cache.stats()
+        results[mode] = dict(
+            counts,
+            seconds=update_time + query_time,
+            updates_per_second=len(stream) / update_time,
+            queries_per_second=len(stream) * queries_per_update / query_time,
+            hit_rate=cache['hits'] / (cache['hits'] + cache['misses']),
+        )
+    return results
+
+def haversine_nearest(coords: np.ndarray, point: tuple) -> int:
+    """Brute-force nearest point by great-circle distance, the reference for the spatial index."""
+    lat, lng = np.radians(coords).T
+    point_lat, point_lng = np.radians(point)
+    h = np.sin((lat - point_lat) / 2) ** 2 + np.cos(lat) * np.cos(point_lat) * np.sin((lng - point_lng) / 2) ** 2
+    return int(np.nanargmin(2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))))
+
+def bench_snapping(algorithms: GraphAlgorithms, sizes: tuple = (1000, 10000, 100000), queries: int = 2000, seed: int = 0) -> dict:
+    """Measures nearest node lookups of the spatial index, one by one and batched, against a brute-force scan.
+
+    Lookups run on the graph nodes for the places outside of the graph, then
+    on random points in France indexing more and more points.
+
+    Args:
+        algorithms (GraphAlgorithms): Graph with places
+        sizes (tuple): Numbers of random indexed points
+        queries (int): Random query points
+        seed (int): Seed of the random points
+
+    Returns:
+        dict: Per index ('graph' and each size), indexed points, build time in milliseconds,
+            and microseconds per lookup for the brute-force scan, single and batched queries
+    """
+    rng = np.random.default_rng(seed)
+    outside = [coords for city, coords in algorithms.places.items() if city not in algorithms.compact.index]
+    random_points = lambda count: np.column_stack((rng.uniform(42.5, 51, count), rng.uniform(-4.5, 8, count)))
+    cases = {'graph': (algorithms.compact.coords, np.array(outside))}
+    cases.update({size: (random_points(size), random_points(queries)) for size in sizes})
+    # Warm-up: the scipy import is not part of the build time
+    SpatialIndex(coords=[(0.0, 0.0)])
+    results = {}
+    for name, (coords, points) in cases.items():
+        start = time.perf_counter()
+        index = SpatialIndex(coords)
+        build = time.perf_counter() - start
+        brute_points = points[:200]
+        start = time.perf_counter()
+        expected = [haversine_nearest(coords, point) for point in brute_points]
+        brute = (time.perf_counter() - start) / len(brute_points)
+        start = time.perf_counter()
+        for point in points:
+            index.nearest(point)
+        single = (time.perf_counter() - start) / len(points)
+        start = time.perf_counter()
+        _, ids = index.nearest(points)
+        batched = (time.perf_counter() - start) / len(points)
+        if ids[:len(brute_points), 0].tolist() != expected:
+            raise AssertionError(f"{name}: the spatial index disagrees with the brute-force scan")
+        results[name] = {
+            'points': len(coords),
+            'build_ms': build * 1e3,
+            'brute_force_us': brute * 1e6,
+            'single_us': single * 1e6,
+            'batched_us': batched * 1e6,
+        }
+    return results
+
+if __name__ == '__main__':
+    algorithms = load_algorithms()
+    result = bench_all_pairs(algorithms)
+    print(f"{result['pairs']} pairs: dijkstra {result['dijkstra_per_second']:.0f}/s, "
+          f"A* {result['astar_per_second']:.0f}/s, 10 shortest paths {result['all_paths_per_second']:.0f}/s")
+    for name, result in bench_astar_heuristics(algorithms).items():
+        print(f"A* {name:>10}: {result['mean_expanded']:.2f} nodes expanded, {result['mean_latency_us']:.1f} us/query over {result['pairs']} pairs")
+    grid = grid_algorithms()
+    # Grid coordinates are not latitudes and longitudes, the great-circle bound does not apply
+    grid.prepare_landmarks(use_haversine=False)
+    rng = random.Random(0)
+    grid_pairs = [tuple(rng.sample(grid.compact.names, 2)) for _ in range(500)]
+    for graph_name, graph_algorithms, pairs in (('France', algorithms, None), ('40x40 grid', grid, grid_pairs)):
+        for name, result in bench_bidirectional(graph_algorithms, pairs).items():
+            print(f"{graph_name} {name}: " + ', '.join(
+                f"{direction} {values['mean_expanded']:.1f} nodes expanded, {values['mean_latency_us']:.0f} us"
+                for direction, values in result.items()
+            ))
+    for name, result in bench_multi_stop(algorithms).items():
+        print(f"{name} ({result['legs']} legs): per-leg Dijkstra {result['per_leg_dijkstra_us']:.0f} us, "
+              f"multi-stop {result['multi_stop_us']:.0f} us ({result['trees']:.1f} trees), reordered {result['reordered_us']:.0f} us")
+    for name, result in bench_snapping(algorithms).items():
+        print(f"Snapping ({name}, {result['points']} points): build {result['build_ms']:.1f} ms, brute force {result['brute_force_us']:.1f} us, "
+              f"KD-tree {result['single_us']:.1f} us, batched {result['batched_us']:.2f} us per lookup")
+    for graph_name, graph_algorithms in (('France', algorithms), ('40x40 grid', grid)):
+        for mode, result in bench_dynamic_updates(graph_algorithms).items():
+            print(f"{graph_name} updates ({mode}): {result['seconds']:.2f} s, {result['updates_per_second']:.0f} updates/s, {result['queries_per_second']:.0f} queries/s, "
+                  f"hit rate {result['hit_rate']:.0%}, trees kept {result['kept']} / repaired {result['repaired']} / dropped {result['dropped']}")
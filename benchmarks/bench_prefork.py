@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.bench_nlp import generate_corpus
+from prefork import PreforkExecutor, memory_usage
+
+FULL_CITY_LIST = 'NLP/liste_villes_full.txt'
+
+def preload() -> list:
+    """Loads what a resolver worker uses: graph, language detector, full city index and, if available, the NER models.
+
+    Returns:
+        list: Names of the loaded services
+    """
+    from main import services
+    from NLP.modules_nlp.city_matcher import CityMatcher
+    CityMatcher.from_file(FULL_CITY_LIST)
+    loaded = []
+    for name in ('graph', 'language', 'ner'):
+        try:
+            services.get(name)
+            loaded.append(name)
+        except Exception:
+            pass
+    return loaded
+
+def resolve_batch(texts: list) -> list:
+    """Resolver workload: the HTTP service's NLP batch (language gate and NER)."""
+    from server import ResolverService
+    return ResolverService.resolve_texts(texts)
+
+def correct_batch(texts: list) -> list:
+    """Workload without the NER models: language gate, then every capitalized word matched against the full city list."""
+    from main import services
+    from NLP.modules_nlp.city_matcher import CityMatcher
+    check_french = services.get('language')
+    city_matcher = CityMatcher.from_file(FULL_CITY_LIST)
+    results = []
+    for text in texts:
+        try:
+            check_french(text)
+        except Exception:
+            results.append(None)
+            continue
+        results.append([city_matcher.best_match(word, cutoff=0.8) for word in text.split() if word[:1].isupper()])
+    return results
+
+def summarize_memory(samples: list) -> dict:
+    """Mean per-worker rss, pss and uss, in MiB."""
+    return {key: statistics.mean(sample[key] for sample in samples) / 2 ** 20 for key in ('rss', 'pss', 'uss')}
+
+def run_batches(executor, workload, batches: list) -> float:
+    """Runs every batch on the executor.
+
+    Returns:
+        float: Texts per second
+    """
+    start = time.perf_counter()
+    for future in [executor.submit(workload, batch) for batch in batches]:
+        future.result()
+    return sum(map(len, batches)) / (time.perf_counter() - start)
+
+def bench_prefork(worker_counts: tuple | None = None, texts: int = 2000, batch_size: int = 50) -> dict:
+    """Measures throughput and per-worker memory of the preforked pool, against workers loading the services themselves.
+
+    The NER workload is used when the models load, otherwise the language gate and city matching one.
+
+    Returns:
+        dict: Loaded services, workload name, parent memory, per number of preforked workers the throughput
+            and mean worker memory, and the memory of spawned workers that loaded the services privately
+    """
+    worker_counts = worker_counts or tuple(sorted({1, 2, 4, os.cpu_count()}))
+    loaded = preload()
+    workload = resolve_batch if 'ner' in loaded else correct_batch
+    corpus = [text for _, text in generate_corpus(texts)]
+    batches = [corpus[i:i + batch_size] for i in range(0, len(corpus), batch_size)]
+    results = {
+        'services': loaded,
+        'workload': workload.__name__,
+        'parent': summarize_memory([memory_usage(os.getpid())]),
+        'prefork': {},
+    }
+
+    for workers in worker_counts:
+        executor = PreforkExecutor(workers)
+        try:
+            # Warm-up: first batch of each worker, so the memory below includes what serving touches
+            run_batches(executor, workload, batches[:workers])
+            rate = run_batches(executor, workload, batches)
+            results['prefork'][workers] = dict(summarize_memory(executor.memory()), texts_per_second=rate)
+        finally:
+            executor.shutdown()
+
+    # Baseline: spawned workers, each one loading the services and models privately
+    workers = max(worker_counts)
+    with ProcessPoolExecutor(workers, multiprocessing.get_context('spawn'), initializer=preload) as executor:
+        run_batches(executor, workload, batches[:workers])
+        rate = run_batches(executor, workload, batches)
+        samples = [memory_usage(pid) for pid in executor._processes]
+    results['spawn'] = {workers: dict(summarize_memory(samples), texts_per_second=rate)}
+    return results
+
+if __name__ == '__main__':
+    result = bench_prefork()
+    print(f"services: {', '.join(result['services'])}, workload: {result['workload']}, "
+          f"parent rss {result['parent']['rss']:.0f} MiB")
+    for mode in ('prefork', 'spawn'):
+        for workers, values in result[mode].items():
+            print(f"{mode:>7} x{workers}: {values['texts_per_second']:.0f} texts/s, per worker rss {values['rss']:.0f} MiB, "
+                  f"pss {values['pss']:.0f} MiB, uss {values['uss']:.0f} MiB")
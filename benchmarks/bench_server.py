@@ -0,0 +1,100 @@
+import asyncio
+import json
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_nlp import generate_corpus
+from benchmarks.bench_pathfinding import load_algorithms
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+async def wait_for_server(port: int, timeout: float = 120) -> None:
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+async def client(port: int, requests: list, latencies: list, statuses: dict) -> None:
+    """Sends requests one after the other on a keep-alive connection."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for path, body in requests:
+        data = json.dumps(body).encode('utf-8')
+        start = time.perf_counter()
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data
+        )
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+async def load_test(port: int, requests: list, concurrency: int) -> dict:
+    """Spreads requests over concurrent clients and reports latency percentiles."""
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, requests[i::concurrency], latencies, statuses) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'statuses': statuses,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies),
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+def route_requests(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    names = load_algorithms().compact.names
+    return [('/route', dict(zip(('departure', 'destination'), rng.sample(names, 2)))) for _ in range(count)]
+
+def resolve_requests(count: int) -> list:
+    return [('/resolve', {'text': text}) for _, text in generate_corpus(count)]
+
+async def bench_server_async(port: int, count: int, concurrency_levels: tuple) -> dict:
+    await wait_for_server(port)
+    results = {}
+    for name, requests in (('route', route_requests(count)), ('resolve', resolve_requests(count))):
+        results[name] = [await load_test(port, requests, concurrency) for concurrency in concurrency_levels]
+    return results
+
+def bench_server(count: int = 2000, concurrency_levels: tuple = (1, 8, 32, 128)) -> dict:
+    """Starts server.py locally and load-tests /route and /resolve at several concurrency levels.
+
+    Returns:
+        dict: Per endpoint, a list of results (throughput, p50 and p99 latency) per concurrency level
+    """
+    port = free_port()
+    process = subprocess.Popen([sys.executable, 'server.py', '--port', str(port)], stdout=subprocess.DEVNULL)
+    try:
+        return asyncio.run(bench_server_async(port, count, concurrency_levels))
+    finally:
+        process.terminate()
+        process.wait()
+
+if __name__ == '__main__':
+    for endpoint, results in bench_server().items():
+        for result in results:
+            print(f"/{endpoint} x{result['concurrency']:>3}: {result['requests_per_second']:.0f} req/s, "
+                  f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, statuses {result['statuses']}")
@@ -0,0 +1,109 @@
+import audioop
+import glob
+import statistics
+import time
+import wave
+
+import speech_recognition as sr
+
+from Speech_Recognition.module.TranscriptionBackend import GoogleBackend, SphinxBackend
+
+AUDIO_FILES = sorted(glob.glob('POC_Speech_Recognition/fruits_audio/*/*.wav')) + ['POC_Speech_Recognition/test_bonjour.wav']
+
+def read_wav(file_path: str) -> tuple:
+    """Reads a WAV file as mono PCM.
+
+    Returns:
+        tuple: (frames, sample rate, sample width)
+    """
+    with wave.open(file_path, 'rb') as wav:
+        frames = wav.readframes(wav.getnframes())
+        if wav.getnchannels() == 2:
+            frames = audioop.tomono(frames, wav.getsampwidth(), 0.5, 0.5)
+        return frames, wav.getframerate(), wav.getsampwidth()
+
+def transcribe_or_none(decode):
+    try:
+        return decode()
+    except sr.UnknownValueError:
+        return None
+
+def blocking_latency(backend, frames: bytes, sample_rate: int, sample_width: int) -> tuple:
+    """Current path: the whole utterance is captured, then decoded. Latency is the full decoding time."""
+    audio = sr.AudioData(frames, sample_rate, sample_width)
+    start = time.perf_counter()
+    text = transcribe_or_none(lambda: backend.transcribe(audio))
+    return time.perf_counter() - start, text
+
+def streaming_latency(backend, frames: bytes, sample_rate: int, sample_width: int, chunk_frames: int = 1024) -> tuple:
+    """Streaming path: chunks are decoded as they arrive. Latency is the decoding left after the last chunk.
+
+    Chunks before the last one are fed as fast as possible: they are decoded
+    during the capture as long as the real-time factor stays below 1.
+
+    Returns:
+        tuple: (latency in seconds, real-time factor of the feeding, text or None)
+    """
+    chunk_bytes = chunk_frames * sample_width
+    chunks = [frames[i:i + chunk_bytes] for i in range(0, len(frames), chunk_bytes)]
+    stream = backend.open_stream(sample_rate, sample_width)
+    start = time.perf_counter()
+    for chunk in chunks[:-1]:
+        stream.feed(chunk)
+    feeding = time.perf_counter() - start
+    start = time.perf_counter()
+    stream.feed(chunks[-1])
+    text = transcribe_or_none(stream.finish)
+    latency = time.perf_counter() - start
+    return latency, feeding / (len(frames) / sample_width / sample_rate), text
+
+def summarize(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p95_ms': latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+def bench_speech(files: list = AUDIO_FILES) -> dict:
+    """Compares latency after the end of capture of blocking and streaming transcription.
+
+    The offline engine is PocketSphinx with its bundled model (the latency
+    does not depend on the recognition language). The Google web API,
+    used by the original path, is tried on the first file.
+
+    Returns:
+        dict: Per path, mean and p95 latency (ms), with the real-time factor of the streaming path and
+        whether both offline paths gave the same transcriptions
+    """
+    backend = SphinxBackend()
+    audio = [read_wav(file_path) for file_path in files]
+    blocking, streaming, factors, same = [], [], [], 0
+    for frames, sample_rate, sample_width in audio:
+        blocking_seconds, blocking_text = blocking_latency(backend, frames, sample_rate, sample_width)
+        streaming_seconds, factor, streaming_text = streaming_latency(backend, frames, sample_rate, sample_width)
+        blocking.append(blocking_seconds)
+        streaming.append(streaming_seconds)
+        factors.append(factor)
+        same += blocking_text == streaming_text
+
+    results = {
+        'files': len(files),
+        'mean_audio_seconds': statistics.mean(len(frames) / width / rate for frames, rate, width in audio),
+        'sphinx_blocking': summarize(blocking),
+        'sphinx_streaming': dict(summarize(streaming), real_time_factor=statistics.mean(factors)),
+        'same_transcriptions': same / len(files),
+    }
+    try:
+        results['google_blocking'] = summarize([blocking_latency(GoogleBackend(), *audio[0])[0]])
+    except sr.RequestError:
+        results['google_blocking'] = None
+    return results
+
+if __name__ == '__main__':
+    result = bench_speech()
+    print(f"{result['files']} files, {result['mean_audio_seconds']:.2f} s of audio on average")
+    for path in ('google_blocking', 'sphinx_blocking', 'sphinx_streaming'):
+        value = result[path]
+        print(f"{path:>17}: " + ("unavailable" if value is None else f"{value['mean_ms']:.1f} ms mean, {value['p95_ms']:.1f} ms p95 after capture"))
+    print(f"Streaming real-time factor {result['sphinx_streaming']['real_time_factor']:.2f}, "
+          f"same transcriptions {result['same_transcriptions']:.0%}")
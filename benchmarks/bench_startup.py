@@ -0,0 +1,138 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CSV_STARTUP = """
+from Path_Finding.module.FranceGraphBuilder import FranceGraphBuilder
+from Path_Finding.module.GraphAlgorithms import GraphAlgorithms
+builder = FranceGraphBuilder('Path_Finding/module/data/fr.csv', 'Path_Finding/module/data/fr.json')
+GraphAlgorithms(builder.create_graph()).dijkstra('Paris', 'Angers')
+"""
+
+SNAPSHOT_STARTUP = """
+from Path_Finding.module.FranceGraphBuilder import FranceGraphBuilder
+from Path_Finding.module.GraphAlgorithms import GraphAlgorithms
+builder = FranceGraphBuilder('Path_Finding/module/data/fr.csv', 'Path_Finding/module/data/fr.json')
+GraphAlgorithms(compact=builder.create_compact_graph({cache!r})).dijkstra('Paris', 'Angers')
+"""
+
+def time_process(code: str, repeat: int = 5) -> float:
+    """Runs code in a fresh interpreter and returns the median wall time in milliseconds.
+
+    Args:
+        code (str): Python source to run from the repository root
+        repeat (int): Number of runs
+
+    Returns:
+        float: Median wall time in milliseconds, interpreter startup included
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def bench_graph_startup(repeat: int = 5) -> dict:
+    """Compares process start to first route between the CSV/JSON path and the binary snapshot.
+
+    Returns:
+        dict: Median milliseconds per startup path
+    """
+    with tempfile.TemporaryDirectory() as cache:
+        snapshot_code = SNAPSHOT_STARTUP.format(cache=cache)
+        # Write the snapshot once so the timed runs only load it
+        subprocess.run([sys.executable, '-c', snapshot_code], check=True)
+        return {
+            'csv_json_ms': time_process(CSV_STARTUP, repeat),
+            'snapshot_ms': time_process(snapshot_code, repeat),
+            'interpreter_ms': time_process('pass', repeat),
+        }
+
+# stdin fed to main.py for each input mode
+MAIN_MODES = {
+    'readline': "0\nje voudrais aller de Paris à Angers\n",
+    'csv': "1\ninput\n",
+    'speech': "2\n",
+}
+
+def time_to_first_result(stdin: str, marker: str = 'Trajet') -> float | None:
+    """Runs main.py in a fresh interpreter and measures the time until the first result line.
+
+    Args:
+        stdin (str): Input fed to the interactive prompts
+        marker (str): Text identifying a result line
+
+    Returns:
+        float: Milliseconds from process start to the first line containing marker
+        None: If the process exited without printing a result
+    """
+    env = dict(os.environ, AUDIO_DISABLED='1', PYTHONUNBUFFERED='1')
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, 'main.py'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, text=True, env=env
+    )
+    process.stdin.write(stdin)
+    process.stdin.close()
+    elapsed = None
+    for line in process.stdout:
+        if elapsed is None and marker in line:
+            elapsed = (time.perf_counter() - start) * 1000
+    process.wait()
+    return elapsed
+
+# Imports main.py and creates one of its services, reporting both times
+SERVICE_STARTUP = """
+import json, time
+start = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - start) * 1000
+main.services.get({name!r})
+print(json.dumps({{'import_ms': import_ms, 'load_ms': main.services.load_times[{name!r}] * 1000}}))
+"""
+
+MAIN_SERVICES = ['graph', 'language', 'ner', 'speech', 'tracker']
+
+def bench_service_startup(repeat: int = 3) -> dict:
+    """Measures the import time of main.py and the creation time of each of its services, each in a fresh interpreter.
+
+    Returns:
+        dict: Median import_ms, and per service its median load time in ms (None if it cannot be created)
+    """
+    env = dict(os.environ, AUDIO_DISABLED='1')
+    imports, results = [], {}
+    for name in MAIN_SERVICES:
+        loads = []
+        for _ in range(repeat):
+            process = subprocess.run(
+                [sys.executable, '-c', SERVICE_STARTUP.format(name=name)], capture_output=True, text=True, env=env
+            )
+            if process.returncode != 0:
+                break
+            timings = json.loads(process.stdout.strip().splitlines()[-1])
+            imports.append(timings['import_ms'])
+            loads.append(timings['load_ms'])
+        results[name] = statistics.median(loads) if len(loads) == repeat else None
+    results['import_ms'] = statistics.median(imports) if imports else None
+    return results
+
+def bench_main_modes() -> dict:
+    """Measures time to first result of main.py for each input mode.
+
+    Returns:
+        dict: Milliseconds per mode, None for modes that produced no result (e.g. missing models)
+    """
+    return {mode: time_to_first_result(stdin) for mode, stdin in MAIN_MODES.items()}
+
+if __name__ == '__main__':
+    for name, value in bench_graph_startup().items():
+        print(f"{name:>15}: {value:.1f} ms")
+    for name, value in bench_service_startup().items():
+        print(f"{name:>15}: " + ("unavailable" if value is None else f"{value:.1f} ms"))
+    for mode, value in bench_main_modes().items():
+        print(f"main.py {mode:>8}: " + ("no result" if value is None else f"{value:.1f} ms to first result"))
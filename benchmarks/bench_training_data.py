@@ -0,0 +1,96 @@
+import json
+import os
+import random
+import tempfile
+import time
+
+from NLP.modules_nlp.training_data import compile_dataset, make_doc
+
+CITY_LIST_FILE = 'NLP/liste_villes_500.txt'
+
+# Sentence templates with DEPARTURE, DESTINATION and ESCALE slots
+TEMPLATES = [
+    "Je voudrais aller de {DEPARTURE} à {DESTINATION}.",
+    "Comment me rendre à {DESTINATION} depuis la gare de {DEPARTURE} ?",
+    "Je veux aller voir mon ami Albert à {DESTINATION} en partant de {DEPARTURE}.",
+    "Je compte me rendre à {DESTINATION} depuis {DEPARTURE} en m'arrêtant à {ESCALE}.",
+    "Je dois planifier un voyage {DEPARTURE} {DESTINATION} en passant par {ESCALE} pour les prochaines vacances.",
+]
+
+def generate_annotations(size: int, seed: int = 0):
+    """Generates annotated sentences in the format of datasets/training_data.json.
+
+    Args:
+        size (int): Number of sentences
+        seed (int): Random seed
+
+    Yields:
+        list: [text, {"entities": [[start, end, label], ...]}]
+    """
+    rng = random.Random(seed)
+    with open(CITY_LIST_FILE, 'r', encoding='utf-8') as f:
+        cities = [city.title() for city in f.read().splitlines() if city]
+    for _ in range(size):
+        template = rng.choice(TEMPLATES)
+        text, entities = '', []
+        position = 0
+        while '{' in template[position:]:
+            start = template.index('{', position)
+            end = template.index('}', start)
+            city = rng.choice(cities)
+            text += template[position:start]
+            entities.append([len(text), len(text) + len(city), template[start + 1:end]])
+            text += city
+            position = end + 1
+        yield [text + template[position:], {'entities': entities}]
+
+def write_dataset(path: str, size: int) -> None:
+    """Writes a generated dataset as a JSON document, like datasets/training_data.json."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"classes": ["DEPARTURE", "DESTINATION", "ESCALE"], "annotations": [\n')
+        for i, annotation in enumerate(generate_annotations(size)):
+            f.write((',\n' if i else '') + json.dumps(annotation, ensure_ascii=False))
+        f.write('\n]}\n')
+
+def compile_in_memory(input_path: str, output_path: str) -> None:
+    """The notebook conversion: whole dataset loaded, converted serially into one DocBin."""
+    import spacy
+    from spacy.tokens import DocBin
+
+    with open(input_path, encoding='utf-8') as f:
+        annotations = json.load(f)['annotations']
+    nlp = spacy.blank('fr')
+    doc_bin = DocBin()
+    for text, annotation in annotations:
+        doc_bin.add(make_doc(nlp, text, annotation)[0])
+    doc_bin.to_disk(output_path)
+
+def bench_training_data(size: int = 200000, worker_counts: tuple | None = None) -> dict:
+    """Measures compile throughput of the notebook conversion and of compile_dataset.
+
+    Args:
+        size (int): Generated sentences
+        worker_counts (tuple | None): Numbers of worker processes, 0 compiles in this process
+
+    Returns:
+        dict: Sentences per second of the in-memory conversion and of compile_dataset per number of workers
+    """
+    worker_counts = worker_counts or tuple(sorted({0, 1, 2, os.cpu_count()}))
+    results = {'sentences': size}
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'training_data.json')
+        write_dataset(input_path, size)
+
+        start = time.perf_counter()
+        compile_in_memory(input_path, os.path.join(directory, 'training_data.spacy'))
+        results['in_memory_per_second'] = size / (time.perf_counter() - start)
+
+        for workers in worker_counts:
+            stats = compile_dataset(input_path, os.path.join(directory, 'corpus'), workers=workers)
+            results[f'workers_{workers}_per_second'] = stats['sentences'] / stats['seconds']
+    return results
+
+if __name__ == '__main__':
+    result = bench_training_data()
+    print(f"{result['sentences']} sentences on {os.cpu_count()} cores: in memory {result['in_memory_per_second']:.0f} sentences/s, "
+          + ', '.join(f"{name.split('_')[1]} workers {value:.0f} sentences/s" for name, value in result.items() if name.startswith('workers_')))
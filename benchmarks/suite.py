@@ -0,0 +1,122 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import traceback
+
+DEFAULT_BASELINE = 'benchmarks/baseline.json'
+
+# Metrics compared with the baseline: higher is better
+THROUGHPUT_SUFFIX = '_per_second'
+
+def suite_startup() -> dict:
+    from benchmarks.bench_startup import bench_graph_startup, bench_service_startup
+    results = bench_graph_startup()
+    results.update({
+        (name if name == 'import_ms' else f'{name}_load_ms'): value for name, value in bench_service_startup().items()
+    })
+    return results
+
+def suite_nlp() -> dict:
+    from benchmarks.bench_nlp import bench_extract_loc
+    from NLP.module.EntityRecognitionService import EntityRecognitionService
+    # No cache: every call runs both models
+    return bench_extract_loc(EntityRecognitionService(cache_size=0))
+
+def suite_fuzzy() -> dict:
+    from benchmarks.bench_fuzzy import bench_preprocess_triplets
+    results = {}
+    for city_list, result in bench_preprocess_triplets().items():
+        name = os.path.splitext(os.path.basename(city_list))[0]
+        results[f'{name}.triplets_per_second'] = result['triplets_per_second']
+    return results
+
+def suite_pathfinding() -> dict:
+    from benchmarks.bench_pathfinding import bench_all_pairs, load_algorithms
+    return bench_all_pairs(load_algorithms())
+
+SUITES = {
+    'startup': suite_startup,
+    'nlp': suite_nlp,
+    'fuzzy': suite_fuzzy,
+    'pathfinding': suite_pathfinding,
+}
+
+def environment() -> dict:
+    """Describes the machine and the revision the results were measured on."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+def run_suites(names: list) -> dict:
+    """Runs benchmark suites.
+
+    A suite that cannot run (e.g. missing NLP models) is reported under
+    errors instead of stopping the others.
+
+    Args:
+        names (list): Suite names, keys of SUITES
+
+    Returns:
+        dict: {'environment', 'results': flat {suite.metric: value}, 'errors': {suite: message}}
+    """
+    report = {'environment': environment(), 'results': {}, 'errors': {}}
+    for name in names:
+        print(f"[{name}] ...", file=sys.stderr)
+        try:
+            results = SUITES[name]()
+        except (Exception, SystemExit) as e:
+            report['errors'][name] = ''.join(traceback.format_exception_only(type(e), e)).strip()
+            print(f"[{name}] indisponible : {report['errors'][name]}", file=sys.stderr)
+            continue
+        for metric, value in results.items():
+            report['results'][f'{name}.{metric}'] = value
+    return report
+
+def compare(results: dict, baseline: dict, threshold: float, suites: list | None = None) -> list:
+    """Finds throughput metrics that regressed compared with a baseline.
+
+    Only metrics ending in _per_second are compared. A baseline metric
+    missing from the results (suite failed, metric renamed or dropped) is
+    a regression. Other metrics (latencies, counts) are informative.
+
+    Args:
+        results (dict): Flat results of the current run
+        baseline (dict): Flat results of the baseline run
+        threshold (float): Allowed relative drop, e.g. 0.1 for 10 %
+        suites (list | None): Suites of the current run, the baseline metrics of the other suites are ignored. None for all
+
+    Returns:
+        list: One dict per regression: metric, baseline, current (None if missing) and relative change
+    """
+    regressions = []
+    for metric, reference in baseline.items():
+        if not metric.endswith(THROUGHPUT_SUFFIX) or not reference:
+            continue
+        if suites is not None and metric.split('.', 1)[0] not in suites:
+            continue
+        current = results.get(metric)
+        change = -1.0 if current is None else current / reference - 1
+        if change < -threshold:
+            regressions.append({'metric': metric, 'baseline': reference, 'current': current, 'change': change})
+    return regressions
+
+def load_report(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_report(report: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write('\n')
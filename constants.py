@@ -1,9 +1,18 @@
 INPUT_READLINE = 0
 INPUT_FILE = 1
 INPUT_SPEECH = 2
+INPUT_AUDIO_BATCH = 3
 
 FILE_INPUT_LOCATION = './input/'
+FILE_OUTPUT_SUFFIX = '_output'
+GRAPH_CACHE_LOCATION = './Path_Finding/module/data/cache/'
+ITINERARY_CACHE_FILE = './NLP/cache/itineraries.sqlite3'
+MFCC_FEATURES_FILE = './Speech_Recognition/cache/mfcc_features.npz'
+SPHINX_MODEL_LOCATION = './Speech_Recognition/model/sphinx-fr-FR/'
+VOSK_MODEL_LOCATION = './Speech_Recognition/model/vosk-model-small-fr-0.22/'
 
 ERROR_NOT_TRIP = "NOT_TRIP"
 ERROR_NOT_FRENCH = "NOT_FRENCH"
-ERROR_UNKNOWN = "UNKNOWN"
\ No newline at end of file
+ERROR_UNKNOWN = "UNKNOWN"
+METRICS_JOB = "travel_order"
+PUSHGATEWAY_URL = "localhost:9091"
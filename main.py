@@ -1,51 +1,122 @@
-from Speech_Recognition.module.SpeechtoText import SpeechtoText
-from NLP.module.EntityRecognitionService import EntityRecognitionService
-from Path_Finding.module.FranceGraphBuilder import FranceGraphBuilder
-from Path_Finding.module.GraphAlgorithms import GraphAlgorithms
-import networkx as nx
-import speech_recognition as sr
-
-from codecarbon import OfflineEmissionsTracker
-
-from constants import INPUT_READLINE, INPUT_FILE, INPUT_SPEECH, ERROR_NOT_TRIP, ERROR_NOT_FRENCH, ERROR_UNKNOWN
-from utils import handle_input_type_selection, handle_input_type_csv, print_decorated, check_french
-
-# Initialize services
-SpeechtoText = SpeechtoText()
-EntityRecognitionService = EntityRecognitionService()
-FranceGraphBuilder = FranceGraphBuilder(
-    city_data_file='Path_Finding/module/data/fr.csv', 
-    graph_data_file='Path_Finding/module/data/fr.json'
-)
-GraphAlgorithms = GraphAlgorithms(FranceGraphBuilder.create_graph())
-tracker = OfflineEmissionsTracker(
-    country_iso_code="FRA",
-    save_to_file=False,
-    save_to_prometheus=True,
-    log_level="critical"
-)
-
-def travel_order(id: str, departure: str, destination: str, debug = True) -> None:
-    print(f"{id} - Itinéraire le plus court de {departure} à {destination}")
-    
-    if not GraphAlgorithms.check_node_exists(departure):
-        print(f"{id} - Le noeud {departure} n'existe pas dans le graphe.")
-        print(f"{id} - {ERROR_NOT_TRIP}")
+import os
+
+from constants import INPUT_READLINE, INPUT_FILE, INPUT_SPEECH, INPUT_AUDIO_BATCH, FILE_INPUT_LOCATION, FILE_OUTPUT_SUFFIX, GRAPH_CACHE_LOCATION, ITINERARY_CACHE_FILE, ERROR_NOT_TRIP, ERROR_NOT_FRENCH, ERROR_UNKNOWN
+from metrics import stage, count_outcome, observe_expansions
+from services import ServiceRegistry
+from utils import handle_input_type_selection, handle_input_type_csv, handle_input_type_audio, print_decorated
+
+# Services are created on first use: a CSV run never loads the speech or NLP subsystems
+def create_speech_to_text():
+    from Speech_Recognition.module.SpeechtoText import SpeechtoText
+    return SpeechtoText()
+
+def create_entity_recognition():
+    from NLP.module.EntityRecognitionService import EntityRecognitionService
+    return EntityRecognitionService(cache_file=ITINERARY_CACHE_FILE)
+
+def create_language_detector():
+    from langdetect.detector_factory import init_factory
+    from utils import check_french
+    # Load the language profiles now rather than on the first detection.
+    # check_french and the NER pipeline (its language gate and doc_language) all go through
+    # LanguageGate.detect_language, whose cache runs a single detection per text.
+    init_factory()
+    return check_french
+
+def create_graph_algorithms():
+    from Path_Finding.module.FranceGraphBuilder import FranceGraphBuilder
+    from Path_Finding.module.GraphAlgorithms import GraphAlgorithms
+    builder = FranceGraphBuilder(
+        city_data_file='Path_Finding/module/data/fr.csv', 
+        graph_data_file='Path_Finding/module/data/fr.json'
+    )
+    # Cities of fr.csv without edges are kept as places, routed from their nearest cities of the graph
+    graph_algorithms = GraphAlgorithms(compact=builder.create_compact_graph(GRAPH_CACHE_LOCATION), places=builder.load_places())
+    graph_algorithms.load_table(builder.fingerprint(), GRAPH_CACHE_LOCATION)
+    return graph_algorithms
+
+def create_tracker():
+    from codecarbon import OfflineEmissionsTracker
+    return OfflineEmissionsTracker(
+        country_iso_code="FRA",
+        save_to_file=False,
+        save_to_prometheus=True,
+        log_level="critical"
+    )
+
+# REORDER_STOPS=1: visit the stops (ESCALE) of a trip in the order minimizing the total distance
+REORDER_STOPS = os.environ.get('REORDER_STOPS', False) == '1'
+# BIDIRECTIONAL_SEARCH=1: Dijkstra and A* search from both the departure and the destination
+BIDIRECTIONAL_SEARCH = os.environ.get('BIDIRECTIONAL_SEARCH', False) == '1'
+
+services = ServiceRegistry()
+services.register('speech', create_speech_to_text)
+services.register('ner', create_entity_recognition)
+services.register('language', create_language_detector)
+services.register('graph', create_graph_algorithms)
+services.register('tracker', create_tracker)
+
+def travel_order(id: str, departure: str, destination: str, debug = True, escales: list = (), reorder_stops: bool = False, bidirectional: bool = False) -> None:
+    GraphAlgorithms = services.get('graph')
+    tracker = services.get('tracker')
+    stops = [departure, *escales, destination]
+    print(f"{id} - Itinéraire le plus court de {departure} à {destination}" + (f" via {', '.join(escales)}" if escales else ""))
+
+    outside = [city for city in stops if not GraphAlgorithms.check_node_exists(city)]
+    for city in outside:
+        if not GraphAlgorithms.can_snap(city):
+            print(f"{id} - Le noeud {city} n'existe pas dans le graphe.")
+            print(f"{id} - {ERROR_NOT_TRIP}")
+            count_outcome(ERROR_NOT_TRIP)
+            tracker.stop()
+            exit()
+
+    if outside:
+        # Cities outside of the graph are connected to their nearest cities of the graph
+        snap_stats = {}
+        with stage('pathfinding_snapped'):
+            path = GraphAlgorithms.snapped_path(stops, stats=snap_stats)
+        count_outcome('OK' if path is not None else ERROR_NOT_TRIP)
+        if path is None:
+            print(f"{id} - {ERROR_NOT_TRIP}")
+        else:
+            for city, (node, distance) in snap_stats['connectors'].items():
+                print(f"{id} - {city} n'est pas dans le graphe, rattachée à {node} ({distance:.0f} km)")
+            print(f"{id} - Trajet: {' -> '.join(path)} ({snap_stats['distance']:.0f} km)")
         tracker.stop()
-        exit()
+        return
 
-    if not GraphAlgorithms.check_node_exists(destination):
-        print(f"{id} - Le noeud {destination} n'existe pas dans le graphe.")
-        print(f"{id} - {ERROR_NOT_TRIP}")
+    if escales:
+        # Multi-stop trip: legs share the shortest path trees of the intermediate stops
+        with stage('pathfinding_multi_stop'):
+            path = GraphAlgorithms.multi_stop_path(stops, reorder=reorder_stops)
+        count_outcome('OK' if path is not None else ERROR_NOT_TRIP)
+        if path is None:
+            print(f"{id} - {ERROR_NOT_TRIP}")
+        else:
+            print(f"{id} - Trajet avec escales: {' -> '.join(path)}")
         tracker.stop()
-        exit()
+        return
 
     # Find path
-    path_dijkstra = GraphAlgorithms.dijkstra(departure, destination)
-    path_a_star = GraphAlgorithms.astar_search(departure, destination)
+    dijkstra_stats, astar_stats = {}, {}
+    with stage('pathfinding_dijkstra'):
+        path_dijkstra = GraphAlgorithms.dijkstra(departure, destination, stats=dijkstra_stats, bidirectional=bidirectional)
+    with stage('pathfinding_astar'):
+        path_a_star = GraphAlgorithms.astar_search(departure, destination, stats=astar_stats, bidirectional=bidirectional)
+    suffix = '_bidirectional' if bidirectional else ''
+    observe_expansions('dijkstra' + suffix, dijkstra_stats['expanded'])
+    observe_expansions('astar' + suffix, astar_stats['expanded'])
+    count_outcome('OK' if path_dijkstra is not None else ERROR_NOT_TRIP)
 
     if debug:
+        import networkx as nx
         path_networkx = nx.shortest_path(GraphAlgorithms.graph, departure, destination, weight='weight')
+        # The table is detached by update_edges: the cached trees give the same paths on the current graph
+        if GraphAlgorithms.table is not None:
+            path_table = GraphAlgorithms.table_path(departure, destination)
+        else:
+            path_table = GraphAlgorithms.cached_path(departure, destination)
         firsts_to_keep = 10
         all_paths = GraphAlgorithms.compute_all_paths(departure, destination, firsts_to_keep)
 
@@ -57,6 +128,7 @@ def travel_order(id: str, departure: str, destination: str, debug = True) -> Non
         print(f"Trajet Dijkstra: {path_dijkstra}")
         print(f"Trajet A*: {path_a_star}")
         print(f"Trajet NetworkX: {path_networkx}")
+        print(f"Trajet précalculé: {path_table}")
 
         print_decorated()
 
@@ -70,8 +142,9 @@ def travel_order(id: str, departure: str, destination: str, debug = True) -> Non
     tracker.stop()
 
 if __name__ == '__main__':
+    tracker = services.get('tracker')
     tracker.start()
-    # Choose input source: readline, csv or microphone
+    # Choose input source: readline, csv, microphone or directory of wav files
     print_decorated()
     input_type = handle_input_type_selection()
     id = 1
@@ -81,36 +154,59 @@ if __name__ == '__main__':
         text = input("Entrez votre texte: ")
         # Check if text is in French
         try:
-            is_french = check_french(text)
+            is_french = services.get('language')(text)
         except Exception as e:
             print(f"{id} - {e.args[0]}")
+            count_outcome(ERROR_NOT_FRENCH)
             exit()
         # Extract locations from text
-        departure, destination = EntityRecognitionService.extract_loc(text)
-        travel_order(id, departure.capitalize(), destination.capitalize())
+        departure, *escales, destination = services.get('ner').extract_loc(text)
+        travel_order(id, departure.capitalize(), destination.capitalize(), escales=[escale.capitalize() for escale in escales], reorder_stops=REORDER_STOPS, bidirectional=BIDIRECTIONAL_SEARCH)
     elif input_type == INPUT_FILE:
         # Use csv as source
         filename = input("Entrez le nom du fichier csv: ")
         filepath = handle_input_type_csv(filename)
-        # Read csv
-        with open(filepath, 'r', encoding="utf-8", newline='') as f:
-            for line in f:
-                line_id, departure, destination = line.split(',')
-                travel_order(line_id.strip(), departure.strip(), destination.strip())
+        # Resolve the whole file in a process pool, rows in error are written as NOT_TRIP
+        from batch_resolver import resolve_csv
+        output_path = FILE_INPUT_LOCATION + filename + FILE_OUTPUT_SUFFIX + '.csv'
+        stats = resolve_csv(filepath, output_path)
+        print(f"{stats['rows']} trajets écrits dans {output_path} ({stats['errors']} erreurs)")
+        tracker.stop()
     elif input_type == INPUT_SPEECH:
         # Use microphone as source
-        audio = SpeechtoText.listen()
+        import speech_recognition as sr
         try:
-            # Save audio as text
-            text = SpeechtoText.transcription(audio)
+            SpeechtoText = services.get('speech')
+            if SpeechtoText.audio_disabled:
+                # No microphone (e.g. in Docker): transcribe a recorded WAV file instead
+                text = SpeechtoText.transcribe_file(input("Entrez le chemin du fichier wav: "))
+            elif SpeechtoText.backend.streaming:
+                # Decode while listening
+                text = SpeechtoText.listen_and_transcribe()
+            else:
+                # Save audio as text
+                text = SpeechtoText.transcription(SpeechtoText.listen())
             # Extract locations from text
-            departure, destination = EntityRecognitionService.extract_loc(text)
-            travel_order(id, departure.capitalize(), destination.capitalize())
+            departure, *escales, destination = services.get('ner').extract_loc(text)
+            travel_order(id, departure.capitalize(), destination.capitalize(), escales=[escale.capitalize() for escale in escales], reorder_stops=REORDER_STOPS, bidirectional=BIDIRECTIONAL_SEARCH)
         except sr.UnknownValueError:
             print(f"{id} - {ERROR_UNKNOWN}")
+            count_outcome(ERROR_UNKNOWN)
         except sr.RequestError as e:
-            print("Could not request results from Google Speech Recognition service; {0}".format(e))
+            print("Could not request results from the speech recognition service; {0}".format(e))
         except Exception as e:
             print(f"{id} - {e.args[0]}")
+            if e.args[0] == ERROR_NOT_FRENCH:
+                count_outcome(ERROR_NOT_FRENCH)
         finally:
-            tracker.stop()
\ No newline at end of file
+            tracker.stop()
+    elif input_type == INPUT_AUDIO_BATCH:
+        # Use a directory of recorded wav files as source
+        dirname = input("Entrez le nom du dossier de fichiers wav: ")
+        dirpath = handle_input_type_audio(dirname)
+        # Decoding, transcription and NLP run in parallel stages, files in error are written as UNKNOWN, NOT_FRENCH or NOT_TRIP
+        from audio_batch_resolver import resolve_audio_directory
+        output_path = FILE_INPUT_LOCATION + dirname + FILE_OUTPUT_SUFFIX + '.csv'
+        stats = resolve_audio_directory(dirpath, output_path)
+        print(f"{stats['rows']} fichiers traités, résultats écrits dans {output_path} ({stats['errors']} erreurs)")
+        tracker.stop()
\ No newline at end of file
@@ -0,0 +1,237 @@
+import atexit
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+from constants import METRICS_JOB, PUSHGATEWAY_URL
+
+# Latency buckets in seconds, from a cached lookup to a slow transcription
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXPANSION_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# Shared by every disabled stage() call, so disabled timers allocate nothing
+_NULL_STAGE = nullcontext()
+
+def _default_role() -> str:
+    """Returns METRICS_ROLE, else the name of the running script or module (main, server, batch_resolver...)."""
+    role = os.environ.get('METRICS_ROLE')
+    if role:
+        return role
+    spec = getattr(sys.modules.get('__main__'), '__spec__', None)
+    if spec is not None:
+        return spec.name.rsplit('.', 1)[-1]
+    name = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    # python -c and the interactive interpreter have no script name
+    return name if name and not name.startswith('-') else 'python'
+
+class _StageTimer:
+    """Context manager observing its duration in a histogram child."""
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class _CapturedTimer:
+    """Context manager appending its duration to a capture buffer (see Metrics.capture)."""
+
+    __slots__ = ('captured', 'name', 'start')
+
+    def __init__(self, captured: list, name: str):
+        self.captured = captured
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.captured.append(('stage', self.name, time.perf_counter() - self.start))
+
+class Metrics:
+    """Per-stage latencies, outcome counters and graph search expansions, pushed to the Prometheus pushgateway.
+
+    Disabled metrics cost a method call: stage() returns a shared no-op
+    context manager, the other methods return right away, and
+    prometheus_client is never imported.
+    """
+
+    def __init__(self, enabled: bool, gateway: str = PUSHGATEWAY_URL, job: str = METRICS_JOB, role: str = None):
+        """
+        Args:
+            enabled (bool): Record and push metrics
+            gateway (str): Pushgateway address, host:port
+            job (str): Job label of the pushed metrics
+            role (str): Role label of the pushed group, defaults to METRICS_ROLE or the running script name
+        """
+        self.enabled = enabled
+        self.gateway = gateway
+        self.job = job
+        self.role = role or _default_role()
+        self._stop = threading.Event()
+        self._push_failed = False
+        # Observations buffered by capture(), None when they are recorded in the registry
+        self._captured = None
+        # Labelled children are looked up once, labels() takes a lock on every call
+        self._children = {}
+        if not enabled:
+            return
+        from prometheus_client import CollectorRegistry, Counter, Histogram
+        self.registry = CollectorRegistry()
+        self.stage_duration = Histogram(
+            'travel_order_stage_duration_seconds', "Time spent in each processing stage",
+            ['stage'], registry=self.registry, buckets=STAGE_BUCKETS
+        )
+        self.outcomes = Counter(
+            'travel_order_outcomes', "Requests by outcome (OK, NOT_TRIP, NOT_FRENCH, UNKNOWN)",
+            ['outcome'], registry=self.registry
+        )
+        self.expanded_nodes = Histogram(
+            'travel_order_search_expanded_nodes', "Nodes expanded by a graph search",
+            ['algorithm'], registry=self.registry, buckets=EXPANSION_BUCKETS
+        )
+        # Short CLI runs end with exit(): the last values are pushed on the way out.
+        # Child processes would replace the group of their parent with their own registry.
+        if multiprocessing.parent_process() is None:
+            atexit.register(self.push)
+
+    def stage(self, name: str):
+        """Returns a context manager timing a stage.
+
+        Args:
+            name (str): Stage name, e.g. 'transcription' or 'pathfinding'
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        if self._captured is not None:
+            return _CapturedTimer(self._captured, name)
+        return _StageTimer(self._child(self.stage_duration, name))
+
+    def count_outcome(self, outcome: str, amount: int = 1) -> None:
+        """Counts request outcomes.
+
+        Args:
+            outcome (str): 'OK' or an error code (ERROR_NOT_TRIP, ERROR_NOT_FRENCH, ERROR_UNKNOWN)
+            amount (int): Number of requests with this outcome
+        """
+        if not self.enabled:
+            return
+        if self._captured is not None:
+            self._captured.append(('outcome', outcome, amount))
+        else:
+            self._child(self.outcomes, outcome).inc(amount)
+
+    def observe_expansions(self, algorithm: str, expanded: int) -> None:
+        """Records the number of nodes expanded by one graph search.
+
+        Args:
+            algorithm (str): Search algorithm, e.g. 'dijkstra' or 'astar'
+            expanded (int): Expanded nodes
+        """
+        if not self.enabled:
+            return
+        if self._captured is not None:
+            self._captured.append(('expansions', algorithm, expanded))
+        else:
+            self._child(self.expanded_nodes, algorithm).observe(expanded)
+
+    def capture(self) -> None:
+        """Buffers the observations of this process instead of recording them, for forked workers.
+
+        A worker forked from the parent has its own copy of the registry,
+        which is never pushed: its observations are drained after each task
+        and replayed by the parent.
+        """
+        if self.enabled:
+            self._captured = []
+
+    def drain(self) -> list:
+        """Returns and clears the observations buffered since the last call (see capture)."""
+        if self._captured is None:
+            return []
+        observations, self._captured = self._captured, []
+        return observations
+
+    def replay(self, observations: list) -> None:
+        """Records observations drained in another process.
+
+        Args:
+            observations (list): (kind, label, value) tuples returned by drain
+        """
+        if not self.enabled:
+            return
+        for kind, label, value in observations:
+            if kind == 'stage':
+                self._child(self.stage_duration, label).observe(value)
+            elif kind == 'outcome':
+                self._child(self.outcomes, label).inc(value)
+            else:
+                self._child(self.expanded_nodes, label).observe(value)
+
+    def _child(self, metric, label: str):
+        """Returns the child of a metric for a label value, cached."""
+        key = (metric, label)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = metric.labels(label)
+        return child
+
+    def push(self) -> bool:
+        """Pushes the current values to the pushgateway, grouped by host and role.
+
+        Each push replaces its whole group: the role keeps the CLI, the batch
+        resolvers and the server of one host from overwriting each other.
+
+        Returns:
+            bool: True if the values were pushed, False if disabled or the pushgateway is unreachable
+        """
+        if not self.enabled:
+            return False
+        from prometheus_client import push_to_gateway
+        try:
+            push_to_gateway(self.gateway, job=self.job, registry=self.registry, grouping_key={'instance': socket.gethostname(), 'role': self.role})
+        except OSError as e:
+            # Reported once: an unreachable pushgateway must not flood the output or stop the application
+            if not self._push_failed:
+                print(f"Pushgateway {self.gateway} injoignable, métriques non envoyées : {e}", file=sys.stderr)
+                self._push_failed = True
+            return False
+        return True
+
+    def start_pusher(self, interval: float = 15.0) -> None:
+        """Pushes the values every interval seconds from a daemon thread, for long-running processes.
+
+        Args:
+            interval (float): Seconds between pushes
+        """
+        if not self.enabled:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                self.push()
+
+        threading.Thread(target=run, name='metrics-pusher', daemon=True).start()
+
+    def stop_pusher(self) -> None:
+        """Stops the pusher thread."""
+        self._stop.set()
+
+metrics = Metrics(
+    enabled=os.environ.get('METRICS_ENABLED', False) == '1',
+    gateway=os.environ.get('PUSHGATEWAY_URL', PUSHGATEWAY_URL)
+)
+
+# Module-level shortcuts used by the instrumented code
+stage = metrics.stage
+count_outcome = metrics.count_outcome
+observe_expansions = metrics.observe_expansions
@@ -0,0 +1,313 @@
+import gc
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import connection, reduction
+
+from metrics import metrics
+
+def memory_usage(pid: int) -> dict:
+    """Reads the memory of a process from /proc/<pid>/smaps_rollup (Linux).
+
+    Args:
+        pid (int): Process id
+
+    Returns:
+        dict: rss, pss (shared pages divided among the processes mapping them) and
+            uss (pages private to the process: what it costs on top of the others), in bytes
+    """
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'uss': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+def _serve(conn) -> None:
+    """Worker loop: runs the tasks received on its pipe until the None sentinel.
+
+    Metrics observed by a task are sent back with its result, the parent records them.
+    """
+    metrics.capture()
+    for task_id, fn, args, kwargs in iter(conn.recv, None):
+        try:
+            ok, value = True, fn(*args, **kwargs)
+        except BaseException as e:
+            ok, value = False, e
+        observations = metrics.drain()
+        try:
+            conn.send((task_id, ok, value, observations))
+        except Exception as e:
+            # Result or exception that cannot be pickled, nothing was written to the pipe
+            conn.send((task_id, False, RuntimeError(repr(e)), observations))
+
+def _zygote(conn) -> None:
+    """Forks a worker for each request received on conn, and sends back its pid and its end of the pipe.
+
+    The zygote is forked by the parent before any other thread starts and
+    stays single-threaded: every worker, replacements included, is forked
+    from the loaded services without a lock held by another thread.
+    """
+    # The workers are never waited for, the kernel reaps them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    for _ in iter(conn.recv, None):
+        parent_end, worker_end = multiprocessing.Pipe()
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            conn.close()
+            parent_end.close()
+            code = 0
+            try:
+                _serve(worker_end)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        worker_end.close()
+        conn.send(pid)
+        reduction.send_handle(conn, parent_end.fileno(), os.getppid())
+        parent_end.close()
+
+class _Worker:
+    """Parent side of a worker: its pipe and the id of the task it runs."""
+
+    __slots__ = ('name', 'pid', 'conn', 'task')
+
+    def __init__(self, name: str, pid: int, conn):
+        self.name = name
+        self.pid = pid
+        self.conn = conn
+        self.task = None
+
+class PreforkExecutor(Executor):
+    """Executor whose worker processes are forked once the parent has loaded its services.
+
+    The parent loads the models, city lists and graph, then forks the
+    workers: they start with the loaded objects and share their memory pages
+    copy-on-write, so N workers do not cost N copies of the models. Before
+    forking, gc.freeze moves every loaded object to the permanent
+    generation, so garbage collections in the workers do not write to the
+    object headers and un-share the pages. Reference count updates still
+    dirty the pages of the objects a worker touches.
+
+    Workers are forked by a zygote process, itself forked when the executor
+    is created. The executor must be created before the parent starts other
+    threads (e.g. the metrics pusher): a thread running during the fork
+    could leave a lock held in the zygote, and so in every worker.
+
+    Each worker has its own pipe, the parent sends a task to an idle worker
+    or queues it until one is free. Functions are sent by reference, they
+    must be importable (module-level functions or methods of module-level
+    classes). If a worker dies, only its task fails with BrokenProcessPool,
+    and the zygote forks a replacement.
+
+    Metrics observed in the workers (stage timings, outcomes) come back
+    with the results and are recorded in the parent, which pushes them.
+    """
+
+    def __init__(self, max_workers: int | None = None, preload=None):
+        """
+        Args:
+            max_workers (int | None): Worker processes, None for one per core
+            preload (callable | None): Called in the parent before forking, to load what the workers share
+        """
+        if preload is not None:
+            preload()
+        context = multiprocessing.get_context('fork')
+        self._pending = {}
+        self._backlog = deque()
+        self._workers = {}
+        self._idle = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._broken = None
+        self.restarts = 0
+
+        gc.collect()
+        gc.freeze()
+        self._zygote_conn, zygote_end = context.Pipe()
+        self._zygote = context.Process(target=_zygote, args=(zygote_end,), name='prefork-zygote', daemon=True)
+        self._zygote.start()
+        zygote_end.close()
+        for i in range(max_workers or os.cpu_count()):
+            self._spawn(f'prefork-worker-{i}')
+        self._collector = threading.Thread(target=self._collect, name='prefork-collector', daemon=True)
+        self._collector.start()
+
+    @property
+    def pids(self) -> list:
+        """Process ids of the workers."""
+        with self._lock:
+            return [worker.pid for worker in self._workers.values()]
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._broken is not None:
+                raise BrokenProcessPool(self._broken)
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            task = (next(self._ids), fn, args, kwargs)
+            self._pending[task[0]] = future
+            if self._idle:
+                failed = self._send(self._idle.pop(), task)
+            else:
+                self._backlog.append(task)
+                failed = None
+        if failed is not None:
+            self._pending.pop(task[0], None)
+            future.set_exception(failed)
+        return future
+
+    def _send(self, worker: _Worker, task: tuple) -> Exception | None:
+        """Sends a task to an idle worker, the lock being held.
+
+        Returns:
+            Exception | None: The error if the task cannot be pickled, the worker is then idle again
+        """
+        try:
+            worker.conn.send(task)
+        except OSError:
+            # Dead worker: the collector fails the task when it reads the end of the pipe
+            pass
+        except Exception as e:
+            self._idle.append(worker)
+            return e
+        worker.task = task[0]
+        return None
+
+    def _release(self, worker: _Worker) -> list:
+        """Gives the next queued task to a worker that is done, or stops it after shutdown. The lock is held.
+
+        Returns:
+            list: (task id, error) of queued tasks that could not be sent
+        """
+        worker.task = None
+        failed = []
+        while self._backlog:
+            task = self._backlog.popleft()
+            error = self._send(worker, task)
+            if error is None:
+                return failed
+            self._idle.remove(worker)
+            failed.append((task[0], error))
+        if self._shutdown:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        else:
+            self._idle.append(worker)
+        return failed
+
+    def _spawn(self, name: str) -> None:
+        """Asks the zygote for a new worker and makes it available."""
+        self._zygote_conn.send(name)
+        pid = self._zygote_conn.recv()
+        worker = _Worker(name, pid, connection.Connection(reduction.recv_handle(self._zygote_conn)))
+        with self._lock:
+            self._workers[worker.conn] = worker
+            failed = self._release(worker)
+        self._fail(failed)
+
+    def _fail(self, failed: list) -> None:
+        """Sets the error of tasks, outside of the lock so that callbacks may submit."""
+        for task_id, error in failed:
+            with self._lock:
+                future = self._pending.pop(task_id, None)
+            if future is not None and not future.cancelled():
+                future.set_exception(error)
+
+    def _collect(self) -> None:
+        """Resolves futures as results arrive, and replaces the workers that die."""
+        while True:
+            with self._lock:
+                conns = list(self._workers)
+            if not conns:
+                break
+            for conn in connection.wait(conns):
+                try:
+                    task_id, ok, value, observations = conn.recv()
+                except (EOFError, OSError):
+                    self._lost(conn)
+                    continue
+                metrics.replay(observations)
+                with self._lock:
+                    future = self._pending.pop(task_id, None)
+                    failed = self._release(self._workers[conn])
+                self._fail(failed)
+                if future is None or future.cancelled():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+        # Every worker stopped after shutdown
+        try:
+            self._zygote_conn.send(None)
+        except OSError:
+            pass
+
+    def _lost(self, conn) -> None:
+        """Handles the end of a worker's pipe: stopped after shutdown, or died with its task."""
+        with self._lock:
+            worker = self._workers.pop(conn)
+            if worker in self._idle:
+                self._idle.remove(worker)
+            restart = not self._shutdown
+        conn.close()
+        if worker.task is not None:
+            self._fail([(worker.task, BrokenProcessPool(f"Worker {worker.name} (pid {worker.pid}) died running a task"))])
+        if not restart:
+            return
+        try:
+            self.restarts += 1
+            self._spawn(worker.name)
+        except (EOFError, OSError) as e:
+            # Zygote gone: no more workers can be forked
+            with self._lock:
+                self._broken = f"Cannot fork a worker to replace {worker.name}: {e!r}"
+                failed = [(task[0], BrokenProcessPool(self._broken)) for task in self._backlog]
+                self._backlog.clear()
+            self._fail(failed)
+
+    def memory(self) -> list:
+        """Returns the memory usage of each worker (see memory_usage)."""
+        samples = []
+        for pid in self.pids:
+            try:
+                samples.append(dict(memory_usage(pid), pid=pid))
+            except FileNotFoundError:
+                # Worker that just died
+                pass
+        return samples
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                for task in self._backlog:
+                    self._pending.pop(task[0]).cancel()
+                self._backlog.clear()
+            # Busy workers are stopped by _release once the queued tasks are done
+            idle, self._idle = self._idle, []
+            for worker in idle:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        if wait:
+            self._collector.join()
+            self._zygote.join()
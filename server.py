@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qsl, urlsplit
+
+from constants import ERROR_NOT_TRIP, ERROR_NOT_FRENCH
+from main import services
+from metrics import metrics, stage, count_outcome
+
+class MicroBatcher:
+    """Coalesces concurrent requests into batches processed by a single function.
+
+    Requests arriving within max_delay of the first one of a batch (or until
+    max_batch requests are queued) are handed together to process_batch,
+    which runs in an executor so the event loop keeps serving connections.
+    """
+
+    def __init__(self, process_batch, executor, max_batch: int = 64, max_delay: float = 0.005, max_in_flight: int = 1):
+        """
+        Args:
+            process_batch (callable): Function mapping a list of items to the list of their results
+            executor (Executor): Executor running process_batch
+            max_batch (int): Maximum number of items per batch
+            max_delay (float): Maximum time to wait for more items, in seconds
+            max_in_flight (int): Batches processed at the same time, up to the executor's number of workers
+        """
+        self.process_batch = process_batch
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_in_flight = max_in_flight
+        self.queue = asyncio.Queue()
+        self.batch_sizes = []
+        self._task = None
+
+    def start(self) -> None:
+        """Starts the batching loop on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        """Queues an item and waits for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        while True:
+            # A batch is only started when a worker is free: meanwhile requests keep queuing and the next batch is larger
+            await in_flight.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batch_sizes.append(len(batch))
+            loop.create_task(self._process(batch)).add_done_callback(lambda _: in_flight.release())
+
+    async def _process(self, batch: list) -> None:
+        items = [item for item, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self.process_batch, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+class ResolverService:
+    """HTTP resolver: /resolve (text to itinerary and route) and /route (cities to route)."""
+
+    def __init__(self, max_batch: int = 64, max_delay: float = 0.005, nlp_workers: int = 0):
+        """
+        Args:
+            max_batch (int): Maximum number of texts per NLP batch
+            max_delay (float): Maximum time to wait for more texts, in seconds
+            nlp_workers (int): Preforked NLP processes (see PreforkExecutor), 0 for one NLP thread in this process
+        """
+        # One NLP thread: the spaCy pipelines are shared and batches run one after the other
+        self.nlp_executor = ThreadPoolExecutor(max_workers=1)
+        # Routes are computed off the event loop: a slow search does not hold the other connections.
+        # The graph queries only keep local state, the threads share the graph and the route cache
+        self.route_executor = ThreadPoolExecutor(thread_name_prefix='route')
+        self.nlp_workers = nlp_workers
+        self.batcher = MicroBatcher(self.resolve_texts, self.nlp_executor, max_batch, max_delay)
+
+    def load(self) -> None:
+        """Loads the graph and the NLP models once, before serving.
+
+        With nlp_workers, the NLP workers are forked afterwards and share the loaded models.
+        """
+        services.get('graph')
+        try:
+            services.get('language')
+            services.get('ner')
+        except Exception as e:
+            print(f"Modèles NLP indisponibles, /resolve répondra 503 : {e!r}")
+            return
+        if self.nlp_workers:
+            from prefork import PreforkExecutor
+            self.nlp_executor = PreforkExecutor(self.nlp_workers)
+            self.batcher.executor = self.nlp_executor
+            self.batcher.max_in_flight = self.nlp_workers
+
+    @staticmethod
+    def resolve_texts(texts: list) -> list:
+        """Runs the language gate and the NER on a batch of texts (in the NLP executor).
+
+        Returns:
+            list: For each text, (departure, destination) or an error code
+        """
+        check_french = services.get('language')
+        results = [None] * len(texts)
+        french = []
+        for i, text in enumerate(texts):
+            try:
+                check_french(text)
+                french.append(i)
+            except Exception as e:
+                # check_french signals a text in another language with Exception(ERROR_NOT_FRENCH),
+                # any other error (model missing, detector failure) fails the batch
+                if e.args != (ERROR_NOT_FRENCH,):
+                    raise
+                results[i] = ERROR_NOT_FRENCH
+        with stage('ner_batch'):
+            itineraries = services.get('ner').extract_loc_batch([texts[i] for i in french])
+        for i, itineraire in zip(french, itineraries):
+            results[i] = ERROR_NOT_TRIP if itineraire is None else itineraire
+        return results
+
+    @staticmethod
+    def route(departure: str, destination: str, escales: list = (), reorder: bool = False) -> dict:
+        """Computes the route between two cities, through the intermediate stops if any."""
+        graph_algorithms = services.get('graph')
+        result = {'departure': departure, 'destination': destination}
+        if escales:
+            result['escales'] = list(escales)
+        outside = [city for city in (departure, *escales, destination) if not graph_algorithms.check_node_exists(city)]
+        if not all(graph_algorithms.can_snap(city) for city in outside):
+            return dict(result, error=ERROR_NOT_TRIP)
+        with stage('pathfinding'):
+            if outside:
+                # Cities outside of the graph are connected to their nearest cities of the graph, in the given order
+                snap_stats = {}
+                path = graph_algorithms.snapped_path([departure, *escales, destination], stats=snap_stats)
+                if path is not None:
+                    result['connectors'] = {
+                        city: {'city': node, 'km': round(distance, 1)}
+                        for city, (node, distance) in snap_stats['connectors'].items()
+                    }
+            elif escales:
+                stops = [departure, *escales, destination]
+                if reorder:
+                    # The response lists the stops in visiting order
+                    stops = graph_algorithms.order_stops(stops)
+                    result['escales'] = stops[1:-1]
+                path = graph_algorithms.multi_stop_path(stops)
+            elif graph_algorithms.table is not None:
+                path = graph_algorithms.table_path(departure, destination)
+            else:
+                path = graph_algorithms.cached_path(departure, destination)
+        if path is None:
+            return dict(result, error=ERROR_NOT_TRIP)
+        return dict(result, route=path)
+
+    async def run_route(self, *args, **kwargs) -> dict:
+        """Runs route in the route thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.route_executor, functools.partial(self.route, *args, **kwargs))
+
+    async def handle_resolve(self, params: dict) -> tuple:
+        text = params.get('text')
+        if not text:
+            return 400, {'error': "Paramètre 'text' manquant"}
+        if not isinstance(text, str):
+            return 400, {'error': "Paramètre 'text' invalide"}
+        if not services.is_loaded('ner'):
+            return 503, {'error': "Modèles NLP indisponibles"}
+        try:
+            itineraire = await self.batcher.submit(text)
+        except BrokenProcessPool:
+            # An NLP worker died with the batch, the pool has forked new workers: the request can be retried
+            return 503, {'error': "Worker NLP interrompu, réessayez"}
+        if isinstance(itineraire, str):
+            count_outcome(itineraire)
+            return 200, {'text': text, 'error': itineraire}
+        departure, *escales, destination = itineraire
+        result = await self.run_route(departure.capitalize(), destination.capitalize(), [escale.capitalize() for escale in escales])
+        count_outcome(result.get('error', 'OK'))
+        return 200, dict(result, text=text)
+
+    async def handle_route(self, params: dict) -> tuple:
+        departure, destination = params.get('departure'), params.get('destination')
+        if not departure or not destination:
+            return 400, {'error': "Paramètres 'departure' et 'destination' manquants"}
+        if not isinstance(departure, str) or not isinstance(destination, str):
+            return 400, {'error': "Paramètres 'departure' et 'destination' invalides"}
+        # Stops as a JSON list or, in the query string, separated by commas
+        escales = params.get('escales') or []
+        if isinstance(escales, str):
+            escales = [escale.strip() for escale in escales.split(',') if escale.strip()]
+        if not isinstance(escales, list) or not all(isinstance(escale, str) for escale in escales):
+            return 400, {'error': "Paramètre 'escales' invalide"}
+        try:
+            result = await self.run_route(departure, destination, escales, reorder=str(params.get('reorder', '')).lower() in ('1', 'true'))
+        except ValueError as e:
+            return 400, {'error': e.args[0]}
+        count_outcome(result.get('error', 'OK'))
+        return 200, result
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves HTTP/1.1 requests on a connection, with keep-alive."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                url = urlsplit(target)
+                params = dict(parse_qsl(url.query))
+                if method == 'POST' and body:
+                    try:
+                        params.update(json.loads(body))
+                    except (ValueError, TypeError):
+                        params = None
+
+                try:
+                    if params is None:
+                        status, payload = 400, {'error': "Corps JSON invalide"}
+                    elif url.path == '/resolve':
+                        status, payload = await self.handle_resolve(params)
+                    elif url.path == '/route':
+                        status, payload = await self.handle_route(params)
+                    else:
+                        status, payload = 404, {'error': "Not found"}
+                except Exception as e:
+                    # An unexpected error (NER, pool of NLP workers...) answers this request only, the connection is kept
+                    status, payload = 500, {'error': f"Erreur interne : {e!r}"}
+
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, ready=None) -> None:
+        """Serves until cancelled.
+
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on
+            ready (asyncio.Event | None): Set once the server accepts connections
+        """
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Service HTTP de résolution d'itinéraires.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch', type=int, default=64, help="Nombre maximal de textes par lot NLP")
+    parser.add_argument('--max-delay-ms', type=float, default=5, help="Attente maximale pour compléter un lot, en ms")
+    parser.add_argument('--nlp-workers', type=int, default=0, help="Processus NLP préforkés partageant les modèles (0 : un thread NLP)")
+    args = parser.parse_args()
+
+    service = ResolverService(args.max_batch, args.max_delay_ms / 1000, args.nlp_workers)
+    start = time.perf_counter()
+    service.load()
+    metrics.start_pusher()
+    print(f"Services chargés en {time.perf_counter() - start:.1f} s, écoute sur http://{args.host}:{args.port}")
+    asyncio.run(service.serve(args.host, args.port))
@@ -0,0 +1,59 @@
+import threading
+import time
+
+class ServiceRegistry:
+    """Creates services on first use and reuses them afterwards.
+
+    Each service is registered with a factory, which is only called the first
+    time the service is requested. Creation times are kept in load_times.
+    """
+
+    def __init__(self) -> None:
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+        self.load_times = {}
+
+    def register(self, name: str, factory) -> None:
+        """Registers a service factory.
+
+        Args:
+            name (str): Service name
+            factory (callable): Function without arguments creating the service
+        """
+        self._factories[name] = factory
+
+    def get(self, name: str):
+        """Returns a service, creating it if needed.
+
+        Args:
+            name (str): Service name
+
+        Returns:
+            The service instance
+
+        Raises:
+            KeyError: If no factory is registered under this name
+        """
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                factory = self._factories[name]
+                start = time.perf_counter()
+                self._instances[name] = factory()
+                self.load_times[name] = time.perf_counter() - start
+            return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        """Checks if a service was already created.
+
+        Args:
+            name (str): Service name
+
+        Returns:
+            bool: True if the service exists, False otherwise
+        """
+        return name in self._instances
@@ -1,8 +1,7 @@
 import os
 
-from constants import INPUT_READLINE, INPUT_FILE, INPUT_SPEECH, FILE_INPUT_LOCATION, ERROR_NOT_FRENCH
-
-from langdetect import detect
+from constants import INPUT_READLINE, INPUT_FILE, INPUT_SPEECH, INPUT_AUDIO_BATCH, FILE_INPUT_LOCATION, ERROR_NOT_FRENCH
+from metrics import stage
 
 def check_french(text: str) -> bool:
     """Check if text is in French.
@@ -13,7 +12,10 @@ def check_french(text: str) -> bool:
     Returns:
         bool: True if text is in French, False otherwise
     """
-    is_french = detect(text) == 'fr'
+    # Imported here so that modes which never check the language do not load the detector
+    from NLP.module.LanguageGate import detect_language
+    with stage('language_detection'):
+        is_french = detect_language(text)['language'] == 'fr'
     if not is_french:
         raise Exception(ERROR_NOT_FRENCH)
     return is_french
@@ -23,11 +25,11 @@ def handle_input_type_selection() -> int:
     """Ask user to select input type.
 
     Returns:
-        int: input type (0: readline, 1: csv, 2: microphone)
+        int: input type (0: readline, 1: csv, 2: microphone, 3: directory of wav files)
     """
     input_type = None
-    while input_type not in [INPUT_READLINE, INPUT_FILE, INPUT_SPEECH]:
-        input_type = int(input("Choisissez votre source d'entrée: {0: readline, 1: csv, 2: microphone} "))
+    while input_type not in [INPUT_READLINE, INPUT_FILE, INPUT_SPEECH, INPUT_AUDIO_BATCH]:
+        input_type = int(input("Choisissez votre source d'entrée: {0: readline, 1: csv, 2: microphone, 3: dossier wav} "))
     return input_type
 
 def handle_input_type_csv(filename: str) -> str:
@@ -40,6 +42,16 @@ def handle_input_type_csv(filename: str) -> str:
     # Return file path
     return filepath
 
+def handle_input_type_audio(dirname: str) -> str:
+    # Find directory in input folder
+    dirpath = FILE_INPUT_LOCATION + dirname
+    # Check if directory exists
+    if not os.path.isdir(dirpath):
+        print(f"Le dossier {dirpath} n'existe pas.")
+        exit()
+    # Return directory path
+    return dirpath
+
 def print_decorated(text = None, decoration='-', length=25):
     """Print text with a decoration on each side."""
     print()